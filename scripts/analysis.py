@@ -1,24 +1,60 @@
-import geopandas as gpd
 import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
 import os
-from matplotlib.colors import LogNorm
+import re
+from shapely.geometry import box
+from figure_pipeline import render_figures
+from mapped_store import load_mapped_layer
+from profiling import get_profiler
 
 # Set a modern style
 plt.style.use('ggplot')
 
-def perform_analysis(gpkg_path, output_dir):
-    print(f"Loading data from {gpkg_path}...")
-    gdf = gpd.read_file(gpkg_path, engine="pyogrio")
-    
-    if gdf.crs is None:
-        gdf.set_crs(epsg=4326, inplace=True)
-    
-    # Fill missing population with NaN for explicit handling
-    # (These represent wards with no census match, effectively 0 density for this study)
+def render_zoom(gdf, region_filter, padding, breaks, output_path, title=None, figsize=(12, 12), dpi=300):
+    # Zoom map of the regions matching `region_filter` (regex on reg_name) plus their
+    # surroundings. Only polygons intersecting the padded viewport are drawn (spatial index
+    # query), simplified to half an output pixel, instead of plotting the whole country and
+    # cropping with set_xlim / set_ylim.
+    print(f"Generating zoom map for '{region_filter}' with context...")
+    extent = gdf[gdf['reg_name'].str.contains(region_filter, case=False, na=False)]
+    if extent.empty:
+        print(f"No polygons match '{region_filter}', skipping zoom.")
+        return None
+
+    minx, miny, maxx, maxy = extent.total_bounds
+    padx = (maxx - minx) * padding
+    pady = (maxy - miny) * padding
+    viewport = box(minx - padx, miny - pady, maxx + padx, maxy + pady)
+
+    view = gdf.iloc[np.sort(gdf.sindex.query(viewport, predicate="intersects"))].copy()
+    pixel = max((maxx - minx + 2 * padx) / (figsize[0] * dpi), (maxy - miny + 2 * pady) / (figsize[1] * dpi))
+    view['geometry'] = view.geometry.simplify(pixel / 2, preserve_topology=True)
+
+    # Classes must not depend on which wards happen to be in view: close the top class at
+    # the national maximum, as when the full layer was plotted
+    bins = list(breaks)
+    national_max = gdf['density'].max()
+    if national_max > bins[-1]:
+        bins.append(national_max)
+
+    fig, ax = plt.subplots(1, 1, figsize=figsize)
+    ax.set_facecolor('#ffffff')
+    view.plot(column='density', ax=ax, legend=True, 
+            scheme='UserDefined', classification_kwds={'bins': bins},
+            cmap='YlOrRd',
+            edgecolor='black', linewidth=0.15,
+            missing_kwds={"color": "white", "edgecolor": "black", "label": "0 / No Data"},
+            legend_kwds={'title': "Density", 'loc': 'lower right', 'fmt': "{:.0f}"})
     
-    # 1. Main Population Density Map
+    ax.set_xlim(minx - padx, maxx + padx)
+    ax.set_ylim(miny - pady, maxy + pady)
+    ax.set_title(title or f"{region_filter}: Population Density & Context (2022)", fontsize=16, fontweight='bold')
+    ax.axis('off')
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+def render_national_map(gdf, output_path):
     print("Generating main population density map with white '0' regions...")
     fig, ax = plt.subplots(1, 1, figsize=(15, 12))
     ax.set_facecolor('#ffffff') # Absolute white background
@@ -42,67 +78,11 @@ def perform_analysis(gpkg_path, output_dir):
     
     ax.set_title("Tanzania 2022 Census: Population Density by Ward", fontsize=18, fontweight='bold', pad=20)
     ax.axis('off')
-    plt.savefig(os.path.join(output_dir, "tza_pop_density_map.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
     plt.close()
+    return output_path
 
-    # 2. Zoom - Dar es Salaam
-    print("Generating Dar es Salaam zoom map with context...")
-    dar_extent = gdf[gdf['reg_name'].str.contains('Dar es Salaam', case=False, na=False)]
-    if not dar_extent.empty:
-        fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-        ax.set_facecolor('#ffffff')
-        
-        # Calculate bounds with 5% padding
-        minx, miny, maxx, maxy = dar_extent.total_bounds
-        padx = (maxx - minx) * 0.05
-        pady = (maxy - miny) * 0.05
-        
-        dar_breaks = [500, 1500, 3000, 6000, 10000, 15000, 20000, 25000, 30000, 35000]
-        
-        # Plot full dataset, but axis limits will crop it
-        gdf.plot(column='density', ax=ax, legend=True, 
-                scheme='UserDefined', classification_kwds={'bins': dar_breaks},
-                cmap='YlOrRd',
-                edgecolor='black', linewidth=0.15,
-                missing_kwds={"color": "white", "edgecolor": "black", "label": "0 / No Data"},
-                legend_kwds={'title': "Density", 'loc': 'lower right', 'fmt': "{:.0f}"})
-        
-        ax.set_xlim(minx - padx, maxx + padx)
-        ax.set_ylim(miny - pady, maxy + pady)
-        ax.set_title("Dar es Salaam: Population Density & Context (2022)", fontsize=16, fontweight='bold')
-        ax.axis('off')
-        plt.savefig(os.path.join(output_dir, "zoom_dar_density.png"), dpi=300, bbox_inches='tight')
-        plt.close()
-
-    # 3. Zoom - Zanzibar
-    print("Generating Zanzibar zoom map with context...")
-    znz_extent = gdf[gdf['reg_name'].str.contains('Unguja|Pemba|Zanzibar', case=False, na=False)]
-    if not znz_extent.empty:
-        fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-        ax.set_facecolor('#ffffff')
-        
-        # Calculate bounds with 10% padding (islands need more air)
-        minx, miny, maxx, maxy = znz_extent.total_bounds
-        padx = (maxx - minx) * 0.1
-        pady = (maxy - miny) * 0.1
-        
-        znz_breaks = [50, 150, 300, 500, 750, 1000, 1500, 2000, 3000, 4000]
-        
-        gdf.plot(column='density', ax=ax, legend=True, 
-                scheme='UserDefined', classification_kwds={'bins': znz_breaks},
-                cmap='YlOrRd',
-                edgecolor='black', linewidth=0.15,
-                missing_kwds={"color": "white", "edgecolor": "black", "label": "0 / No Data"},
-                legend_kwds={'title': "Density", 'loc': 'lower right', 'fmt': "{:.0f}"})
-        
-        ax.set_xlim(minx - padx, maxx + padx)
-        ax.set_ylim(miny - pady, maxy + pady)
-        ax.set_title("Zanzibar: Population Density & Context (2022)", fontsize=16, fontweight='bold')
-        ax.axis('off')
-        plt.savefig(os.path.join(output_dir, "zoom_zanzibar_density.png"), dpi=300, bbox_inches='tight')
-        plt.close()
-
-    # 4. Modern Histogram
+def render_size_histogram(gdf, output_path):
     print("Generating modern ward size histogram...")
     fig, ax = plt.subplots(figsize=(10, 6))
     areas = gdf[gdf['area_sqkm'] >= 1.0]['area_sqkm']
@@ -114,13 +94,13 @@ def perform_analysis(gpkg_path, output_dir):
     ax.set_xlabel("Area (sq km, Log Scale)", fontsize=12)
     ax.set_ylabel("Frequency", fontsize=12)
     ax.grid(True, which="both", ls="-", alpha=0.2)
-    plt.savefig(os.path.join(output_dir, "tza_ward_size_histogram.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
     plt.close()
+    return output_path
 
-    # 5. Save descriptive statistics
+def write_spatial_stats(gdf, output_path):
     print("Saving statistics...")
-    stats_path = os.path.join(output_dir, "tza_spatial_stats.txt")
-    with open(stats_path, "w") as f:
+    with open(output_path, "w") as f:
         f.write("Tanzania 2022 Ward Spatial Statistics\n")
         f.write("======================================\n\n")
         f.write(f"Total polygons analyzed: {len(gdf)}\n")
@@ -128,7 +108,53 @@ def perform_analysis(gpkg_path, output_dir):
         f.write("Population Density Statistics (for matched wards):\n")
         gdf_matched = gdf[gdf['density'].notnull()]
         f.write(gdf_matched['density'].describe().to_string())
-    print(f"Stats updated at {stats_path}")
+    print(f"Stats updated at {output_path}")
+    return output_path
+
+def default_figure_specs(output_dir, dataset="tza"):
+    # The standard analysis outputs as figure specs (see figure_pipeline.py). The national
+    # map is listed first since it dominates wall time and should start first.
+    dar_breaks = [500, 1500, 3000, 6000, 10000, 15000, 20000, 25000, 30000, 35000]
+    znz_breaks = [50, 150, 300, 500, 750, 1000, 1500, 2000, 3000, 4000]
+    return [
+        {"func": "analysis.render_national_map", "data": dataset,
+         "kwargs": {"output_path": os.path.join(output_dir, "tza_pop_density_map.png")}},
+        # Dar es Salaam: 5% padding
+        {"func": "analysis.render_zoom", "data": dataset,
+         "kwargs": {"region_filter": 'Dar es Salaam', "padding": 0.05, "breaks": dar_breaks,
+                    "output_path": os.path.join(output_dir, "zoom_dar_density.png"),
+                    "title": "Dar es Salaam: Population Density & Context (2022)"}},
+        # Zanzibar: 10% padding (islands need more air)
+        {"func": "analysis.render_zoom", "data": dataset,
+         "kwargs": {"region_filter": 'Unguja|Pemba|Zanzibar', "padding": 0.1, "breaks": znz_breaks,
+                    "output_path": os.path.join(output_dir, "zoom_zanzibar_density.png"),
+                    "title": "Zanzibar: Population Density & Context (2022)"}},
+        {"func": "analysis.render_size_histogram", "data": dataset,
+         "kwargs": {"output_path": os.path.join(output_dir, "tza_ward_size_histogram.png")}},
+        {"func": "analysis.write_spatial_stats", "data": dataset,
+         "kwargs": {"output_path": os.path.join(output_dir, "tza_spatial_stats.txt")}},
+    ]
+
+def region_zoom_specs(gdf, output_dir, padding=0.05, breaks=None, dataset="tza"):
+    # One zoom spec per region, so per-region maps spread across the worker pool
+    breaks = breaks or [1, 5, 15, 30, 60, 125, 250, 500, 1000, 2500, 7500, 15000]
+    specs = []
+    for region in sorted(gdf['reg_name'].dropna().unique()):
+        slug = re.sub(r"[^a-z0-9]+", "_", region.lower()).strip("_")
+        specs.append({"func": "analysis.render_zoom", "data": dataset,
+                      "kwargs": {"region_filter": f"^{re.escape(region)}$", "padding": padding,
+                                 "breaks": breaks,
+                                 "output_path": os.path.join(output_dir, f"zoom_{slug}_density.png"),
+                                 "title": f"{region}: Population Density & Context (2022)"}})
+    return specs
+
+def perform_analysis(gpkg_path, output_dir, workers=1, specs=None):
+    # Missing population stays NaN for explicit handling
+    # (These represent wards with no census match, effectively 0 density for this study)
+    with get_profiler().stage("load_mapped_layer"):
+        gdf = load_mapped_layer(gpkg_path)
+    specs = specs or default_figure_specs(output_dir)
+    return render_figures({"tza": gdf}, specs, workers)
 
 if __name__ == "__main__":
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -137,4 +163,4 @@ if __name__ == "__main__":
     GPKG_PATH = os.path.join(ROOT_DIR, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
     OUTPUT_DIR = os.path.join(ROOT_DIR, "data", "processed")
     
-    perform_analysis(GPKG_PATH, OUTPUT_DIR)
+    perform_analysis(GPKG_PATH, OUTPUT_DIR, workers=os.cpu_count() or 1)
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import numpy as np
+import shapely
+from pyproj import CRS, Geod, Transformer
+
+# Areas are computed on the bare geometry array: no attribute columns are copied or
+# reprojected, and the projection is chosen from the layer's own extent.
+
+def equal_area_crs(lonlat_bounds):
+    # Lambert Azimuthal Equal Area centred on the layer: areas are exact (on the ellipsoid)
+    # everywhere, unlike a single UTM zone which distorts outside its 6° band
+    minx, miny, maxx, maxy = lonlat_bounds
+    lon0 = (minx + maxx) / 2
+    lat0 = (miny + maxy) / 2
+    return CRS.from_proj4(f"+proj=laea +lat_0={lat0:.4f} +lon_0={lon0:.4f} +x_0=0 +y_0=0 "
+                          f"+datum=WGS84 +units=m +no_defs")
+
+def _geometry_array(geoseries):
+    geoms = np.asarray(geoseries.values, dtype=object)
+    crs = CRS.from_user_input(geoseries.crs) if geoseries.crs is not None else CRS.from_epsg(4326)
+    return geoms, crs
+
+def bounds_to_lonlat(bounds, crs):
+    minx, miny, maxx, maxy = bounds
+    if crs.is_geographic:
+        return minx, miny, maxx, maxy
+    to_lonlat = Transformer.from_crs(crs, CRS.from_epsg(4326), always_xy=True)
+    return to_lonlat.transform_bounds(minx, miny, maxx, maxy)
+
+def lonlat_bounds(geoms, crs):
+    return bounds_to_lonlat(shapely.total_bounds(geoms), crs)
+
+def project_geometries(geoms, src_crs, dst_crs):
+    # One vectorized coordinate transform over all vertices of all geometries
+    transformer = Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+    def _transform(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return shapely.transform(geoms, _transform)
+
+def projected_areas_sqkm(geoms, src_crs, dst_crs):
+    # Areas in sq km after projecting to `dst_crs` (an equal-area CRS); lets callers that
+    # see a layer in chunks keep one projection for the whole layer
+    return shapely.area(project_geometries(geoms, src_crs, dst_crs)) / 10**6
+
+def geometry_hash(geoms, crs, method):
+    h = hashlib.sha256()
+    h.update(f"{method}|{crs.to_wkt()}|{len(geoms)}".encode('utf-8'))
+    for wkb in shapely.to_wkb(geoms):
+        h.update(wkb if wkb is not None else b"\0")
+    return h.hexdigest()
+
+def source_key(source_path, n_geoms, crs, method):
+    # Cheap cache key for geometries read unchanged from `source_path`: the file's identity
+    # (path, size, mtime) instead of a hash over every geometry, which cost about as much as
+    # computing the areas
+    st = os.stat(source_path)
+    blob = f"{method}|{crs.to_wkt()}|{n_geoms}|{os.path.abspath(source_path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def geometry_areas_sqkm(geoseries, cache_dir=None, method="equal_area", source_path=None):
+    # Area of every geometry in sq km, as a float array aligned with `geoseries`.
+    # method="equal_area": vectorized LAEA projection (default)
+    # method="geodesic": exact ellipsoidal area via pyproj.Geod, one geometry at a time
+    # With `cache_dir` and the `source_path` the geometries were read from (unchanged and in
+    # file order), results are cached under the file's path / size / mtime, so re-running
+    # the mapping or any downstream script on the same layer skips the computation.
+    geoms, crs = _geometry_array(geoseries)
+
+    cache_path = None
+    if cache_dir and source_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, f"areas_{source_key(source_path, len(geoms), crs, method)}.npy")
+        if os.path.exists(cache_path):
+            return np.load(cache_path)
+
+    if method == "equal_area":
+        areas = projected_areas_sqkm(geoms, crs, equal_area_crs(lonlat_bounds(geoms, crs)))
+    elif method == "geodesic":
+        if not crs.is_geographic:
+            geoms = project_geometries(geoms, crs, CRS.from_epsg(4326))
+        geod = Geod(ellps="WGS84")
+        areas = np.array([abs(geod.geometry_area_perimeter(g)[0]) if g is not None else np.nan
+                          for g in geoms]) / 10**6
+    else:
+        raise ValueError(f"Unknown area method: {method}")
+
+    if cache_path:
+        np.save(cache_path, areas)
+    return areas
@@ -0,0 +1,70 @@
+import pdfplumber
+import os
+import time
+from extract_census_data import classify_page, parse_page, PAGE_WARD_TABLE
+from table_layout import extract_ward_tables, reset_layouts
+
+def _ward_rows(records):
+    return sorted((r["Ward"], r["Total_Pop"], r["Male_Pop"], r["Female_Pop"]) for r in records)
+
+def benchmark_table_paths(pdf_path, start_page=50, end_page=None):
+    # Times generic pdfplumber table finding against the learned fixed-column path on every
+    # ward page, and checks that both yield the same ward rows.
+    reset_layouts()
+    generic_s = 0.0
+    fixed_s = 0.0
+    n_pages = 0
+    n_fixed = 0
+    mismatched = []
+    state_generic = {"region": "Unknown", "council": "Unknown"}
+    state_fixed = {"region": "Unknown", "council": "Unknown"}
+
+    with pdfplumber.open(pdf_path) as pdf:
+        end_page = end_page or len(pdf.pages)
+        for i in range(start_page, end_page):
+            page = pdf.pages[i]
+            text = page.extract_text()
+            page.close()
+            if classify_page(text) != PAGE_WARD_TABLE:
+                continue
+            n_pages += 1
+
+            # Flush the page's object caches between runs so neither path benefits from the other
+            t0 = time.perf_counter()
+            generic_tables = page.extract_tables()
+            generic_s += time.perf_counter() - t0
+            page.close()
+
+            t0 = time.perf_counter()
+            fixed_tables, method = extract_ward_tables(page, text)
+            fixed_s += time.perf_counter() - t0
+            page.close()
+            if method == "fixed":
+                n_fixed += 1
+
+            generic_rows = _ward_rows(parse_page(text, generic_tables, state_generic))
+            fixed_rows = _ward_rows(parse_page(text, fixed_tables, state_fixed))
+            if generic_rows != fixed_rows:
+                mismatched.append(i)
+
+    result = {
+        "pages": n_pages,
+        "fixed_pages": n_fixed,
+        "generic_s": generic_s,
+        "fixed_s": fixed_s,
+        "speedup": generic_s / fixed_s if fixed_s else None,
+        "mismatched_pages": mismatched,
+    }
+    print(f"Ward pages: {n_pages} ({n_fixed} sliced with a learned layout)")
+    print(f"Generic table finding: {generic_s:.2f}s ({generic_s / max(n_pages, 1) * 1000:.0f} ms/page)")
+    print(f"Fixed-column slicing:  {fixed_s:.2f}s ({fixed_s / max(n_pages, 1) * 1000:.0f} ms/page)")
+    if result["speedup"]:
+        print(f"Speedup: {result['speedup']:.1f}x")
+    print(f"Pages with differing ward rows: {len(mismatched)} {mismatched[:20]}")
+    return result
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    input_pdf = os.path.join(ROOT, "data", "raw", "TZA_2022_Census_Vol1A.pdf")
+    
+    benchmark_table_paths(input_pdf)
@@ -0,0 +1,60 @@
+import multiprocessing as mp
+import os
+import sys
+import time
+from mapped_store import load_mapped, parquet_path_for
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def _peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+def _load_case(path, columns, queue):
+    base = _peak_rss_mb()
+    t0 = time.perf_counter()
+    df = load_mapped(path, columns=columns)
+    seconds = time.perf_counter() - t0
+    queue.put({"seconds": seconds, "peak_rss_mb": _peak_rss_mb() - base,
+               "frame_mb": df.memory_usage(deep=True).sum() / 1024**2, "rows": len(df)})
+
+def benchmark_storage(gpkg_path, repeats=3):
+    # Each case runs in a fresh process so peak RSS is not polluted by earlier loads
+    parquet_path = parquet_path_for(gpkg_path)
+    cases = [
+        ("gpkg, all columns", gpkg_path, None),
+        ("gpkg, area+density", gpkg_path, ["area_sqkm", "density"]),
+        ("parquet, all columns", parquet_path, None),
+        ("parquet, area+density", parquet_path, ["area_sqkm", "density"]),
+    ]
+    ctx = mp.get_context("spawn")
+    results = []
+    for label, path, columns in cases:
+        if not os.path.exists(path):
+            print(f"{label}: {path} not found, skipping")
+            continue
+        runs = []
+        for _ in range(repeats):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_load_case, args=(path, columns, queue))
+            proc.start()
+            runs.append(queue.get())
+            proc.join()
+        best = min(runs, key=lambda r: r["seconds"])
+        best.update({"case": label, "file_mb": os.path.getsize(path) / 1024**2})
+        results.append(best)
+        print(f"{label:<24} {best['seconds']*1000:8.1f} ms  peak RSS +{best['peak_rss_mb']:7.1f} MB  "
+              f"frame {best['frame_mb']:7.1f} MB  file {best['file_mb']:6.1f} MB")
+    return results
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    GPKG_PATH = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+    
+    benchmark_storage(GPKG_PATH)
@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+import pdfplumber
+from extract_census_data import TZA_REGIONS
+
+# End-to-end benchmarks on synthetic inputs at multiples of the real data size:
+# - extract:  extract_census on an NBS-style ward-table PDF with the same page layout
+# - map:      finalize_mapping and its stages (normalization, primary / secondary / fuzzy
+#             join, area) on a polygon layer + census CSV with realistic name collisions
+# - render:   perform_analysis on the mapped layer produced by the map benchmark
+# Generated inputs are kept in the work directory keyed by size and seed, so repeated runs
+# only pay for generation once. Results are written as JSON; pass --compare to diff two runs.
+
+SCALES = [1, 10, 100]
+STAGES = ["extract", "map", "render"]
+
+# 1x = the 2022 census: 4,344 wards, ~40 ward rows per report page
+BASE_WARDS = 4344
+ROWS_PER_PAGE = 40
+WARDS_PER_COUNCIL = 23
+
+# Tanzania's bounding box (lon / lat), so projections and areas behave like the real layer
+BBOX = (29.3, -11.7, 40.4, -1.0)
+
+# Ward names that recur across councils in the real report; they are what makes the
+# region + ward secondary join ambiguous
+COMMON_WARD_NAMES = ["Kati", "Mjini", "Majengo", "Kilimani", "Mbuyuni", "Sokoni", "Mwembeni", "Kijiji",
+                     "Mtoni", "Kisiwani", "Bondeni", "Mlimani", "Mnazi Mmoja", "Kiwanja", "Shauri Moyo"]
+SYLLABLES = ["ki", "ma", "mbu", "nga", "to", "la", "wa", "ni", "se", "ru", "ka", "mwa", "li", "go",
+             "nya", "ha", "ngo", "zi", "che", "bi", "ku", "mi", "sha", "ndu", "ra", "po", "ya", "tu"]
+COUNCIL_KINDS = ["District", "District", "District", "Town", "Municipal", "City"]
+
+# Share of layer ward names that differ from the census spelling (fuzzy join material) and
+# of wards whose layer council differs from the census council (secondary join material)
+TYPO_RATE = 0.03
+MOVED_COUNCIL_RATE = 0.02
+
+# --- Synthetic inputs
+
+def _syllable_name(rng, n_min=2, n_max=4):
+    n = rng.integers(n_min, n_max + 1)
+    return "".join(rng.choice(SYLLABLES, size=n)).capitalize()
+
+def synthetic_hierarchy(n_wards, seed=0):
+    # Census-style ward table: Region (upper case, as extracted), Council, Ward and
+    # populations. Ward names are unique within a council but collide across councils.
+    rng = np.random.default_rng(seed)
+    n_councils = max(len(TZA_REGIONS), round(n_wards / WARDS_PER_COUNCIL))
+
+    stems = set()
+    councils = []
+    while len(councils) < n_councils:
+        stem = _syllable_name(rng, 2, 3)
+        if stem in stems:
+            continue
+        stems.add(stem)
+        region = TZA_REGIONS[len(councils) % len(TZA_REGIONS)]
+        councils.append((region, f"{stem} {rng.choice(COUNCIL_KINDS)} Council"))
+    councils.sort(key=lambda c: TZA_REGIONS.index(c[0]))
+
+    rows = []
+    for (region, council), chunk in zip(councils, np.array_split(np.arange(n_wards), n_councils)):
+        names = set()
+        while len(names) < len(chunk):
+            if rng.random() < 0.15:
+                names.add(str(rng.choice(COMMON_WARD_NAMES)))
+            else:
+                names.add(_syllable_name(rng))
+        rows.extend((region, council, name) for name in sorted(names))
+
+    df = pd.DataFrame(rows, columns=["Region", "Council", "Ward"])
+    df["Total_Pop"] = np.maximum(rng.lognormal(9.3, 0.8, len(df)).astype(np.int64), 50)
+    df["Male_Pop"] = rng.binomial(df["Total_Pop"].values, 0.49)
+    df["Female_Pop"] = df["Total_Pop"] - df["Male_Pop"]
+    return df
+
+def _typo(name, rng):
+    # Drops or doubles one inner letter: close enough for the fuzzy join to recover
+    if len(name) < 5:
+        return name
+    i = int(rng.integers(1, len(name) - 1))
+    return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + name[i] + name[i:]
+
+def synthetic_ward_layer(hierarchy, seed=0):
+    # Polygon layer in the shapefile's schema (reg_name / dist_name / ward_name). Wards tile
+    # a jittered grid over Tanzania's bounding box, in hierarchy order, so regions and
+    # councils form contiguous blocks. Some names are misspelled and some wards are filed
+    # under a neighbouring council, as in the real NBS shapefile.
+    import geopandas as gpd
+    import shapely
+
+    rng = np.random.default_rng(seed + 1)
+    n = len(hierarchy)
+    minx, miny, maxx, maxy = BBOX
+    cols = int(np.ceil(np.sqrt(n * (maxx - minx) / (maxy - miny))))
+    rows = int(np.ceil(n / cols))
+    dx, dy = (maxx - minx) / cols, (maxy - miny) / rows
+
+    # Shared jittered vertices, so neighbouring wards share edges exactly
+    gx, gy = np.meshgrid(np.arange(cols + 1), np.arange(rows + 1))
+    vx = minx + (gx + rng.uniform(-0.3, 0.3, gx.shape) * (0 < gx) * (gx < cols)) * dx
+    vy = miny + (gy + rng.uniform(-0.3, 0.3, gy.shape) * (0 < gy) * (gy < rows)) * dy
+    r, c = np.divmod(np.arange(n), cols)
+    ring_r = np.stack([r, r, r + 1, r + 1, r], axis=1)
+    ring_c = np.stack([c, c + 1, c + 1, c, c], axis=1)
+    coords = np.stack([vx[ring_r, ring_c], vy[ring_r, ring_c]], axis=-1)
+    geoms = shapely.polygons(coords)
+
+    ward = hierarchy["Ward"].to_numpy(dtype=object).copy()
+    typo = rng.random(n) < TYPO_RATE
+    ward[typo] = [_typo(w, rng) for w in ward[typo]]
+
+    council = hierarchy["Council"].str.replace(" Council", "", regex=False).to_numpy(dtype=object).copy()
+    moved = np.flatnonzero(rng.random(n) < MOVED_COUNCIL_RATE)
+    region = hierarchy["Region"].to_numpy()
+    for i in moved:
+        j = i + WARDS_PER_COUNCIL if i + WARDS_PER_COUNCIL < n else i - WARDS_PER_COUNCIL
+        if 0 <= j < n and region[j] == region[i]:
+            council[i] = council[j]
+
+    return gpd.GeoDataFrame({
+        "reg_name": hierarchy["Region"].str.title().values,
+        "dist_name": council,
+        "ward_name": ward,
+    }, geometry=geoms, crs="EPSG:4326")
+
+def write_census_pdf(hierarchy, pdf_path, rows_per_page=ROWS_PER_PAGE):
+    # NBS-style report: per council, ruled ward tables (No / Ward / Total / Male / Female)
+    # under "Region NN: <name>" and "<r>.<c> <COUNCIL>" headings, the council total on its
+    # first page. Text is embedded as TrueType so pdfplumber reads it like the real report.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    plt.rcParams["pdf.fonttype"] = 42
+    edges = [0.08, 0.14, 0.50, 0.64, 0.78, 0.92]
+    top, row_h = 0.86, 0.019
+    n_pages = 0
+
+    def draw_page(pdf, headings, rows):
+        fig = plt.figure(figsize=(8.27, 11.69))
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1)
+        ax.axis("off")
+        for k, line in enumerate(headings):
+            ax.text(edges[0], 0.94 - k * 0.022, line, fontsize=9, va="center")
+        bottom = top - row_h * len(rows)
+        ax.hlines([top - row_h * k for k in range(len(rows) + 1)], edges[0], edges[-1], colors="black", linewidth=0.6)
+        ax.vlines(edges, bottom, top, colors="black", linewidth=0.6)
+        for k, row in enumerate(rows):
+            y = top - row_h * (k + 0.5)
+            for j, cell in enumerate(row):
+                if j >= 2 and k > 0:
+                    ax.text(edges[j + 1] - 0.008, y, cell, fontsize=7.5, va="center", ha="right")
+                else:
+                    ax.text(edges[j] + 0.006, y, cell, fontsize=7.5, va="center")
+        pdf.savefig(fig)
+        plt.close(fig)
+
+    header = ["No", "Ward", "Total", "Male", "Female"]
+    with PdfPages(pdf_path) as pdf:
+        for r_idx, (region, region_df) in enumerate(hierarchy.groupby("Region", sort=False), start=1):
+            for c_idx, (council, council_df) in enumerate(region_df.groupby("Council", sort=False), start=1):
+                headings = [f"Region {r_idx:02d}: {region.title()}",
+                            f"{r_idx}.{c_idx} {council.upper()}",
+                            "Population Distribution by Sex and Ward"]
+                totals = council_df[["Total_Pop", "Male_Pop", "Female_Pop"]].sum()
+                data = [[str(k), w, f"{t:,}", f"{m:,}", f"{f:,}"] for k, (w, t, m, f) in enumerate(
+                    council_df[["Ward", "Total_Pop", "Male_Pop", "Female_Pop"]].itertuples(index=False), start=1)]
+                body = [["Total", "", f"{totals['Total_Pop']:,}", f"{totals['Male_Pop']:,}", f"{totals['Female_Pop']:,}"]] + data
+                for start in range(0, len(body), rows_per_page - 1):
+                    draw_page(pdf, headings, [header] + body[start:start + rows_per_page - 1])
+                    n_pages += 1
+    return n_pages
+
+def _inputs(work_dir, n_wards, seed, kind):
+    # Generated inputs are reused across runs (same size + seed -> same files)
+    base = os.path.join(work_dir, f"synthetic_{n_wards}_s{seed}")
+    os.makedirs(base, exist_ok=True)
+    hierarchy = synthetic_hierarchy(n_wards, seed)
+    if kind == "pdf":
+        path = os.path.join(base, "census.pdf")
+        if not os.path.exists(path):
+            print(f"Generating synthetic census PDF ({n_wards} wards)...")
+            write_census_pdf(hierarchy, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return hierarchy, path
+
+    census_csv = os.path.join(base, "census.csv")
+    shp_dir = os.path.join(base, "wards")
+    if not os.path.exists(census_csv):
+        hierarchy.to_csv(census_csv, index=False)
+    if not os.path.isdir(shp_dir):
+        print(f"Generating synthetic ward layer ({n_wards} wards)...")
+        synthetic_ward_layer(hierarchy, seed).to_file(shp_dir + ".tmp", driver="ESRI Shapefile", engine="pyogrio")
+        os.replace(shp_dir + ".tmp", shp_dir)
+    return hierarchy, (census_csv, shp_dir)
+
+# --- Benchmarks
+
+def _timed(timings, name, func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = time.perf_counter() - t0
+    return result
+
+def bench_extract(work_dir, n_wards, seed=0, workers=1):
+    from extract_census_data import extract_census
+    hierarchy, pdf_path = _inputs(work_dir, n_wards, seed, "pdf")
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+
+    timings = {}
+    df = _timed(timings, "extract_census", extract_census, pdf_path, start_page=0, workers=workers)
+    found = 0 if df is None else len(df)
+    return {"pages": n_pages, "records": found, "expected_records": len(hierarchy),
+            "seconds": timings, "pages_per_s": n_pages / timings["extract_census"]}
+
+def bench_map(work_dir, n_wards, seed=0):
+    import geopandas as gpd
+    from area_engine import geometry_areas_sqkm
+    from finalize_mapping import (finalize_mapping, normalize_inputs, primary_join, secondary_join, fuzzy_join,
+                                  clear_normalization_memo)
+    _, (census_csv, shp_dir) = _inputs(work_dir, n_wards, seed, "layer")
+    out_dir = os.path.join(os.path.dirname(census_csv), "mapped")
+    os.makedirs(out_dir, exist_ok=True)
+    gpkg_path = os.path.join(out_dir, "mapped.gpkg")
+
+    # Stage by stage, on a fresh normalization memo (no area cache)
+    timings = {}
+    clear_normalization_memo()
+    df_census = _timed(timings, "load_census", pd.read_csv, census_csv)
+    gdf = _timed(timings, "load_layer", gpd.read_file, shp_dir, engine="pyogrio")
+    df_census = _timed(timings, "normalize", normalize_inputs, df_census, gdf)
+    merged = _timed(timings, "primary_join", primary_join, gdf, df_census)
+    primary = int(merged["Total_Pop"].notnull().sum())
+    merged = _timed(timings, "secondary_join", secondary_join, merged, df_census)
+    secondary = int(merged["Total_Pop"].notnull().sum())
+    merged = _timed(timings, "fuzzy_join", fuzzy_join, merged, df_census,
+                    os.path.join(out_dir, "fuzzy_review.csv"))
+    matched = int(merged["Total_Pop"].notnull().sum())
+    _timed(timings, "area", geometry_areas_sqkm, merged.geometry)
+
+    # End to end, including the GPKG / GeoParquet writes; its output feeds the render benchmark
+    clear_normalization_memo()
+    _timed(timings, "finalize_mapping", finalize_mapping, shp_dir, census_csv, gpkg_path)
+    return {"wards": len(gdf), "matched": {"primary": primary, "secondary": secondary, "fuzzy": matched},
+            "seconds": timings, "gpkg": gpkg_path}
+
+def bench_render(gpkg_path, workers=1):
+    from analysis import perform_analysis
+    out_dir = os.path.join(os.path.dirname(gpkg_path), "figures")
+    os.makedirs(out_dir, exist_ok=True)
+    timings = {}
+    results = _timed(timings, "perform_analysis", perform_analysis, gpkg_path, out_dir, workers)
+    for r in results or []:
+        timings[r["func"] + ":" + os.path.basename(str(r["output"]))] = r["seconds"]
+    return {"seconds": timings}
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmarks(work_dir, scales=SCALES, stages=STAGES, workers=1, seed=0):
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "seed": seed,
+        "runs": [],
+    }
+    for scale in scales:
+        n_wards = int(BASE_WARDS * scale)
+        run = {"scale": scale, "wards": n_wards}
+        print(f"\n=== Scale {scale}x ({n_wards} wards) ===")
+        if "extract" in stages:
+            run["extract"] = bench_extract(work_dir, n_wards, seed, workers)
+        if "map" in stages or "render" in stages:
+            run["map"] = bench_map(work_dir, n_wards, seed)
+        if "render" in stages:
+            run["render"] = bench_render(run["map"]["gpkg"], workers)
+        report["runs"].append(run)
+    return report
+
+def _flatten(report):
+    # {(scale, "stage.timing"): seconds}
+    out = {}
+    for run in report["runs"]:
+        for stage in STAGES:
+            for name, seconds in run.get(stage, {}).get("seconds", {}).items():
+                out[(run["scale"], f"{stage}.{name}")] = seconds
+    return out
+
+def print_report(report, baseline=None):
+    current = _flatten(report)
+    previous = _flatten(baseline) if baseline else {}
+    print("\nscale  timing                                              seconds" + ("   vs baseline" if baseline else ""))
+    for (scale, name), seconds in current.items():
+        line = f"{scale:>4}x  {name:<50} {seconds:>9.2f}"
+        if (scale, name) in previous and previous[(scale, name)] > 0:
+            line += f"   {seconds / previous[(scale, name)]:>6.2f}x"
+        print(line)
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic inputs at several scales.")
+    parser.add_argument("--scales", nargs="+", type=float, default=SCALES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=os.path.join(ROOT, "data", "cache", "benchmark"))
+    parser.add_argument("--output", help="Result JSON (default: data/benchmarks/benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    scales = [int(s) if float(s).is_integer() else s for s in args.scales]
+    report = run_benchmarks(args.work_dir, scales, args.stages, args.workers, args.seed)
+
+    output = args.output or os.path.join(ROOT, "data", "benchmarks",
+                                         f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nSaved benchmark results to {output}")
@@ -0,0 +1,418 @@
+import argparse
+import hashlib
+import json
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pyogrio
+from multiprocessing import Pool
+from pyproj import CRS
+from area_engine import bounds_to_lonlat, equal_area_crs, projected_areas_sqkm
+from figure_pipeline import render_figures
+
+# Admin-unit size comparison across any number of countries, without ever holding more
+# than one chunk of one layer in memory:
+# - each layer is read in chunks of CHUNK_SIZE features (pyogrio skip_features /
+#   max_features), projected to an equal-area CRS fitted to the whole layer
+# - areas go into an AreaSummary: counts over fixed log-spaced bins shared by every
+#   country, plus a relative-error quantile sketch. Both merge by adding counts, so chunks
+#   can be summarized in parallel and countries pooled without touching the data again
+# - each country's summary is cached as JSON, keyed by the layer files' size / mtime and
+#   the country config, so adding a country costs one pass over that country only
+
+# Fixed bins: 20 per decade from 1e-4 to 1e6 sq km (100 m² up to 1,000,000 km²), identical
+# for every country so histograms are comparable and mergeable
+BINS_PER_DECADE = 20
+MIN_LOG10, MAX_LOG10 = -4, 6
+BIN_EDGES = np.logspace(MIN_LOG10, MAX_LOG10, (MAX_LOG10 - MIN_LOG10) * BINS_PER_DECADE + 1)
+
+# Quantiles from the sketch are within 1% of the exact value
+SKETCH_ACCURACY = 0.01
+
+CHUNK_SIZE = 20_000
+
+# Histogram y-axis options -> axis label
+HISTOGRAM_SCALES = {"share": "Share of Units per Bin", "count": "Frequency (Linear)"}
+
+# Bump when the summary computation changes (invalidates cached summaries)
+SUMMARY_VERSION = 1
+
+# Set a modern style
+plt.style.use('ggplot')
+
+class QuantileSketch:
+    # DDSketch-style log-bucket sketch: bucket k counts values in (gamma^(k-1), gamma^k], so
+    # any quantile comes back within `relative_accuracy` of the true value, whatever the
+    # range of the data. Merging two sketches adds their bucket counts.
+
+    def __init__(self, relative_accuracy=SKETCH_ACCURACY, counts=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.counts = dict(counts or {})
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values > 0)]
+        if not len(values):
+            return
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for k, n in zip(keys.tolist(), counts.tolist()):
+            self.counts[k] = self.counts.get(k, 0) + n
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracies.")
+        for k, n in other.counts.items():
+            self.counts[k] = self.counts.get(k, 0) + n
+        return self
+
+    def quantile(self, q):
+        # Scalar or array of q in [0, 1]
+        if not self.counts:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+        keys = np.array(sorted(self.counts))
+        cumulative = np.cumsum([self.counts[k] for k in keys])
+        rank = np.asarray(q, dtype=float) * (cumulative[-1] - 1)
+        idx = np.searchsorted(cumulative, rank, side="right")
+        values = 2 * self.gamma ** keys[idx].astype(float) / (self.gamma + 1)
+        return values if np.ndim(q) else float(values)
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "counts": {str(k): n for k, n in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["relative_accuracy"], {int(k): n for k, n in data["counts"].items()})
+
+class AreaSummary:
+    # Mergeable summary of one set of unit areas (sq km)
+
+    def __init__(self, code, name=None, unit=None):
+        self.code = code
+        self.name = name or code
+        self.unit = unit or "Units"
+        self.counts = np.zeros(len(BIN_EDGES) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.sketch = QuantileSketch()
+        self.n = 0
+        self.n_invalid = 0
+        self.total_sqkm = 0.0
+        self.log_sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def add(self, areas):
+        areas = np.asarray(areas, dtype=float)
+        valid = np.isfinite(areas) & (areas > 0)
+        self.n_invalid += int((~valid).sum())
+        areas = areas[valid]
+        if not len(areas):
+            return self
+        self.counts += np.histogram(areas, bins=BIN_EDGES)[0]
+        self.underflow += int((areas < BIN_EDGES[0]).sum())
+        self.overflow += int((areas > BIN_EDGES[-1]).sum())
+        self.sketch.add(areas)
+        self.n += len(areas)
+        self.total_sqkm += float(areas.sum())
+        self.log_sum += float(np.log(areas).sum())
+        self.min = min(self.min, float(areas.min()))
+        self.max = max(self.max, float(areas.max()))
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.sketch.merge(other.sketch)
+        self.n += other.n
+        self.n_invalid += other.n_invalid
+        self.total_sqkm += other.total_sqkm
+        self.log_sum += other.log_sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
+
+    @property
+    def geometric_mean(self):
+        return float(np.exp(self.log_sum / self.n)) if self.n else float("nan")
+
+    def stats(self):
+        p10, p50, p90 = self.quantile([0.1, 0.5, 0.9]) if self.n else [np.nan] * 3
+        return {
+            "code": self.code, "name": self.name, "unit": self.unit, "n_units": self.n,
+            "n_invalid": self.n_invalid, "total_sqkm": self.total_sqkm,
+            "mean_sqkm": self.total_sqkm / self.n if self.n else np.nan,
+            "geometric_mean_sqkm": self.geometric_mean, "p10_sqkm": p10, "median_sqkm": p50,
+            "p90_sqkm": p90, "min_sqkm": self.min if self.n else np.nan, "max_sqkm": self.max if self.n else np.nan,
+        }
+
+    def to_dict(self):
+        return {
+            "code": self.code, "name": self.name, "unit": self.unit,
+            "bins": [MIN_LOG10, MAX_LOG10, BINS_PER_DECADE],
+            "counts": self.counts.tolist(), "underflow": self.underflow, "overflow": self.overflow,
+            "sketch": self.sketch.to_dict(), "n": self.n, "n_invalid": self.n_invalid,
+            "total_sqkm": self.total_sqkm, "log_sum": self.log_sum,
+            "min": self.min if self.n else None, "max": self.max if self.n else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data["bins"] != [MIN_LOG10, MAX_LOG10, BINS_PER_DECADE]:
+            raise ValueError(f"Summary for {data['code']} uses different bins.")
+        s = cls(data["code"], data["name"], data["unit"])
+        s.counts = np.array(data["counts"], dtype=np.int64)
+        s.underflow, s.overflow = data["underflow"], data["overflow"]
+        s.sketch = QuantileSketch.from_dict(data["sketch"])
+        s.n, s.n_invalid = data["n"], data["n_invalid"]
+        s.total_sqkm, s.log_sum = data["total_sqkm"], data["log_sum"]
+        s.min = data["min"] if data["min"] is not None else float("inf")
+        s.max = data["max"] if data["max"] is not None else float("-inf")
+        return s
+
+# --- Streaming a country's layer
+
+def _layer_files(path):
+    # The layer file plus its sidecars (.dbf, .shx, .prj, ... for shapefiles)
+    stem = os.path.splitext(path)[0]
+    folder = os.path.dirname(path) or "."
+    base = os.path.basename(stem)
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if os.path.splitext(f)[0] == base)
+
+def summary_key(country):
+    # Cheap fingerprint: (name, size, mtime_ns) of the layer files, the config and the
+    # summary parameters
+    files = [(os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns) for f in _layer_files(country["path"])]
+    blob = json.dumps({
+        "version": SUMMARY_VERSION, "bins": [MIN_LOG10, MAX_LOG10, BINS_PER_DECADE], "accuracy": SKETCH_ACCURACY,
+        "layer": country.get("layer"), "exclude": country.get("exclude"), "files": files,
+    }, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def layer_projection(path, layer=None):
+    # Source CRS, equal-area CRS fitted to the whole layer, and feature count, from the
+    # layer metadata (falls back to reading bounds only, never full geometries)
+    info = pyogrio.read_info(path, layer=layer, force_feature_count=True, force_total_bounds=True)
+    crs = CRS.from_user_input(info["crs"]) if info.get("crs") else CRS.from_epsg(4326)
+    bounds = info.get("total_bounds")
+    if bounds is None or not np.all(np.isfinite(bounds)):
+        _, b = pyogrio.read_bounds(path, layer=layer)
+        bounds = (b[0].min(), b[1].min(), b[2].max(), b[3].max())
+    return crs, equal_area_crs(bounds_to_lonlat(bounds, crs)), info["features"]
+
+def summarize_chunk(task):
+    # Worker entry point: summary of features [offset, offset + count) of one layer
+    country, offset, count, src_wkt, dst_wkt = task
+    exclude = country.get("exclude")
+    columns = [exclude["column"]] if exclude else []
+    df = pyogrio.read_dataframe(country["path"], layer=country.get("layer"), columns=columns,
+                                skip_features=offset, max_features=count)
+    if exclude:
+        drop = df[exclude["column"]].astype(str).str.upper().isin([v.upper() for v in exclude["values"]])
+        df = df[~drop.values]
+    geoms = np.asarray(df.geometry.values, dtype=object)
+    areas = projected_areas_sqkm(geoms, CRS.from_wkt(src_wkt), CRS.from_wkt(dst_wkt))
+    return country["code"], AreaSummary(country["code"], country.get("name"), country.get("unit")).add(areas).to_dict()
+
+def _cache_path(cache_dir, code):
+    return os.path.join(cache_dir, f"{code}.json")
+
+def load_cached_summary(country, cache_dir):
+    if not cache_dir:
+        return None
+    try:
+        with open(_cache_path(cache_dir, country["code"]), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("key") != summary_key(country):
+        return None
+    try:
+        return AreaSummary.from_dict(data["summary"])
+    except (KeyError, ValueError):
+        return None
+
+def save_summary(summary, country, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, country["code"])
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"key": summary_key(country), "summary": summary.to_dict()}, f)
+    os.replace(path + ".tmp", path)
+
+def summarize_countries(countries, cache_dir=None, workers=1, chunk_size=CHUNK_SIZE):
+    # Returns {code: AreaSummary} in config order. Cached summaries are reused; every other
+    # layer is split into chunks, and all chunks of all stale countries share one pool.
+    summaries = {}
+    tasks = []
+    for country in countries:
+        if not os.path.exists(country["path"]):
+            print(f"{country['code']}: {country['path']} not found, skipping")
+            continue
+        cached = load_cached_summary(country, cache_dir)
+        if cached is not None:
+            print(f"{country['code']}: using cached summary ({cached.n} units)")
+            summaries[country["code"]] = cached
+            continue
+        src, dst, n_features = layer_projection(country["path"], country.get("layer"))
+        summaries[country["code"]] = AreaSummary(country["code"], country.get("name"), country.get("unit"))
+        tasks.extend((country, offset, chunk_size, src.to_wkt(), dst.to_wkt())
+                     for offset in range(0, n_features, chunk_size))
+
+    if tasks:
+        print(f"Summarizing {len(tasks)} chunk(s) from {len(set(t[0]['code'] for t in tasks))} layer(s)...")
+        if workers <= 1 or len(tasks) <= 1:
+            for code, data in map(summarize_chunk, tasks):
+                summaries[code].merge(AreaSummary.from_dict(data))
+        else:
+            with Pool(processes=min(workers, len(tasks))) as pool:
+                for code, data in pool.imap_unordered(summarize_chunk, tasks):
+                    summaries[code].merge(AreaSummary.from_dict(data))
+        if cache_dir:
+            stale = {t[0]["code"] for t in tasks}
+            for country in countries:
+                if country["code"] in stale:
+                    save_summary(summaries[country["code"]], country, cache_dir)
+    return summaries
+
+def load_countries(config_path, root=None, only=None):
+    # Country list from JSON; relative layer paths are resolved against `root`
+    with open(config_path, "r", encoding="utf-8") as f:
+        countries = json.load(f)["countries"]
+    root = root or os.path.dirname(os.path.abspath(config_path))
+    out = []
+    for c in countries:
+        if only and c["code"] not in only:
+            continue
+        c = dict(c)
+        if not os.path.isabs(c["path"]):
+            c["path"] = os.path.join(root, c["path"])
+        out.append(c)
+    return out
+
+# --- Outputs (all work from the summaries alone)
+
+def pooled_summary(summaries, code="ALL", name="All countries"):
+    pooled = AreaSummary(code, name)
+    for s in summaries:
+        pooled.merge(s)
+    return pooled
+
+def _visible_bin_range(summaries):
+    nonzero = np.flatnonzero(np.sum([s.counts for s in summaries], axis=0))
+    if not len(nonzero):
+        return 0, len(BIN_EDGES) - 1
+    return max(nonzero[0] - 1, 0), min(nonzero[-1] + 2, len(BIN_EDGES) - 1)
+
+def render_size_histograms(summaries, output_path, title=None, scale="share"):
+    # scale="share": share of each country's units per log bin (countries differ in unit
+    # count by orders of magnitude, so raw frequencies would hide the small ones);
+    # scale="count": raw number of units per bin
+    if scale not in HISTOGRAM_SCALES:
+        raise ValueError(f"Unknown histogram scale: {scale}")
+    print("Generating unit size histograms...")
+    lo, hi = _visible_bin_range(summaries)
+    fig, ax = plt.subplots(figsize=(12, 7))
+    colors = plt.get_cmap("tab20" if len(summaries) > 10 else "tab10")
+    for k, s in enumerate(summaries):
+        color = colors(k % colors.N)
+        heights = s.counts[lo:hi] / max(s.n, 1) if scale == "share" else s.counts[lo:hi]
+        ax.stairs(heights, BIN_EDGES[lo:hi + 1], color=color, lw=1.8,
+                  label=f"{s.name} {s.unit} (n={s.n:,})")
+        ax.axvline(s.median, color=color, linestyle="--", alpha=0.7)
+
+    ax.set_xscale('log')
+    ax.set_title(title or "Admin Unit Sizes by Country", fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel("Area (sq km, Log Scale)", fontsize=12)
+    ax.set_ylabel(HISTOGRAM_SCALES[scale], fontsize=12)
+    ax.grid(True, which="both", ls="-", alpha=0.2)
+    ax.legend(fontsize=9 if len(summaries) > 6 else 10, ncol=2 if len(summaries) > 10 else 1)
+
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    print(f"Saved unit size histograms to {output_path}")
+    plt.close()
+    return output_path
+
+def render_size_cdfs(summaries, output_path, title=None):
+    # CDFs from the quantile sketches (no raw areas needed)
+    print("Generating cumulative size distributions...")
+    q = np.linspace(0, 1, 401)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    colors = plt.get_cmap("tab20" if len(summaries) > 10 else "tab10")
+    for k, s in enumerate(summaries):
+        if not s.n:
+            continue
+        ax.step(s.quantile(q), q, where="post", color=colors(k % colors.N), lw=2,
+                label=f"{s.name} (median {s.median:,.1f} km²)")
+
+    ax.set_xscale('log')
+    ax.set_title(title or "Cumulative Area Distribution", fontsize=14, fontweight='bold')
+    ax.set_xlabel("Area (sq km, Log Scale)")
+    ax.set_ylabel("Cumulative Fraction")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9 if len(summaries) > 6 else 10)
+
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+def write_size_table(summaries, output_path):
+    # One row per country, plus the pooled distribution of all of them (merged summaries)
+    rows = [s.stats() for s in summaries]
+    if len(summaries) > 1:
+        rows.append(pooled_summary(summaries).stats())
+    table = pd.DataFrame(rows)
+    table.to_csv(output_path, index=False, float_format="%.3f")
+    print(f"Saved unit size summary to {output_path}")
+    return output_path
+
+def compare_countries(countries, output_dir, cache_dir=None, workers=1, prefix="country_unit_size", file_names=None,
+                      histogram_scale="share"):
+    # `file_names` overrides the default "<prefix>_histogram.png" / "_cdf.png" / "_summary.csv"
+    # per output ("histogram", "cdf", "table")
+    names = {"histogram": f"{prefix}_histogram.png", "cdf": f"{prefix}_cdf.png", "table": f"{prefix}_summary.csv"}
+    names.update(file_names or {})
+    summaries = summarize_countries(countries, cache_dir, workers)
+    ordered = [summaries[c["code"]] for c in countries if c["code"] in summaries]
+    if not ordered:
+        print("No country layers found.")
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+    specs = [
+        {"func": "country_compare.render_size_histograms", "data": "summaries",
+         "kwargs": {"output_path": os.path.join(output_dir, names["histogram"]), "scale": histogram_scale}},
+        {"func": "country_compare.render_size_cdfs", "data": "summaries",
+         "kwargs": {"output_path": os.path.join(output_dir, names["cdf"])}},
+        {"func": "country_compare.write_size_table", "data": "summaries",
+         "kwargs": {"output_path": os.path.join(output_dir, names["table"])}},
+    ]
+    return render_figures({"summaries": ordered}, specs, workers)
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Compare admin unit sizes across countries.")
+    parser.add_argument("--countries", default=os.path.join(ROOT, "data", "raw", "countries.json"))
+    parser.add_argument("--only", nargs="*", help="country codes to include (default: all in the config)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "data", "processed"))
+    parser.add_argument("--cache-dir", default=os.path.join(ROOT, "data", "cache", "country_summaries"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--histogram-scale", choices=sorted(HISTOGRAM_SCALES), default="share",
+                        help="y-axis of the histogram: share of each country's units (default) or raw counts")
+    args = parser.parse_args()
+
+    countries = load_countries(args.countries, root=ROOT, only=args.only)
+    compare_countries(countries, args.output_dir, args.cache_dir, args.workers, histogram_scale=args.histogram_scale)
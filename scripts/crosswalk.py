@@ -0,0 +1,306 @@
+import argparse
+import json
+import os
+import geopandas as gpd
+import numpy as np
+import shapely
+from multiprocessing import Pool
+from scipy import sparse
+from shapely import STRtree
+from pyproj import CRS
+from area_engine import equal_area_crs, geometry_hash, lonlat_bounds, project_geometries
+from mapped_store import POPULATION_COLUMNS, load_mapped_layer
+from profiling import get_profiler
+
+# Areal interpolation from the 2022 ward layer onto any other polygon layer (older ward
+# vintages, health-facility catchments, grids, ...).
+# Both layers are projected to one equal-area CRS fitted to their combined extent. Candidate
+# (ward, target) pairs come from one bulk STRtree query, their intersection areas are
+# computed in parallel chunks, and the result is kept as a sparse matrix of intersection
+# areas (targets x wards). Weights for any attribute derive from it:
+# - extensive (counts such as population): area share of each ward falling in each target;
+#   with `preserve_totals`, shares are rescaled over the covered part of each ward, so
+#   every ward that touches the target layer hands over its full count
+# - intensive (rates such as density): area-weighted mean over each target
+# The population of wards (or parts of wards) outside the target layer is reported.
+
+# Candidate pairs per worker task
+CHUNK_PAIRS = 20_000
+
+# Intersections smaller than this share of the ward are treated as boundary noise
+MIN_SHARE = 1e-9
+
+# Bump when the overlay changes (part of the cache key)
+CROSSWALK_VERSION = 1
+
+# Projected geometry arrays shared with the worker processes (set by the pool initializer,
+# inherited with fork or pickled once per worker with spawn)
+_SOURCE = None
+_TARGET = None
+
+def _init_worker(source, target):
+    global _SOURCE, _TARGET
+    _SOURCE, _TARGET = source, target
+
+def _intersection_areas(task):
+    left, right = task
+    return shapely.area(shapely.intersection(_SOURCE[left], _TARGET[right]))
+
+class Crosswalk:
+    # Intersection areas (sq km) between target polygons (rows) and source wards (columns)
+
+    def __init__(self, areas, source_area, target_area):
+        self.areas = areas.tocsr()
+        self.source_area = np.asarray(source_area, dtype=float)
+        self.target_area = np.asarray(target_area, dtype=float)
+
+    @property
+    def coverage(self):
+        # Share of each source ward's area covered by the target layer (1 = fully inside,
+        # above 1 where target polygons overlap each other)
+        covered = np.asarray(self.areas.sum(axis=0)).ravel()
+        return np.divide(covered, self.source_area, out=np.zeros_like(covered), where=self.source_area > 0)
+
+    def extensive_weights(self, preserve_totals=True):
+        # Column j says how source j's count is split over the targets
+        scale = self.coverage * self.source_area if preserve_totals else self.source_area
+        inv = np.divide(1.0, scale, out=np.zeros_like(scale), where=scale > 0)
+        return (self.areas @ sparse.diags(inv)).tocsr()
+
+    def intensive_weights(self):
+        # Row i averages the sources over target i's covered area
+        covered = np.asarray(self.areas.sum(axis=1)).ravel()
+        inv = np.divide(1.0, covered, out=np.zeros_like(covered), where=covered > 0)
+        return (sparse.diags(inv) @ self.areas).tocsr()
+
+    def interpolate(self, values, kind="extensive", preserve_totals=True):
+        # `values`: one value per source ward (NaN counts as 0 for extensive, is skipped
+        # for intensive), or a 2-D array with one column per attribute
+        values = np.asarray(values, dtype=float)
+        if kind == "extensive":
+            return self.extensive_weights(preserve_totals) @ np.nan_to_num(values)
+        if kind == "intensive":
+            valid = np.isfinite(values)
+            w = self.intensive_weights()
+            if valid.all():
+                return w @ values
+            # Renormalize over the sources that have a value
+            total = w @ np.where(valid, values, 0.0)
+            weight = w @ valid.astype(float)
+            return np.divide(total, weight, out=np.full_like(total, np.nan), where=weight > 0)
+        raise ValueError(f"Unknown interpolation kind: {kind}")
+
+    def outside(self, values, preserve_totals=True):
+        # Part of each source's count not assigned to any target
+        values = np.nan_to_num(np.asarray(values, dtype=float))
+        share = (self.coverage > 0).astype(float) if preserve_totals else np.clip(self.coverage, 0, 1)
+        return values * (1 - share)
+
+    def save(self, path, key=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, data=self.areas.data, indices=self.areas.indices, indptr=self.areas.indptr,
+                 shape=np.array(self.areas.shape), source_area=self.source_area, target_area=self.target_area,
+                 key=key or "")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, key=None):
+        # None if missing or built from other geometries
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if key is not None and str(data["key"]) != key:
+                    return None
+                areas = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+                return cls(areas, data["source_area"], data["target_area"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+def _geoms_and_crs(gdf):
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    crs = CRS.from_user_input(gdf.crs) if gdf.crs is not None else CRS.from_epsg(4326)
+    return geoms, crs
+
+def build_crosswalk(source, target, workers=1, chunk_pairs=CHUNK_PAIRS):
+    profiler = get_profiler()
+    src_geoms, src_crs = _geoms_and_crs(source)
+    tgt_geoms, tgt_crs = _geoms_and_crs(target)
+
+    # One equal-area CRS for both layers, fitted to their combined extent
+    with profiler.stage("project"):
+        bounds = np.array([lonlat_bounds(src_geoms, src_crs), lonlat_bounds(tgt_geoms, tgt_crs)])
+        ea_crs = equal_area_crs((bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()))
+        src = project_geometries(src_geoms, src_crs, ea_crs)
+        tgt = project_geometries(tgt_geoms, tgt_crs, ea_crs)
+        # Invalid rings (self-intersections are common in admin layers) would make the
+        # overlay fail; make_valid keeps their area
+        src = np.where(shapely.is_valid(src), src, shapely.make_valid(src))
+        tgt = np.where(shapely.is_valid(tgt), tgt, shapely.make_valid(tgt))
+
+    with profiler.stage("candidate_pairs"):
+        left, right = STRtree(tgt).query(src, predicate="intersects")
+    print(f"Crosswalk: {len(src)} source x {len(tgt)} target polygons -> {len(left)} candidate pairs")
+
+    with profiler.stage("intersections"):
+        tasks = [(left[s:s + chunk_pairs], right[s:s + chunk_pairs]) for s in range(0, len(left), chunk_pairs)]
+        if workers <= 1 or len(tasks) <= 1:
+            _init_worker(src, tgt)
+            parts = [_intersection_areas(t) for t in tasks]
+        else:
+            with Pool(processes=min(workers, len(tasks)), initializer=_init_worker, initargs=(src, tgt)) as pool:
+                parts = pool.map(_intersection_areas, tasks)
+        inter = np.concatenate(parts) / 10**6 if parts else np.zeros(0)
+
+    source_area = shapely.area(src) / 10**6
+    target_area = shapely.area(tgt) / 10**6
+    keep = inter > MIN_SHARE * source_area[left]
+    areas = sparse.csr_matrix((inter[keep], (right[keep], left[keep])), shape=(len(tgt), len(src)))
+    profiler.count("crosswalk.pairs", int(keep.sum()))
+    return Crosswalk(areas, source_area, target_area)
+
+def crosswalk_key(source, target):
+    src_geoms, src_crs = _geoms_and_crs(source)
+    tgt_geoms, tgt_crs = _geoms_and_crs(target)
+    return geometry_hash(src_geoms, src_crs, f"crosswalk-source-v{CROSSWALK_VERSION}") + \
+        geometry_hash(tgt_geoms, tgt_crs, f"crosswalk-target-v{CROSSWALK_VERSION}")
+
+def crosswalk_path_for(output_path):
+    return os.path.splitext(output_path)[0] + "_crosswalk.npz"
+
+def load_or_build_crosswalk(source, target, path=None, workers=1):
+    # The saved matrix doubles as a cache: it is reused while both layers' geometries (and
+    # row order) are unchanged, and rebuilt (and replaced) otherwise
+    key = crosswalk_key(source, target)
+    if path:
+        cached = Crosswalk.load(path, key)
+        if cached is not None:
+            print(f"Using crosswalk {path}")
+            return cached
+    cw = build_crosswalk(source, target, workers)
+    if path:
+        cw.save(path, key)
+    return cw
+
+def outside_report(crosswalk, source, columns=POPULATION_COLUMNS, preserve_totals=True, top_n=20):
+    # Totals before / after interpolation and what falls outside the target layer
+    id_cols = [c for c in ["reg_name", "dist_name", "ward_name"] if c in source.columns]
+    coverage = crosswalk.coverage
+    report = {"preserve_totals": preserve_totals, "source_polygons": len(source),
+              "fully_outside": int(np.sum(coverage == 0)), "partly_outside": int(np.sum((coverage > 0) & (coverage < 0.999))),
+              "columns": {}}
+    for col in columns:
+        values = source[col].to_numpy(dtype=float, na_value=np.nan)
+        outside = crosswalk.outside(values, preserve_totals)
+        total = float(np.nansum(values))
+        report["columns"][col] = {
+            "source_total": total,
+            "assigned_total": float(crosswalk.interpolate(values, "extensive", preserve_totals).sum()),
+            "outside_total": float(outside.sum()),
+            "outside_pct": float(outside.sum() / total * 100) if total else 0.0,
+            "missing_source_values": int(np.isnan(values).sum()),
+        }
+
+    first = columns[0]
+    outside = crosswalk.outside(source[first].to_numpy(dtype=float, na_value=np.nan), preserve_totals)
+    worst = np.argsort(outside)[::-1][:top_n]
+    report["largest_outside"] = [
+        dict({c: str(source[c].iloc[i]) for c in id_cols}, coverage=float(coverage[i]), **{f"{first}_outside": float(outside[i])})
+        for i in worst if outside[i] > 0
+    ]
+    return report
+
+def interpolate_layer(source, target, columns=POPULATION_COLUMNS, intensive_columns=(), crosswalk_path=None,
+                      workers=1, preserve_totals=True):
+    # Target layer with the source columns interpolated onto it, plus the outside report
+    cw = load_or_build_crosswalk(source, target, crosswalk_path, workers)
+    out = target.copy()
+    if columns:
+        values = source[list(columns)].to_numpy(dtype=float, na_value=np.nan)
+        out[list(columns)] = cw.interpolate(values, "extensive", preserve_totals)
+    for col in intensive_columns:
+        out[col] = cw.interpolate(source[col].to_numpy(dtype=float, na_value=np.nan), "intensive")
+    return out, outside_report(cw, source, list(columns) or POPULATION_COLUMNS[:1], preserve_totals)
+
+def print_outside_report(report):
+    print(f"\nCrosswalk totals ({'totals preserved' if report['preserve_totals'] else 'area shares'}):")
+    for col, r in report["columns"].items():
+        print(f"  {col:<12} source {r['source_total']:>14,.0f}  assigned {r['assigned_total']:>14,.0f}  "
+              f"outside {r['outside_total']:>12,.0f} ({r['outside_pct']:.2f}%)")
+    print(f"  Source polygons fully outside the target layer: {report['fully_outside']}, "
+          f"partly outside: {report['partly_outside']}")
+
+def load_targets(config_path, root, only=None):
+    # data/raw/crosswalk_targets.json: {"targets": [{"name", "path", optional "exclude":
+    # {"column", "values"}, "columns", "intensive", "preserve_totals"}]}, paths relative to root
+    with open(config_path, "r", encoding="utf-8") as f:
+        targets = json.load(f).get("targets", [])
+    targets = [dict(t, path=os.path.join(root, t["path"])) for t in targets if not only or t["name"] in only]
+    missing = [t["name"] for t in targets if not os.path.exists(t["path"])]
+    if missing:
+        print(f"Skipping crosswalk targets with no layer on disk: {', '.join(missing)}")
+    return [t for t in targets if t["name"] not in missing]
+
+def read_target(spec):
+    target = gpd.read_file(spec["path"], engine="pyogrio")
+    if target.crs is None:
+        target.set_crs(epsg=4326, inplace=True)
+    exclude = spec.get("exclude")
+    if exclude:
+        target = target[~target[exclude["column"]].isin(exclude["values"])].reset_index(drop=True)
+    return target
+
+def write_interpolated(out, report, output_path):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    out.to_file(output_path, driver="GPKG")
+    with open(os.path.splitext(output_path)[0] + "_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+def run_crosswalks(source_path, targets, output_dir, workers=1):
+    # One <name>.gpkg, <name>_crosswalk.npz and <name>_report.json per target, plus
+    # crosswalk_summary.json with the outside totals of every target
+    profiler = get_profiler()
+    source = load_mapped_layer(source_path) if targets else None
+    summary = {}
+    for spec in targets:
+        with profiler.stage(f"crosswalk:{spec['name']}"):
+            target = read_target(spec)
+            output_path = os.path.join(output_dir, f"{spec['name']}.gpkg")
+            out, report = interpolate_layer(source, target, spec.get("columns", POPULATION_COLUMNS),
+                                            spec.get("intensive", []), crosswalk_path_for(output_path), workers,
+                                            spec.get("preserve_totals", True))
+            write_interpolated(out, report, output_path)
+        print(f"\n{spec['name']} ({len(target)} polygons) -> {output_path}")
+        print_outside_report(report)
+        summary[spec["name"]] = report["columns"]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "crosswalk_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    SOURCE = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+
+    parser = argparse.ArgumentParser(description="Interpolate ward populations onto other polygon layers.")
+    parser.add_argument("target", nargs="?", help="one target layer (default: every target in --config)")
+    parser.add_argument("--output", help="output GeoPackage for a single target (default: <target>_tza2022.gpkg)")
+    parser.add_argument("--config", default=os.path.join(ROOT, "data", "raw", "crosswalk_targets.json"))
+    parser.add_argument("--only", nargs="*", help="target names from the config to run")
+    parser.add_argument("--source", default=SOURCE)
+    parser.add_argument("--columns", nargs="*", default=POPULATION_COLUMNS, help="count columns (extensive)")
+    parser.add_argument("--intensive", nargs="*", default=[], help="rate columns (area-weighted mean), e.g. density")
+    parser.add_argument("--no-preserve-totals", action="store_true",
+                        help="split by plain area shares; the uncovered part of each ward is dropped")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "data", "processed", "crosswalks"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.target:
+        output = args.output or os.path.splitext(args.target)[0] + "_tza2022.gpkg"
+        spec = {"name": os.path.splitext(os.path.basename(output))[0], "path": args.target,
+                "columns": args.columns, "intensive": args.intensive, "preserve_totals": not args.no_preserve_totals}
+        run_crosswalks(args.source, [spec], os.path.dirname(os.path.abspath(output)), args.workers)
+    else:
+        run_crosswalks(args.source, load_targets(args.config, ROOT, args.only), args.output_dir, args.workers)
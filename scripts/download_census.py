@@ -1,31 +1,330 @@
 import requests
 import os
+import json
+import time
+import zlib
+import struct
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import HTTPError as Urllib3Error
 
-def download_file(url, local_filename):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Read size adapts to throughput: grow while a chunk arrives faster than TARGET_CHUNK_SECONDS,
+# shrink when it is slower, so slow links still make visible progress and fast links are
+# not bottlenecked on Python-level loop overhead
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 8 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 0.5
+
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 2
+
+class ChecksumError(Exception):
+    pass
+
+class StreamingUnzipper:
+    # Extracts a zip archive while it is being downloaded, by walking the local file headers
+    # instead of the central directory at the end of the file. Handles stored and deflated
+    # entries, with or without data descriptors (deflate only). Anything else (zip64,
+    # encryption, other methods) sets `unsupported` and the caller falls back to zipfile
+    # once the download is complete.
+
+    LOCAL_HEADER = b"PK\x03\x04"
+    CENTRAL_HEADER = b"PK\x01\x02"
+    END_OF_CENTRAL_DIR = b"PK\x05\x06"
+    DATA_DESCRIPTOR = b"PK\x07\x08"
+
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.buf = bytearray()
+        self.state = "header"
+        self.unsupported = None
+        self.files = []
+        self._entry = None
+
+    def feed(self, data):
+        if self.unsupported or self.state == "done":
+            return
+        self.buf += data
+        while self._step():
+            pass
+
+    def close(self):
+        # True if the whole archive was extracted from the stream
+        if self._entry is not None and self._entry["out"] is not None:
+            self._entry["out"].close()
+        return self.unsupported is None and self.state == "done"
+
+    def _fail(self, reason):
+        self.unsupported = reason
+        if self._entry is not None and self._entry["out"] is not None:
+            self._entry["out"].close()
+        return False
+
+    def _target_path(self, name):
+        # Refuse absolute paths and "..": nothing may be written outside dest_dir
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.')]
+        if not parts or '..' in parts or os.path.isabs(name):
+            raise ValueError(f"Unsafe path in zip archive: {name}")
+        return os.path.join(self.dest_dir, *parts)
+
+    def _step(self):
+        if self.state == "header":
+            if len(self.buf) < 4:
+                return False
+            sig = bytes(self.buf[:4])
+            if sig in (self.CENTRAL_HEADER, self.END_OF_CENTRAL_DIR):
+                self.state = "done"
+                return False
+            if sig != self.LOCAL_HEADER:
+                return self._fail(f"unexpected record signature {sig!r}")
+            if len(self.buf) < 30:
+                return False
+            (_, flags, method, _, _, crc, csize, usize, name_len, extra_len) = struct.unpack(
+                "<HHHHHIIIHH", self.buf[4:30])
+            if len(self.buf) < 30 + name_len + extra_len:
+                return False
+            raw_name = bytes(self.buf[30:30 + name_len])
+            name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+            del self.buf[:30 + name_len + extra_len]
+
+            descriptor = bool(flags & 0x08)
+            if flags & 0x01:
+                return self._fail("encrypted entry")
+            if method not in (0, 8):
+                return self._fail(f"compression method {method}")
+            if 0xFFFFFFFF in (csize, usize):
+                return self._fail("zip64 entry")
+            if descriptor and method == 0:
+                return self._fail("stored entry with data descriptor")
+
+            path = self._target_path(name)
+            out = None
+            if name.endswith('/'):
+                os.makedirs(path, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                out = open(path, 'wb')
+            self._entry = {
+                "name": name, "path": path, "out": out, "method": method, "descriptor": descriptor,
+                "crc": crc, "remaining": csize, "crc_out": 0,
+                "inflater": zlib.decompressobj(-15) if method == 8 else None,
+            }
+            self.state = "data"
+            return True
+
+        if self.state == "data":
+            entry = self._entry
+            if not self.buf:
+                return False
+            if entry["descriptor"]:
+                # Compressed size unknown up front: the deflate stream itself marks its end
+                self._write(entry["inflater"].decompress(bytes(self.buf)))
+                if entry["inflater"].eof:
+                    self.buf = bytearray(entry["inflater"].unused_data)
+                    self.state = "descriptor"
+                else:
+                    self.buf.clear()
+                return True
+            take = min(entry["remaining"], len(self.buf))
+            data = bytes(self.buf[:take])
+            del self.buf[:take]
+            entry["remaining"] -= take
+            self._write(entry["inflater"].decompress(data) if entry["inflater"] else data)
+            if entry["remaining"] == 0:
+                if entry["inflater"]:
+                    self._write(entry["inflater"].flush())
+                return self._finish_entry(entry["crc"])
+            return take > 0
+
+        if self.state == "descriptor":
+            if len(self.buf) < 4:
+                return False
+            size = 16 if bytes(self.buf[:4]) == self.DATA_DESCRIPTOR else 12
+            if len(self.buf) < size:
+                return False
+            crc = struct.unpack("<I", self.buf[size - 12:size - 8])[0]
+            del self.buf[:size]
+            return self._finish_entry(crc)
+
+        return False
+
+    def _write(self, data):
+        if data and self._entry["out"] is not None:
+            self._entry["out"].write(data)
+            self._entry["crc_out"] = zlib.crc32(data, self._entry["crc_out"])
+
+    def _finish_entry(self, crc):
+        entry = self._entry
+        if entry["out"] is not None:
+            entry["out"].close()
+            if entry["crc_out"] != crc:
+                raise ChecksumError(f"CRC mismatch for {entry['name']} in zip stream")
+            self.files.append(entry["path"])
+        self._entry = None
+        self.state = "header"
+        return True
+
+def _file_digest(path, h, on_chunk=None, chunk_size=1024 * 1024):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+
+def download_file(url, local_filename, sha256=None, session=None, on_chunk=None, make_consumer=None,
+                  max_retries=MAX_RETRIES, verify_ssl=False):
+    # Streams `url` into `local_filename` via a .part file:
+    # - resumes an interrupted .part with an HTTP Range request (restarts if the server
+    #   ignores the range), retrying with exponential backoff
+    # - verifies SHA-256 against `sha256` when given; a mismatch deletes the download
+    # - passes every byte, in order, to `on_chunk` (e.g. StreamingUnzipper.feed). When a
+    #   restart from byte 0 is needed, `make_consumer` is called to get a fresh callback.
+    # Raises on final failure; a partial .part file is kept for the next attempt.
+    # verify_ssl=False by default due to certificate issues on some government portals.
     # Ensure directory exists
-    os.makedirs(os.path.dirname(local_filename), exist_ok=True)
-    
-    print(f"Downloading {url} to {local_filename}...")
-    try:
-        # Use verify=False due to potential SSL certificate issues on some government portals
-        with requests.get(url, headers=headers, stream=True, verify=False) as r:
-            r.raise_for_status()
-            with open(local_filename, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192): 
-                    f.write(chunk)
-        print(f"Successfully downloaded: {local_filename}")
-        print(f"Final Size: {os.path.getsize(local_filename)} bytes")
-    except Exception as e:
-        print(f"Failed to download: {e}")
+    os.makedirs(os.path.dirname(os.path.abspath(local_filename)), exist_ok=True)
+    session = session or requests.Session()
+    part_path = local_filename + ".part"
+
+    if make_consumer is not None and on_chunk is None:
+        on_chunk = make_consumer()
+
+    if os.path.exists(local_filename) and sha256:
+        h = hashlib.sha256()
+        _file_digest(local_filename, h)
+        if h.hexdigest() == sha256:
+            print(f"Already downloaded and verified: {local_filename}")
+            if on_chunk:
+                _file_digest(local_filename, hashlib.sha256(), on_chunk)
+            return local_filename
+
+    # Re-hash (and replay to the consumer) whatever an earlier attempt left behind
+    h = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part_path):
+        _file_digest(part_path, h, on_chunk)
+        offset = os.path.getsize(part_path)
+
+    print(f"Downloading {url} to {local_filename}" + (f" (resuming at {offset} bytes)..." if offset else "..."))
+    chunk_size = MIN_CHUNK
+    attempt = 0
+    while True:
+        headers = dict(HEADERS)
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+        try:
+            with session.get(url, headers=headers, stream=True, verify=verify_ssl, timeout=60) as r:
+                if r.status_code == 416 and offset:
+                    # Range starts at the end of the file: the .part is already complete
+                    break
+                r.raise_for_status()
+                if offset and r.status_code != 206:
+                    print("Server ignored the Range request, restarting from the beginning.")
+                    offset = 0
+                    h = hashlib.sha256()
+                    if make_consumer is not None:
+                        on_chunk = make_consumer()
+                mode = 'ab' if offset else 'wb'
+                with open(part_path, mode) as f:
+                    while True:
+                        t0 = time.perf_counter()
+                        chunk = r.raw.read(chunk_size, decode_content=True)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        h.update(chunk)
+                        if on_chunk:
+                            on_chunk(chunk)
+                        offset += len(chunk)
+                        elapsed = time.perf_counter() - t0
+                        if elapsed < TARGET_CHUNK_SECONDS / 2:
+                            chunk_size = min(chunk_size * 2, MAX_CHUNK)
+                        elif elapsed > TARGET_CHUNK_SECONDS * 2:
+                            chunk_size = max(chunk_size // 2, MIN_CHUNK)
+                # A dropped connection can end the body early without an error: compare with the
+                # advertised total size (unknowable for content-encoded responses)
+                if r.status_code == 206:
+                    expected = r.headers.get('Content-Range', '').rpartition('/')[2]
+                else:
+                    expected = None if r.headers.get('Content-Encoding') else r.headers.get('Content-Length')
+                if expected and expected.isdigit() and offset < int(expected):
+                    raise requests.exceptions.ChunkedEncodingError(f"Truncated body: {offset} of {expected} bytes")
+            break
+        # r.raw.read raises urllib3's own errors (ProtocolError, ReadTimeoutError) when the
+        # connection drops mid-body; requests only wraps those for iter_content
+        except (requests.exceptions.RequestException, Urllib3Error) as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            wait = BACKOFF_SECONDS * 2 ** (attempt - 1)
+            print(f"Download interrupted at {offset} bytes ({e}); retry {attempt}/{max_retries} in {wait}s...")
+            time.sleep(wait)
+
+    digest = h.hexdigest()
+    if sha256 and digest != sha256:
+        os.remove(part_path)
+        raise ChecksumError(f"SHA-256 mismatch for {local_filename}: expected {sha256}, got {digest}")
+    os.replace(part_path, local_filename)
+    print(f"Successfully downloaded: {local_filename}")
+    print(f"Final Size: {os.path.getsize(local_filename)} bytes, SHA-256: {digest}" +
+          ("" if sha256 else " (not pinned in the manifest)"))
+    return local_filename
+
+def download_and_unzip(url, zip_path, extract_dir, sha256=None, session=None):
+    # Downloads a zip and extracts it while streaming; falls back to zipfile afterwards if
+    # the archive uses features the streaming reader does not handle
+    unzippers = []
+    def new_unzipper():
+        unzippers.append(StreamingUnzipper(extract_dir))
+        return unzippers[-1].feed
+
+    download_file(url, zip_path, sha256=sha256, session=session, make_consumer=new_unzipper)
+    unzipper = unzippers[-1]
+    if unzipper.close():
+        print(f"Extracted {len(unzipper.files)} file(s) to {extract_dir} while downloading")
+        return extract_dir
+
+    print(f"Streaming unzip not possible ({unzipper.unsupported or 'incomplete archive'}), extracting with zipfile...")
+    with zipfile.ZipFile(zip_path) as zf:
+        zf.extractall(extract_dir)
+    print(f"Extracted {zip_path} to {extract_dir}")
+    return extract_dir
+
+def load_manifest(manifest_path):
+    # Manifest entries: {"name", "url", "path", "sha256" (null = not pinned yet), "unzip_to"
+    # (optional)}; paths are relative to the project root
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)["artifacts"]
+
+def fetch_artifact(artifact, root, session=None):
+    # Downloads (and unzips, with "unzip_to") one manifest entry; raises on failure
+    path = os.path.join(root, artifact["path"])
+    if artifact.get("unzip_to"):
+        return download_and_unzip(artifact["url"], path, os.path.join(root, artifact["unzip_to"]),
+                                  sha256=artifact.get("sha256"), session=session)
+    return download_file(artifact["url"], path, sha256=artifact.get("sha256"), session=session)
+
+def fetch_artifacts(artifacts, root, workers=4, session_factory=requests.Session):
+    # Fetches all artifacts concurrently (I/O bound, so threads); returns {name: path or error}
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_artifact, a, root, session_factory()): a["name"] for a in artifacts}
+        for future, name in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"Failed to download {name}: {e}")
+                results[name] = e
+    return results
 
 if __name__ == "__main__":
-    url = "https://www.nbs.go.tz/uploads/statistics/documents/en-1705484562-Administrative_units_Population_Distribution_Report_Tanzania_volume1a.pdf"
-    
     # Path relative to project root
     ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    output_path = os.path.join(ROOT, "data", "raw", "TZA_2022_Census_Vol1A.pdf")
+    MANIFEST = os.path.join(ROOT, "data", "raw", "manifest.json")
     
-    download_file(url, output_path)
+    fetch_artifacts(load_manifest(MANIFEST), ROOT)
@@ -2,6 +2,14 @@ import pdfplumber
 import pandas as pd
 import re
 import os
+import csv
+import hashlib
+import time
+from collections import deque
+from multiprocessing import Pool
+from page_cache import PageCache
+from table_layout import extract_ward_tables, reset_layouts, unit_label, LAYOUT_VERSION
+from profiling import get_profiler
 
 def parse_number(s):
     if not s: return 0
@@ -24,144 +32,570 @@ TZA_REGIONS = [
 # If these appear in the "Ward" name column, we should usually skip them.
 SUMMARY_KEYWORDS = ["COUNCIL", "DISTRICT", "TOWN", "CITY", "MUNICIPAL", "REGION", "TOTAL"]
 
-def extract_census(pdf_path, start_page=50):
-    data = []
-    
-    if not os.path.exists(pdf_path):
-        print(f"Error: PDF file not found at {pdf_path}. Please run download_census.py first.")
-        return None
+# Number of consecutive pages per extraction task. Fixed-column layouts are learned afresh in
+# every task (serial runs use the same split), so a block pays for one generic page per
+# table schema and the output does not depend on the worker count.
+PAGES_PER_TASK = 16
+
+# Blocks per worker submitted to the pool ahead of the consumer; bounds the memory held by
+# extracted pages waiting to be parsed
+MAX_TASKS_IN_FLIGHT = 2
+
+# pdfplumber table-finder settings; part of the page cache key, so changing them
+# automatically invalidates previously cached tables
+TABLE_SETTINGS = {}
+
+# Page classes assigned from the text layer alone, before any table detection
+PAGE_WARD_TABLE = "ward_table"
+PAGE_COUNCIL_SUMMARY = "council_summary"
+PAGE_IRRELEVANT = "irrelevant"
+PAGE_CLASSES = [PAGE_WARD_TABLE, PAGE_COUNCIL_SUMMARY, PAGE_IRRELEVANT]
+
+# Bump when classify_page changes or a page class starts / stops getting tables: pages it
+# used to skip have no cached tables
+CLASSIFIER_VERSION = 3
+
+# A text line ending in at least three numbers (population columns, optional sex ratio)
+DATA_LINE_RE = re.compile(r"(?:\d[\d,]*(?:\.\d+)?\s+){2,}\d[\d,]*(?:\.\d+)?\s*$", re.MULTILINE)
+SUMMARY_TABLE_RE = re.compile(r"Table\s+(\d+)\.0")
+# Ward row signature: a name, then Total / Male / Female (optionally a sex ratio)
+WARD_ROW_RE = re.compile(r"[A-Za-z][^\d\n]*\s+(\d[\d,]*)\s+(\d[\d,]*)\s+(\d[\d,]*)(?:\s+\d+(?:\.\d+)?)?\s*$",
+                         re.MULTILINE)
+# Rows matching the signature a page without a Ward/Shehia header needs to count as a
+# continuation page of a ward table
+MIN_SIGNATURE_ROWS = 3
+
+def _ward_signature_rows(text):
+    # Lines shaped like ward rows whose Total is exactly Male + Female
+    n = 0
+    for m in WARD_ROW_RE.finditer(text):
+        total, male, female = (int(g.replace(',', '')) for g in m.groups())
+        n += total == male + female
+    return n
 
+def classify_page(text):
+    # Cheap stand-in for table detection, based only on the text layer:
+    # - no line of numbers at all -> narrative / title page, nothing to extract
+    # - a Ward/Shehia header -> ward table
+    # - "Table X.0" and no Ward/Shehia header -> council summary: no ward rows, only the
+    #   official council / region totals, so its tables are only read when those are wanted
+    # - no header but at least MIN_SIGNATURE_ROWS "name Total Male Female" lines with
+    #   Total = Male + Female -> continuation page of a ward table
+    # - anything else (age / household tables, indicator tables, ...) is skipped
+    if not text or not DATA_LINE_RE.search(text):
+        return PAGE_IRRELEVANT
+    if "Ward" in text or "Shehia" in text:
+        return PAGE_WARD_TABLE
+    if SUMMARY_TABLE_RE.search(text):
+        return PAGE_COUNCIL_SUMMARY
+    if _ward_signature_rows(text) >= MIN_SIGNATURE_ROWS:
+        return PAGE_WARD_TABLE
+    return PAGE_IRRELEVANT
+
+def read_page(page, table_settings=None, fixed_columns=True, summary_tables=False):
+    # The expensive part of every page: text layer + table extraction, the latter only for
+    # pages classified as ward tables. With `fixed_columns`, ward pages are sliced directly
+    # along column boundaries learned from earlier pages of the same task (see
+    # table_layout.py) and generic pdfplumber table finding only runs for a layout it has
+    # not seen yet. With `summary_tables`, council summary pages get (generic) tables too.
+    # Kept free of any Region/Council state so it can run in any process, in any order.
+    # The page's layout caches are released as soon as its raw output has been taken, so
+    # memory does not grow with the number of pages processed.
+    try:
+        t0 = time.perf_counter()
+        text = page.extract_text()
+        t1 = time.perf_counter()
+        page_class = classify_page(text)
+        tables = None
+        method = None
+        if page_class == PAGE_WARD_TABLE:
+            if fixed_columns:
+                tables, method = extract_ward_tables(page, text, table_settings)
+            else:
+                tables, method = page.extract_tables(table_settings or {}), "generic"
+        elif page_class == PAGE_COUNCIL_SUMMARY and summary_tables:
+            tables, method = page.extract_tables(table_settings or {}), "generic"
+        t2 = time.perf_counter()
+        return text, tables, {"page_class": page_class, "table_method": method,
+                              "text_s": t1 - t0, "tables_s": t2 - t1}
+    finally:
+        page.close()
+
+def _iter_page_list(task):
+    # One task: a block of pages read with its own PDF handle and its own learned layouts
+    pdf_path, page_numbers, table_settings, fixed_columns, summary_tables = task
+    reset_layouts()
     with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        print(f"Total Pages: {total_pages}. Starting extraction...")
+        for i in page_numbers:
+            yield (i,) + read_page(pdf.pages[i], table_settings, fixed_columns, summary_tables)
+
+def _read_page_list(task):
+    # Worker entry point: nothing has to be pickled except the page numbers and the raw
+    # (text, tables) results.
+    return list(_iter_page_list(task))
+
+def _block_pages(block, total_pages):
+    return list(range(block * PAGES_PER_TASK, min((block + 1) * PAGES_PER_TASK, total_pages)))
+
+def _read_blocks(pdf_path, blocks, total_pages, workers, table_settings, fixed_columns, summary_tables=False):
+    # Blocks follow absolute page numbers and are always read whole, so the pages of a block
+    # (and the layouts learned in it) do not depend on where the run starts, on which pages
+    # were cached or on how the blocks are spread over workers
+    tasks = [(pdf_path, _block_pages(b, total_pages), table_settings, fixed_columns, summary_tables)
+             for b in blocks]
+    if workers <= 1:
+        for task in tasks:
+            yield from _iter_page_list(task)
+        return
+
+    with Pool(processes=workers) as pool:
+        # At most MAX_TASKS_IN_FLIGHT blocks per worker are queued or finished but not yet
+        # consumed (pool.imap would buffer every finished block when the caller is slower
+        # than the workers). Results are taken in task order, so pages stay sequential.
+        pending = deque()
+        tasks = iter(tasks)
+        for task in tasks:
+            pending.append(pool.apply_async(_read_page_list, (task,)))
+            if len(pending) >= workers * MAX_TASKS_IN_FLIGHT:
+                break
+        while pending:
+            chunk = pending.popleft().get()
+            task = next(tasks, None)
+            if task is not None:
+                pending.append(pool.apply_async(_read_page_list, (task,)))
+            yield from chunk
+
+def iter_raw_pages(pdf_path, start_page, total_pages, workers=1, table_settings=None, cache=None, fixed_columns=True,
+                   summary_tables=False):
+    # Yields (page_index, text, tables, info) strictly in page order, whatever the worker count.
+    # `info` holds the page class and, for freshly extracted pages, the text/table timings.
+    # Pages already in `cache` are replayed from disk; a block with any miss is re-extracted
+    # whole (pages outside [start_page, total_pages) are only cached, not yielded).
+    pages = range(start_page, total_pages)
+    if cache is not None:
+        missing = sorted(set(i // PAGES_PER_TASK for i in pages if not cache.contains(i)))
+    else:
+        missing = sorted(set(i // PAGES_PER_TASK for i in pages))
+    fresh = _read_blocks(pdf_path, missing, total_pages, workers, table_settings, fixed_columns, summary_tables)
+    missing = set(missing)
+    block = {}
+
+    for i in pages:
+        if i // PAGES_PER_TASK in missing:
+            while i not in block:
+                j, text, tables, info = next(fresh)
+                if cache is not None:
+                    cache.put(j, text, tables)
+                if j >= start_page:
+                    block[j] = (text, tables, info)
+            text, tables, info = block.pop(i)
+        else:
+            hit = cache.get(i)
+            if hit is None:
+                # Entry vanished or is unreadable since the scan above: re-extract its block
+                for j, text, tables, info in _read_blocks(pdf_path, [i // PAGES_PER_TASK], total_pages, 1,
+                                                          table_settings, fixed_columns, summary_tables):
+                    cache.put(j, text, tables)
+                    if j == i:
+                        hit_info = (text, tables, info)
+                text, tables, info = hit_info
+            else:
+                text, tables = hit
+                info = {"page_class": classify_page(text), "cached": True}
+        yield i, text, tables, info
+
+def update_context_from_text(text, state):
+    # Check if this page is a summary page (like "Population Distribution by Council")
+    # Usually these have titles like "Table X.0" or "by Council ... Region" 
+    # while ward tables are "Table X.1", "Table X.2", etc.
+    is_summary_page = False
+    if "Table " in text:
+        table_num_match = re.search(r"Table\s+(\d+)\.0", text)
+        if table_num_match:
+            is_summary_page = True
+
+    # Robust Region Detection
+    region_match = re.search(r"Region\s*\d*:\s*([\w\s]+)", text)
+    if region_match:
+        r_name = region_match.group(1).split('\n')[0].strip().upper()
+        for reg in TZA_REGIONS:
+            if reg in r_name:
+                state["region"] = reg
+                state["council"] = "Unknown"
+                break
+    
+    table_region_match = re.search(r"by Council\s*([\w\s]+)\s*Region", text, re.IGNORECASE)
+    if table_region_match:
+        r_name = table_region_match.group(1).split('\n')[0].strip().upper()
+        for reg in TZA_REGIONS:
+            if reg in r_name:
+                if reg != state["region"]:
+                    state["region"] = reg
+                    state["council"] = "Unknown"
+                break
+
+    council_match = re.search(r"\d+\.\d+\s+([\w\s]+COUNCIL|[\w\s]+DISTRICT|[\w\s]+TOWN|[\w\s]+CITY)", text.upper())
+    if council_match:
+        c_name = council_match.group(1).strip()
+        if len(c_name) < 50:
+            state["council"] = c_name
+
+    return is_summary_page
+
+def split_row_cells(clean_row):
+    numeric_cells = []
+    text_cells = []
+    for idx, cell in enumerate(clean_row):
+        val_clean = cell.replace(',', '').strip()
+        if re.match(r"^\d+[\.,]?\d*$", val_clean):
+            numeric_cells.append(parse_number(cell))
+        else:
+            if cell.strip(): text_cells.append(cell.strip())
+
+    # Skip index number at start (only needed for generic pdfplumber tables; the
+    # fixed-column path already drops the index column)
+    if len(numeric_cells) >= 4 and numeric_cells[0] < 500 and numeric_cells[1] > numeric_cells[0]:
+        numeric_cells = numeric_cells[1:]
+    return numeric_cells, text_cells
+
+def _summary_record(level, state, label, numeric_cells):
+    return {
+        "Level": level,
+        "Region": state["region"],
+        "Council": state["council"],
+        "Name": label,
+        "Total_Pop": numeric_cells[0],
+        "Male_Pop": numeric_cells[1],
+        "Female_Pop": numeric_cells[2]
+    }
+
+def _summary_page_rows(table, state, summaries):
+    # Rows of a "Table X.0 ... by Council" (or by Region) summary table: official council,
+    # region and national totals. The page context is left untouched.
+    rows = []
+    for row in table:
+        numeric_cells, text_cells = split_row_cells([str(c).replace('\n', ' ').strip() if c else '' for c in row])
+        label = " ".join(text_cells)
+        if len(numeric_cells) >= 3 and numeric_cells[0] >= 10 and label and "Sex Ratio" not in label:
+            rows.append((label, numeric_cells))
+    # A table listing regions (rather than the councils of one region) is the national table
+    lists_regions = sum(any(reg in label.upper() for reg in TZA_REGIONS) and not _is_council_name(label.upper())
+                        for label, _ in rows) >= 3
+    for label, numeric_cells in rows:
+        name = label.upper()
+        if _is_council_name(name):
+            summaries.append(_summary_record("council", dict(state, council=label), label, numeric_cells))
+            continue
+        region = next((reg for reg in TZA_REGIONS if reg in name), None)
+        if "TANZANIA" in name or (name == "TOTAL" and lists_regions):
+            summaries.append(_summary_record("national", {"region": "", "council": ""}, label, numeric_cells))
+        elif region is not None and len(name.split()) < 6:
+            summaries.append(_summary_record("region", {"region": region, "council": ""}, label, numeric_cells))
+        elif name == "TOTAL":
+            summaries.append(_summary_record("region", dict(state, council=""), label, numeric_cells))
+
+def _is_council_name(name):
+    return any(kw in name for kw in ["COUNCIL", "DISTRICT", "TOWN", "CITY", "MUNICIPAL"])
+
+def parse_page(text, tables, state, summaries=None):
+    # Row classification for one page. `state` carries the Region/Council context
+    # from the previous page and is updated in place. Council / region total rows are
+    # kept out of the ward records (no double counting) but, if `summaries` is a list,
+    # appended to it for reconciliation against the ward sums.
+    records = []
+    is_summary_page = update_context_from_text(text, state)
+
+    if not tables:
+        return records
         
-        current_region = "Unknown"
-        current_council = "Unknown"
+    for table in tables:
+        header_row = [str(c) for c in table[0] if c]
+        # A ward table usually has "Ward" or "Shehia" in its header, summary tables have "Council"
+        # (Zanzibar uses "Shehia" instead of "Ward")
+        is_granular_table = any("Ward" in h or "Shehia" in h for h in header_row)
         
-        for i in range(start_page, total_pages):
-            page = pdf.pages[i]
-            text = page.extract_text()
+        # If we are on a summary page or it's clearly not a ward/shehia table, be extremely careful:
+        # no ward rows, only the official totals when they are collected
+        if is_summary_page and not is_granular_table:
+            if summaries is not None:
+                _summary_page_rows(table, state, summaries)
+            continue
+
+        for row in table:
+            clean_row = [str(c).replace('\n', ' ').strip() if c else '' for c in row]
+            if not any(clean_row): continue
             
-            if not text:
+            name = clean_row[0]
+            if not name or "Sex Ratio" in str(clean_row) or "Population" in name: continue
+            
+            # Update Region if found in name
+            if name.upper() in TZA_REGIONS or "REGION" in name.upper():
+                 row_text = " ".join(clean_row).upper()
+                 for reg in TZA_REGIONS:
+                     if reg in row_text and len(row_text.split()) < 10:
+                         state["region"] = reg
+                 if summaries is not None:
+                     numeric_cells, text_cells = split_row_cells(clean_row)
+                     if len(numeric_cells) >= 3 and numeric_cells[0] >= 10:
+                         summaries.append(_summary_record("region", state, " ".join(text_cells) or name, numeric_cells))
+                 continue
+
+            # Update council if row indicates a new council context
+            if any(kw in name.upper() for kw in ["COUNCIL", "DISTRICT", "TOWN", "CITY"]):
+                state["council"] = name
+                # We don't skip the row here if it's a ward table, 
+                # but we must skip it if it's acting as a header
+                if not is_granular_table:
+                    if summaries is not None:
+                        numeric_cells, text_cells = split_row_cells(clean_row)
+                        if len(numeric_cells) >= 3 and numeric_cells[0] >= 10:
+                            summaries.append(_summary_record("council", state, " ".join(text_cells) or name, numeric_cells))
+                    continue
+
+            # Extract numbers
+            numeric_cells, text_cells = split_row_cells(clean_row)
+            
+            if len(numeric_cells) < 3: continue
+
+            ward_name = " ".join(text_cells)
+            if not ward_name: ward_name = name
+            
+            # FINAL FILTER: Skip if ward name is essentially a council or summary label
+            w_upper = ward_name.upper()
+            if (any(kw in w_upper for kw in SUMMARY_KEYWORDS)
+                    or w_upper == state["council"].upper() or w_upper == state["region"].upper()):
+                if summaries is not None and numeric_cells[0] >= 10:
+                    is_region = "REGION" in w_upper or w_upper == state["region"].upper()
+                    summaries.append(_summary_record("region" if is_region else "council", state, ward_name, numeric_cells))
                 continue
 
-            # Check if this page is a summary page (like "Population Distribution by Council")
-            # Usually these have titles like "Table X.0" or "by Council ... Region" 
-            # while ward tables are "Table X.1", "Table X.2", etc.
-            is_summary_page = False
-            if "Table " in text:
-                table_num_match = re.search(r"Table\s+(\d+)\.0", text)
-                if table_num_match:
-                    is_summary_page = True
-
-            # Robust Region Detection
-            region_match = re.search(r"Region\s*\d*:\s*([\w\s]+)", text)
-            if region_match:
-                r_name = region_match.group(1).split('\n')[0].strip().upper()
-                for reg in TZA_REGIONS:
-                    if reg in r_name:
-                        current_region = reg
-                        current_council = "Unknown"
-                        break
+            total = numeric_cells[0]
+            male = numeric_cells[1]
+            female = numeric_cells[2]
             
-            table_region_match = re.search(r"by Council\s*([\w\s]+)\s*Region", text, re.IGNORECASE)
-            if table_region_match:
-                r_name = table_region_match.group(1).split('\n')[0].strip().upper()
-                for reg in TZA_REGIONS:
-                    if reg in r_name:
-                        if reg != current_region:
-                            current_region = reg
-                            current_council = "Unknown"
-                        break
-
-            council_match = re.search(r"\d+\.\d+\s+([\w\s]+COUNCIL|[\w\s]+DISTRICT|[\w\s]+TOWN|[\w\s]+CITY)", text.upper())
-            if council_match:
-                c_name = council_match.group(1).strip()
-                if len(c_name) < 50:
-                    current_council = c_name
-
-            tables = page.extract_tables()
-            if not tables:
+            if total < 10: continue
+
+            records.append({
+                "Region": state["region"],
+                "Council": state["council"],
+                "Ward": ward_name,
+                "Total_Pop": total,
+                "Male_Pop": male,
+                "Female_Pop": female
+            })
+
+    return records
+
+# Output columns of the ward-level census table
+RECORD_COLUMNS = ["Region", "Council", "Ward", "Total_Pop", "Male_Pop", "Female_Pop"]
+
+def _record_key(record):
+    # 8-byte digest of a full record: keeps the de-duplication set small no matter how long
+    # the report is, instead of holding every row (or a DataFrame) until the end
+    blob = "\x1f".join(str(record[c]) for c in RECORD_COLUMNS).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(blob, digest_size=8).digest(), 'little')
+
+SUMMARY_COLUMNS = ["Level", "Region", "Council", "Name", "Total_Pop", "Male_Pop", "Female_Pop"]
+
+def _summary_key(summary):
+    return tuple(summary[c] for c in SUMMARY_COLUMNS)
+
+def write_summary_rows(summaries, output_path):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    return len(summaries)
+
+def _update_page_stats(page_stats, info):
+    entry = page_stats.setdefault(info["page_class"], {"pages": 0, "cached": 0, "fixed": 0, "tables": 0,
+                                                       "text_s": 0.0, "tables_s": 0.0})
+    entry["pages"] += 1
+    if info.get("cached"):
+        entry["cached"] += 1
+    else:
+        if info.get("table_method") is not None:
+            entry["tables"] += 1
+        if info.get("table_method") == "fixed":
+            entry["fixed"] += 1
+        entry["text_s"] += info["text_s"]
+        entry["tables_s"] += info["tables_s"]
+
+def print_page_class_report(page_stats):
+    # Time saved is estimated from the mean table-detection time measured on ward pages,
+    # since the skipped pages by definition never ran table detection.
+    ward = page_stats.get(PAGE_WARD_TABLE, {})
+    measured = ward.get("pages", 0) - ward.get("cached", 0)
+    mean_table_s = ward.get("tables_s", 0.0) / measured if measured else 0.0
+
+    print("\nPage classification:")
+    total_saved = 0.0
+    for page_class in PAGE_CLASSES:
+        entry = page_stats.get(page_class)
+        if not entry:
+            continue
+        line = f"  {page_class:<16} {entry['pages']:>5} pages ({entry['cached']} cached)  text {entry['text_s']:.1f}s  tables {entry['tables_s']:.1f}s"
+        if page_class == PAGE_WARD_TABLE:
+            line += f"  ({entry['fixed']} fixed-column)"
+        else:
+            saved = (entry["pages"] - entry["cached"] - entry["tables"]) * mean_table_s
+            total_saved += saved
+            line += f"  ~{saved:.1f}s table detection skipped"
+        print(line)
+    print(f"  Estimated time saved: ~{total_saved:.1f}s ({mean_table_s:.2f}s per skipped page)")
+
+def _page_schema(text, tables, info):
+    # What the page looked like to the extractor: unit label and table width for ward
+    # tables, otherwise just the page class
+    if info["page_class"] != PAGE_WARD_TABLE or not tables:
+        return info["page_class"]
+    return f"{unit_label(text)}/{len(tables[0][0]) if tables[0] else 0}"
+
+def iter_census_pages(pdf_path, start_page=50, workers=1, cache_dir=None, table_settings=TABLE_SETTINGS,
+                      page_stats=None, fixed_columns=True, summary_sink=None):
+    # Streaming core of the extraction: yields (page_index, records) one page at a time with
+    # duplicates already removed (first occurrence wins, same as DataFrame.drop_duplicates).
+    # Per page-class counts and timings are accumulated into `page_stats` if given, and the
+    # council / region total rows (de-duplicated separately) are appended to `summary_sink`.
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found at {pdf_path}. Please run download_census.py first.")
+
+    with pdfplumber.open(pdf_path) as pdf:
+        total_pages = len(pdf.pages)
+    print(f"Total Pages: {total_pages}. Starting extraction ({workers} worker(s))...")
+
+    # Raw page output is cached on disk (keyed by PDF hash, page and table settings), so
+    # iterating on the row classification below replays in seconds instead of re-running
+    # table detection on every page.
+    summary_tables = summary_sink is not None
+    cache_settings = {"tables": table_settings, "classifier": CLASSIFIER_VERSION,
+                      "layout": LAYOUT_VERSION if fixed_columns else None, "summary_tables": summary_tables}
+    cache = PageCache(cache_dir, pdf_path, cache_settings) if cache_dir else None
+    if page_stats is None:
+        page_stats = {}
+
+    # Table detection is farmed out to `workers` processes, but the Region/Council context is
+    # resolved here in a single in-order pass over the raw pages. The context therefore never
+    # depends on which process finished first, and a parallel run is row-for-row identical
+    # to a serial one.
+    state = {"region": "Unknown", "council": "Unknown"}
+    seen = set()
+    seen_summaries = set()
+    summaries = [] if summary_sink is not None else None
+    profiler = get_profiler()
+
+    with profiler.stage("extract_census"):
+        for i, text, tables, info in iter_raw_pages(pdf_path, start_page, total_pages, workers, table_settings, cache,
+                                                    fixed_columns, summary_tables):
+            _update_page_stats(page_stats, info)
+            if not text:
                 continue
-                
-            for table in tables:
-                header_row = [str(c) for c in table[0] if c]
-                # A ward table usually has "Ward" or "Shehia" in its header, summary tables have "Council"
-                # (Zanzibar uses "Shehia" instead of "Ward")
-                is_granular_table = any("Ward" in h or "Shehia" in h for h in header_row)
-                
-                # If we are on a summary page or it's clearly not a ward/shehia table, be extremely careful
-                if is_summary_page and not is_granular_table:
-                    continue
 
-                for row in table:
-                    clean_row = [str(c).replace('\n', ' ').strip() if c else '' for c in row]
-                    if not any(clean_row): continue
-                    
-                    name = clean_row[0]
-                    if not name or "Sex Ratio" in str(clean_row) or "Population" in name: continue
-                    
-                    # Update Region if found in name
-                    if name.upper() in TZA_REGIONS or "REGION" in name.upper():
-                         row_text = " ".join(clean_row).upper()
-                         for reg in TZA_REGIONS:
-                             if reg in row_text and len(row_text.split()) < 10:
-                                 current_region = reg
-                         continue
-
-                    # Update council if row indicates a new council context
-                    if any(kw in name.upper() for kw in ["COUNCIL", "DISTRICT", "TOWN", "CITY"]):
-                        current_council = name
-                        # We don't skip the row here if it's a ward table, 
-                        # but we must skip it if it's acting as a header
-                        if not is_granular_table: continue
-
-                    # Extract numbers
-                    numeric_cells = []
-                    text_cells = []
-                    for idx, cell in enumerate(clean_row):
-                        val_clean = cell.replace(',', '').strip()
-                        if re.match(r"^\d+[\.,]?\d*$", val_clean):
-                            numeric_cells.append(parse_number(cell))
-                        else:
-                            if cell.strip(): text_cells.append(cell.strip())
-                    
-                    if len(numeric_cells) < 3: continue
-
-                    # Skip index number at start
-                    if len(numeric_cells) >= 4 and numeric_cells[0] < 500 and numeric_cells[1] > numeric_cells[0]:
-                        numeric_cells = numeric_cells[1:]
-
-                    ward_name = " ".join(text_cells)
-                    if not ward_name: ward_name = name
-                    
-                    # FINAL FILTER: Skip if ward name is essentially a council or summary label
-                    w_upper = ward_name.upper()
-                    if any(kw in w_upper for kw in SUMMARY_KEYWORDS):
-                        continue
-                    if w_upper == current_council.upper() or w_upper == current_region.upper():
-                        continue
-
-                    total = numeric_cells[0]
-                    male = numeric_cells[1]
-                    female = numeric_cells[2]
-                    
-                    if total < 10: continue
-
-                    data.append({
-                        "Region": current_region,
-                        "Council": current_council,
-                        "Ward": ward_name,
-                        "Total_Pop": total,
-                        "Male_Pop": male,
-                        "Female_Pop": female
-                    })
-                    
+            t0 = time.perf_counter()
+            records = []
+            for record in parse_page(text, tables, state, summaries):
+                key = _record_key(record)
+                if key not in seen:
+                    seen.add(key)
+                    records.append(record)
+
+            if profiler.enabled:
+                parse_s = time.perf_counter() - t0
+                cached = bool(info.get("cached"))
+                profiler.page(i, page_class=info["page_class"], schema=_page_schema(text, tables, info),
+                              table_method=info.get("table_method"), cached=cached,
+                              text_s=None if cached else info["text_s"],
+                              tables_s=None if cached else info["tables_s"], parse_s=parse_s,
+                              total_s=None if cached else info["text_s"] + info["tables_s"] + parse_s,
+                              records=len(records))
+
+            if summaries:
+                for summary in summaries:
+                    key = _summary_key(summary)
+                    if key not in seen_summaries:
+                        seen_summaries.add(key)
+                        summary_sink.append(summary)
+                summaries.clear()
+
             if i % 20 == 0:
-                print(f"Processed page {i}/{total_pages} ({current_region} / {current_council})...")
+                print(f"Processed page {i}/{total_pages} ({state['region']} / {state['council']})...")
+
+            yield i, records
+
+        profiler.count("extract.pages", sum(e["pages"] for e in page_stats.values()))
+        profiler.count("extract.records", len(seen))
+        if cache is not None:
+            profiler.count("extract.cache_hits", cache.hits)
+
+    if cache is not None:
+        print(f"Page cache: {cache.hits} pages replayed, {cache.stores} pages extracted and stored.")
+        cache.enforce_size_cap()
+    print_page_class_report(page_stats)
+
+def iter_census_records(pdf_path, start_page=50, workers=1, cache_dir=None, table_settings=TABLE_SETTINGS,
+                        fixed_columns=True):
+    for _, records in iter_census_pages(pdf_path, start_page, workers, cache_dir, table_settings,
+                                        fixed_columns=fixed_columns):
+        yield from records
+
+def write_census_stream(pages, output_path, fmt=None, row_group_size=5000):
+    # Appends the records of each page to `output_path` as they arrive. CSV is flushed after
+    # every page; Parquet is written in row groups of `row_group_size` and the footer is
+    # written even if the extraction fails part-way, so an interrupted run still leaves a
+    # readable partial file.
+    fmt = fmt or ("parquet" if output_path.endswith(".parquet") else "csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    n_rows = 0
+
+    if fmt == "csv":
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_COLUMNS)
+            writer.writeheader()
+            for _, records in pages:
+                writer.writerows(records)
+                f.flush()
+                n_rows += len(records)
+        return n_rows
+
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow).")
+
+        schema = pa.schema([
+            ("Region", pa.string()), ("Council", pa.string()), ("Ward", pa.string()),
+            ("Total_Pop", pa.int64()), ("Male_Pop", pa.int64()), ("Female_Pop", pa.int64()),
+        ])
+        buffer = []
+        with pq.ParquetWriter(output_path, schema) as writer:
+            try:
+                for _, records in pages:
+                    buffer.extend(records)
+                    if len(buffer) >= row_group_size:
+                        writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+                        n_rows += len(buffer)
+                        buffer = []
+            finally:
+                # Flush whatever was parsed before a failure so the partial file is complete
+                # up to the last processed page
+                if buffer:
+                    writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+                    n_rows += len(buffer)
+        return n_rows
+
+    raise ValueError(f"Unsupported output format: {fmt}")
+
+def extract_census(pdf_path, start_page=50, workers=1, cache_dir=None, table_settings=TABLE_SETTINGS,
+                   fixed_columns=True):
+    if not os.path.exists(pdf_path):
+        print(f"Error: PDF file not found at {pdf_path}. Please run download_census.py first.")
+        return None
 
-    df = pd.DataFrame(data)
-    df = df.drop_duplicates()
+    data = list(iter_census_records(pdf_path, start_page, workers, cache_dir, table_settings, fixed_columns))
+    df = pd.DataFrame(data, columns=RECORD_COLUMNS)
     print(f"\nExtraction complete. Found {len(df)} records.")
     return df
 
@@ -169,8 +603,17 @@ if __name__ == "__main__":
     ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     input_pdf = os.path.join(ROOT, "data", "raw", "TZA_2022_Census_Vol1A.pdf")
     output_csv = os.path.join(ROOT, "data", "processed", "tza_census_2022_wards_clean.csv")
+    summary_csv = os.path.join(ROOT, "data", "processed", "tza_census_2022_summary_rows.csv")
+    cache_dir = os.path.join(ROOT, "data", "cache", "pages")
     
-    df = extract_census(input_pdf)
-    if df is not None:
-        df.to_csv(output_csv, index=False)
+    if not os.path.exists(input_pdf):
+        print(f"Error: PDF file not found at {input_pdf}. Please run download_census.py first.")
+    else:
+        summaries = []
+        pages = iter_census_pages(input_pdf, workers=os.cpu_count() or 1, cache_dir=cache_dir,
+                                  summary_sink=summaries)
+        n_rows = write_census_stream(pages, output_csv)
+        write_summary_rows(summaries, summary_csv)
+        print(f"\nExtraction complete. Found {n_rows} records.")
         print(f"Saved cleaned census data to: {output_csv}")
+        print(f"Saved {len(summaries)} council/region total rows to: {summary_csv}")
@@ -0,0 +1,71 @@
+import importlib
+import os
+import time
+from multiprocessing import Pool
+from profiling import get_profiler
+
+# A figure spec is a plain dict, so spec lists can be built in code or loaded from JSON:
+#   {"func": "analysis.render_zoom",      # "module.function" taking (data, **kwargs)
+#    "data": "tza",                       # key into the shared datasets dict
+#    "kwargs": {...}}                     # keyword arguments, typically incl. output_path
+# Specs run in list order (put the most expensive ones first for the best packing).
+
+# Datasets shared with the worker processes. Set once per worker by the pool initializer:
+# with fork they are inherited from the parent, with spawn they are pickled once per worker,
+# so the GeoPackage is read from disk exactly once either way.
+_DATASETS = {}
+
+def _init_worker(datasets):
+    global _DATASETS
+    _DATASETS = datasets
+    # Workers only ever write files
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+
+def _resolve(func_name):
+    module_name, attr = func_name.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+def run_spec(spec, datasets=None):
+    datasets = _DATASETS if datasets is None else datasets
+    t0 = time.perf_counter()
+    func = _resolve(spec["func"])
+    result = func(datasets[spec["data"]], **spec.get("kwargs", {}))
+    return {"func": spec["func"], "output": result, "seconds": time.perf_counter() - t0, "pid": os.getpid()}
+
+def render_figures(datasets, specs, workers=1):
+    # Renders every spec, concurrently when workers > 1. Returns one result dict per spec
+    # (function, output path, seconds, worker pid) in completion order.
+    results = []
+    profiler = get_profiler()
+    t0 = time.perf_counter()
+    with profiler.stage("render_figures"):
+        if workers <= 1 or len(specs) <= 1:
+            for spec in specs:
+                results.append(run_spec(spec, datasets))
+        else:
+            with Pool(processes=min(workers, len(specs)), initializer=_init_worker, initargs=(datasets,)) as pool:
+                for result in pool.imap_unordered(run_spec, specs):
+                    print(f"  done: {result['func']} -> {result['output']} ({result['seconds']:.1f}s)")
+                    results.append(result)
+
+    # Per-figure times are measured where the figure was rendered, possibly another process
+    for r in results:
+        profiler.timing(f"figure:{os.path.basename(str(r['output']))}", r["seconds"])
+    busy = sum(r["seconds"] for r in results)
+    print(f"Rendered {len(results)} figure(s) in {time.perf_counter() - t0:.1f}s wall ({busy:.1f}s of work).")
+    return results
+
+if __name__ == "__main__":
+    # Standard analysis figures plus one zoom per region, spread over all cores
+    from analysis import load_mapped_layer, default_figure_specs, region_zoom_specs
+
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    GPKG_PATH = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+    OUTPUT_DIR = os.path.join(ROOT, "data", "processed")
+    ZOOM_DIR = os.path.join(OUTPUT_DIR, "region_zooms")
+    os.makedirs(ZOOM_DIR, exist_ok=True)
+
+    gdf = load_mapped_layer(GPKG_PATH)
+    specs = default_figure_specs(OUTPUT_DIR) + region_zoom_specs(gdf, ZOOM_DIR)
+    render_figures({"tza": gdf}, specs, workers=os.cpu_count() or 1)
@@ -1,7 +1,13 @@
 import geopandas as gpd
 import pandas as pd
+import numpy as np
 import re
 import os
+from functools import lru_cache
+from fuzzy_match import build_block_index, fuzzy_match
+from area_engine import geometry_areas_sqkm
+from mapped_store import write_geoparquet, parquet_path_for
+from profiling import get_profiler
 
 # Manual name overrides to fix known mismatches between Shapefile and Census
 # (Shapefile Name: Census Name)
@@ -15,18 +21,122 @@ NAME_OVERRIDES = {
     "KIHANGIMAHUKA": "KIHANGI MAHUKA"
 }
 
+ADMIN_WORDS_RE = re.compile(r"\b(DISTRICT|COUNCIL|TOWN|CITY|MUNICIPAL|HALMASHAURI|WILAYA|YA|WA|LA)\b")
+LEADING_INDEX_RE = re.compile(r"^\d+[\s\.]+")
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+# Bound on the memo of normalized names. Admin names repeat heavily (31 regions, ~190
+# councils, ~4,000 wards), so a memo of this size covers a full run without growing with
+# the input when the functions are reused on other layers.
+NORMALIZED_MEMO_SIZE = 65536
+
 def normalize_text(text):
+    # Missing values (None, NaN, pd.NA) normalize to an empty name
+    if text is None or (not isinstance(text, str) and pd.isna(text)): return ""
+    return _normalize_name(str(text))
+
+@lru_cache(maxsize=NORMALIZED_MEMO_SIZE)
+def _normalize_name(text):
     if not text: return ""
-    text = str(text).upper()
+    text = text.upper()
     if text in NAME_OVERRIDES:
         text = NAME_OVERRIDES[text]
     
-    text = re.sub(r"\b(DISTRICT|COUNCIL|TOWN|CITY|MUNICIPAL|HALMASHAURI|WILAYA|YA|WA|LA)\b", "", text)
-    text = re.sub(r"^\d+[\s\.]+", "", text)
-    text = re.sub(r"[^\w\s]", " ", text)
+    text = ADMIN_WORDS_RE.sub("", text)
+    text = LEADING_INDEX_RE.sub("", text)
+    text = PUNCTUATION_RE.sub(" ", text)
     return " ".join(text.split())
 
-def finalize_mapping(raw_shp_dir, census_csv_path, output_path):
+def normalize_series(values):
+    # Same result as values.apply(normalize_text), but each distinct value is normalized once:
+    # factorize, normalize the uniques (through the memo), broadcast back via the codes.
+    # Missing values get code -1, which picks the trailing "" placeholder.
+    codes, uniques = pd.factorize(values)
+    normalized = [normalize_text(u) for u in uniques]
+    normalized.append("")
+    out = np.array(normalized, dtype=object).take(codes)
+    return pd.Series(out, index=values.index)
+
+def clear_normalization_memo():
+    _normalize_name.cache_clear()
+
+def fuzzy_join(merged, df_census, review_path, min_score=0.85):
+    # 3rd stage: approximate ward-name matching for polygons both exact joins missed, only
+    # against census wards of the same region + district that no polygon has claimed yet.
+    # Writes every scored candidate to `review_path` so accepted matches can be checked and
+    # promoted to NAME_OVERRIDES.
+    matched = merged['Total_Pop'].notnull()
+    used_rdw = set(zip(merged.loc[matched, 'reg_norm'], merged.loc[matched, 'dist_norm'], merged.loc[matched, 'ward_norm']))
+    used_rw = set((r, w) for r, d, w in used_rdw)
+    free = [(r, d, w) not in used_rdw and (r, w) not in used_rw
+            for r, d, w in zip(df_census['reg_norm'], df_census['dist_norm'], df_census['ward_norm'])]
+    pool = df_census[free]
+
+    blocks = build_block_index(zip(pool['reg_norm'], pool['dist_norm']), pool['ward_norm'], pool.index)
+    queries = merged[~matched]
+    candidates, accepted = fuzzy_match(
+        zip(queries['reg_norm'], queries['dist_norm']), queries['ward_norm'], queries.index,
+        blocks, min_score=min_score
+    )
+
+    if accepted:
+        idx = list(accepted.keys())
+        rows = df_census.loc[list(accepted.values()), ['Total_Pop', 'Male_Pop', 'Female_Pop']]
+        merged.loc[idx, ['Total_Pop', 'Male_Pop', 'Female_Pop']] = rows.values
+
+    review = pd.DataFrame(candidates, columns=['query_id', 'query_name', 'candidate_name', 'candidate_id',
+                                               'rank', 'score', 'trigram_jaccard', 'accepted'])
+    if not review.empty:
+        review = review.join(merged[['reg_name', 'dist_name', 'ward_name']], on='query_id')
+        review = review.join(df_census[['Region', 'Council', 'Ward']], on='candidate_id')
+    review.to_csv(review_path, index=False)
+    print(f"Fuzzy matches accepted: {len(accepted)} (review file: {review_path})")
+    return merged
+
+def normalize_inputs(df_census, gdf):
+    # Adds the *_norm join keys to both frames (gdf in place); returns the census frame
+    # without duplicate keys
+    df_census['reg_norm'] = normalize_series(df_census['Region'])
+    df_census['dist_norm'] = normalize_series(df_census['Council'])
+    df_census['ward_norm'] = normalize_series(df_census['Ward'])
+    
+    df_census = df_census.drop_duplicates(subset=['reg_norm', 'dist_norm', 'ward_norm'])
+
+    gdf['reg_norm'] = normalize_series(gdf['reg_name'])
+    gdf['dist_norm'] = normalize_series(gdf['dist_name'])
+    gdf['ward_norm'] = normalize_series(gdf['ward_name'])
+    return df_census
+
+def primary_join(gdf, df_census):
+    return gdf.merge(
+        df_census[['reg_norm', 'dist_norm', 'ward_norm', 'Total_Pop', 'Male_Pop', 'Female_Pop']], 
+        on=['reg_norm', 'dist_norm', 'ward_norm'], 
+        how='left'
+    )
+
+def secondary_join(merged, df_census):
+    # Region + Ward only, for the rows the primary join left without population
+    unmatched_mask = merged['Total_Pop'].isnull()
+    census_unique_rw = df_census.drop_duplicates(subset=['reg_norm', 'ward_norm'])
+    
+    temp_key = merged.loc[unmatched_mask, ['reg_norm', 'ward_norm']]
+    sec_matches = temp_key.merge(
+        census_unique_rw[['reg_norm', 'ward_norm', 'Total_Pop', 'Male_Pop', 'Female_Pop']],
+        on=['reg_norm', 'ward_norm'],
+        how='left'
+    )
+    merged.loc[unmatched_mask, ['Total_Pop', 'Male_Pop', 'Female_Pop']] = sec_matches[['Total_Pop', 'Male_Pop', 'Female_Pop']].values
+    return merged
+
+def finalize_mapping(raw_shp_dir, census_csv_path, output_path, fuzzy_min_score=0.85, area_cache_dir=None,
+                     write_parquet=True):
+    profiler = get_profiler()
+    with profiler.stage("finalize_mapping"):
+        return _finalize_mapping(raw_shp_dir, census_csv_path, output_path, fuzzy_min_score, area_cache_dir,
+                                 write_parquet, profiler)
+
+def _finalize_mapping(raw_shp_dir, census_csv_path, output_path, fuzzy_min_score, area_cache_dir, write_parquet,
+                      profiler):
     print("Loading data...")
     df_census = pd.read_csv(census_csv_path)
     
@@ -41,60 +151,77 @@ def finalize_mapping(raw_shp_dir, census_csv_path, output_path):
         print("Error: Could not find shapefile in the raw data directory.")
         return
 
-    gdf = gpd.read_file(shp_file, engine="pyogrio")
+    with profiler.stage("load_layer"):
+        gdf = gpd.read_file(shp_file, engine="pyogrio")
+    profiler.count("map.wards", len(gdf))
+    profiler.count("map.census_rows", len(df_census))
     
-    print(f"Normalizing datasets for merging...")
-    df_census['reg_norm'] = df_census['Region'].apply(normalize_text)
-    df_census['dist_norm'] = df_census['Council'].apply(normalize_text)
-    df_census['ward_norm'] = df_census['Ward'].apply(normalize_text)
-    
-    df_census = df_census.drop_duplicates(subset=['reg_norm', 'dist_norm', 'ward_norm'])
-
-    gdf['reg_norm'] = gdf['reg_name'].apply(normalize_text)
-    gdf['dist_norm'] = gdf['dist_name'].apply(normalize_text)
-    gdf['ward_norm'] = gdf['ward_name'].apply(normalize_text)
+    print("Normalizing datasets for merging...")
+    with profiler.stage("normalize"):
+        df_census = normalize_inputs(df_census, gdf)
     
     # 1. Primary Join
-    merged = gdf.merge(
-        df_census[['reg_norm', 'dist_norm', 'ward_norm', 'Total_Pop', 'Male_Pop', 'Female_Pop']], 
-        on=['reg_norm', 'dist_norm', 'ward_norm'], 
-        how='left'
-    )
+    with profiler.stage("primary_join"):
+        merged = primary_join(gdf, df_census)
+    matched = merged['Total_Pop'].notnull().sum()
+    profiler.count("map.matched.primary", int(matched))
+    print(f"Unmatched after primary join: {len(merged) - matched}")
     
     # 2. Secondary Join for unmatched (Region + Ward only)
-    unmatched_mask = merged['Total_Pop'].isnull()
-    print(f"Unmatched after primary join: {unmatched_mask.sum()}")
-    
-    census_unique_rw = df_census.drop_duplicates(subset=['reg_norm', 'ward_norm'])
-    
-    temp_key = merged.loc[unmatched_mask, ['reg_norm', 'ward_norm']]
-    sec_matches = temp_key.merge(
-        census_unique_rw[['reg_norm', 'ward_norm', 'Total_Pop', 'Male_Pop', 'Female_Pop']],
-        on=['reg_norm', 'ward_norm'],
-        how='left'
-    )
-    merged.loc[unmatched_mask, ['Total_Pop', 'Male_Pop', 'Female_Pop']] = sec_matches[['Total_Pop', 'Male_Pop', 'Female_Pop']].values
+    with profiler.stage("secondary_join"):
+        merged = secondary_join(merged, df_census)
+    secondary_count = merged['Total_Pop'].notnull().sum()
+    profiler.count("map.matched.secondary", int(secondary_count - matched))
+
+    # 3. Fuzzy Join for what is still unmatched (same Region + District only)
+    print(f"Unmatched after secondary join: {len(merged) - secondary_count}")
+    review_path = os.path.splitext(output_path)[0] + "_fuzzy_review.csv"
+    with profiler.stage("fuzzy_join"):
+        merged = fuzzy_join(merged, df_census, review_path, fuzzy_min_score)
 
     final_match_count = merged['Total_Pop'].notnull().sum()
+    profiler.count("map.matched.fuzzy", int(final_match_count - secondary_count))
+    profiler.count("map.unmatched", int(len(merged) - final_match_count))
     print(f"Final Matched: {final_match_count} / {len(gdf)} ({final_match_count/len(gdf)*100:.2f}%)")
     
-    # 3. Spatial Calculations
-    print("Calculating area and population density (UTM 37S)...")
+    # 4. Spatial Calculations
+    print("Calculating area and population density (equal-area projection)...")
     if merged.crs is None:
         merged.set_crs(epsg=4326, inplace=True)
     
-    # Project to UTM Zone 37S (EPSG:32737) for accurate area in meters
-    gdf_projected = merged.to_crs(epsg=32737)
-    merged['area_sqkm'] = gdf_projected.area / 10**6
+    # Equal-area projection fitted to the layer, computed on the geometry array only
+    # (UTM 37S distorted the western regions, which lie outside its zone)
+    # The joins keep one row per shapefile polygon in file order, so cached areas can be keyed
+    # on the shapefile itself
+    with profiler.stage("area"):
+        source = shp_file if len(merged) == len(gdf) else None
+        merged['area_sqkm'] = geometry_areas_sqkm(merged.geometry, cache_dir=area_cache_dir, source_path=source)
     merged['density'] = merged['Total_Pop'] / merged['area_sqkm']
     
     # Save output
     cols_to_keep = [col for col in gdf.columns if not col.endswith('_norm')] + \
                    ['Total_Pop', 'Male_Pop', 'Female_Pop', 'area_sqkm', 'density']
     
-    merged[cols_to_keep].to_file(output_path, driver="GPKG")
+    with profiler.stage("write_gpkg"):
+        merged[cols_to_keep].to_file(output_path, driver="GPKG")
     print(f"Saved integrated geospatial dataset to: {output_path}")
 
+    # Columnar copy for the analysis scripts (needs pyarrow). When it is not written, a copy
+    # from an earlier run is removed so nothing downstream reads stale data.
+    parquet_path = parquet_path_for(output_path)
+    written = False
+    if write_parquet:
+        try:
+            with profiler.stage("write_parquet"):
+                write_geoparquet(merged[cols_to_keep], parquet_path)
+            written = True
+            print(f"Saved GeoParquet copy to: {parquet_path}")
+        except ImportError as e:
+            print(f"Skipping GeoParquet output ({e}).")
+    if not written and os.path.exists(parquet_path):
+        os.remove(parquet_path)
+        print(f"Removed outdated GeoParquet copy: {parquet_path}")
+
 if __name__ == "__main__":
     # Internal paths relative to the project root
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -103,5 +230,6 @@ if __name__ == "__main__":
     RAW_SHP = os.path.join(ROOT, "data", "raw", "en-1714652282-TANZANIA_2022PHC_WARD_SHAPEFILES")
     RAW_CENSUS = os.path.join(ROOT, "data", "processed", "tza_census_2022_wards_clean.csv")
     OUTPUT = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+    AREA_CACHE = os.path.join(ROOT, "data", "cache", "areas")
     
-    finalize_mapping(RAW_SHP, RAW_CENSUS, OUTPUT)
+    finalize_mapping(RAW_SHP, RAW_CENSUS, OUTPUT, area_cache_dir=AREA_CACHE)
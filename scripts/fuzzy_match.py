@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+# Padding marks word boundaries so prefixes/suffixes weigh as much as the middle of a name
+def trigrams(name):
+    padded = f"$${name}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_similarity(a, b):
+    # 1 - Levenshtein distance / longer length, in [0, 1]
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / len(a)
+
+class TrigramIndex:
+    # Inverted index trigram -> entry ids for one block (e.g. one region + district).
+    # Candidate generation only touches entries sharing at least one trigram with the query,
+    # so the cost per query depends on the block's vocabulary, never on all pairs.
+
+    def __init__(self):
+        self.postings = defaultdict(list)
+        self.names = []
+        self.grams = []
+        self.payloads = []
+
+    def add(self, name, payload):
+        entry_id = len(self.names)
+        grams = trigrams(name)
+        self.names.append(name)
+        self.grams.append(len(grams))
+        self.payloads.append(payload)
+        for g in grams:
+            self.postings[g].append(entry_id)
+
+    def search(self, name, top_k=3):
+        # Returns [(score, jaccard, name, payload)] best first. Trigram overlap shortlists the
+        # candidates, edit similarity ranks them.
+        grams = trigrams(name)
+        overlap = defaultdict(int)
+        for g in grams:
+            for entry_id in self.postings.get(g, ()):
+                overlap[entry_id] += 1
+        if not overlap:
+            return []
+
+        shortlist = sorted(overlap, key=overlap.get, reverse=True)[:top_k * 4]
+        results = []
+        for entry_id in shortlist:
+            jaccard = overlap[entry_id] / (len(grams) + self.grams[entry_id] - overlap[entry_id])
+            score = edit_similarity(name, self.names[entry_id])
+            results.append((score, jaccard, self.names[entry_id], self.payloads[entry_id]))
+        results.sort(key=lambda r: (r[0], r[1]), reverse=True)
+        return results[:top_k]
+
+def build_block_index(keys, names, payloads):
+    # keys: block key per entry (e.g. (reg_norm, dist_norm)); one TrigramIndex per block
+    blocks = defaultdict(TrigramIndex)
+    for key, name, payload in zip(keys, names, payloads):
+        blocks[key].add(name, payload)
+    return blocks
+
+def fuzzy_match(query_keys, query_names, query_ids, blocks, min_score=0.85, min_margin=0.05, top_k=3):
+    # Scores every query against its own block only. Returns (candidates, accepted):
+    # - candidates: one dict per (query, candidate) for the review file
+    # - accepted: {query_id: payload}, each payload used at most once, best scores first
+    candidates = []
+    proposals = []
+    for key, name, query_id in zip(query_keys, query_names, query_ids):
+        index = blocks.get(key)
+        if index is None or not name:
+            continue
+        results = index.search(name, top_k)
+        for rank, (score, jaccard, cand_name, payload) in enumerate(results, 1):
+            candidates.append({
+                "query_id": query_id,
+                "query_name": name,
+                "candidate_name": cand_name,
+                "candidate_id": payload,
+                "rank": rank,
+                "score": round(score, 4),
+                "trigram_jaccard": round(jaccard, 4),
+            })
+        if results and results[0][0] >= min_score:
+            runner_up = results[1][0] if len(results) > 1 else 0.0
+            if results[0][0] - runner_up >= min_margin:
+                proposals.append((results[0][0], query_id, results[0][3]))
+
+    accepted = {}
+    used = set()
+    for score, query_id, payload in sorted(proposals, key=lambda p: p[0], reverse=True):
+        if payload in used:
+            continue
+        used.add(payload)
+        accepted[query_id] = payload
+    for c in candidates:
+        c["accepted"] = accepted.get(c["query_id"]) == c["candidate_id"]
+    return candidates, accepted
@@ -0,0 +1,75 @@
+import geopandas as gpd
+import pandas as pd
+import os
+
+# Columnar (GeoParquet) copy of the mapped ward layer, written next to the GeoPackage.
+# Compared with the GPKG it stores:
+# - region / council names as categoricals (dictionary-encoded, 31 / ~190 distinct values)
+# - populations as nullable Int32 instead of NaN-filled float64
+# - geometry as WKB, which is only decoded when the geometry column is requested
+# Rows are sorted by region and council, so row-group statistics let filters such as
+# [("reg_name", "==", "Dar es Salaam")] skip most of the file.
+
+CATEGORICAL_COLUMNS = ["reg_name", "dist_name"]
+POPULATION_COLUMNS = ["Total_Pop", "Male_Pop", "Female_Pop"]
+ROW_GROUP_SIZE = 512
+
+def compact_dtypes(gdf):
+    out = gdf.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    for col in POPULATION_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].round().astype("Int32")
+    return out
+
+def write_geoparquet(gdf, path, row_group_size=ROW_GROUP_SIZE):
+    sort_cols = [c for c in CATEGORICAL_COLUMNS if c in gdf.columns]
+    if sort_cols:
+        gdf = gdf.sort_values(sort_cols, kind="stable")
+    compact_dtypes(gdf).to_parquet(path, index=False, compression="zstd", row_group_size=row_group_size)
+    return path
+
+def load_mapped(path, columns=None, filters=None):
+    # Loads the mapped layer from .parquet or .gpkg. With Parquet, `columns` and `filters`
+    # are pushed down to pyarrow; if "geometry" is not among the columns a plain DataFrame
+    # is returned and no geometry is decoded at all.
+    if path.endswith(".parquet"):
+        if columns is not None and "geometry" not in columns:
+            return pd.read_parquet(path, columns=columns, filters=filters)
+        return gpd.read_parquet(path, columns=columns, filters=filters)
+
+    if filters is not None:
+        raise ValueError("Row filters are only supported for GeoParquet input.")
+    if columns is not None and "geometry" not in columns:
+        return gpd.read_file(path, engine="pyogrio", columns=columns, read_geometry=False)
+    gdf = gpd.read_file(path, engine="pyogrio",
+                        columns=[c for c in columns if c != "geometry"] if columns else None)
+    if gdf.crs is None:
+        gdf.set_crs(epsg=4326, inplace=True)
+    return gdf
+
+def parquet_path_for(gpkg_path):
+    return os.path.splitext(gpkg_path)[0] + ".parquet"
+
+def mapped_source_path(gpkg_path):
+    # The GeoParquet copy when it is at least as new as the GeoPackage (finalize_mapping
+    # writes it second), otherwise the GeoPackage: a copy left over from an earlier run
+    # never shadows a fresh GeoPackage
+    parquet_path = parquet_path_for(gpkg_path)
+    if os.path.exists(parquet_path) and (not os.path.exists(gpkg_path)
+                                         or os.path.getmtime(parquet_path) >= os.path.getmtime(gpkg_path)):
+        return parquet_path
+    return gpkg_path
+
+def load_mapped_layer(gpkg_path, path=None):
+    # Prefer the GeoParquet copy written by finalize_mapping when it is up to date (or read
+    # `path`, as resolved by the caller)
+    path = path or mapped_source_path(gpkg_path)
+    print(f"Loading data from {path}...")
+    gdf = load_mapped(path)
+    
+    if gdf.crs is None:
+        gdf.set_crs(epsg=4326, inplace=True)
+    return gdf
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import shutil
+
+# Bump whenever the layout of a cache entry changes; old entries are then simply ignored
+# and eventually evicted by the size cap.
+CACHE_VERSION = 1
+
+# Default upper bound for the whole cache directory (all PDFs and table settings together)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def settings_key(settings):
+    # Stable short hash of the extraction settings (pdfplumber table settings, page
+    # classifier version, ...); None and {} both mean "defaults"
+    blob = json.dumps(settings or {}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()[:16]
+
+class PageCache:
+    # On-disk store of per-page raw output (text layer + extract_tables() result).
+    # Entries live under <cache_dir>/v<version>/<pdf sha256>/<settings hash>/page_XXXX.json,
+    # so a different PDF or different extraction settings never see each other's pages.
+
+    def __init__(self, cache_dir, pdf_path, settings=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.pdf_hash = file_sha256(pdf_path)
+        self.dir = os.path.join(cache_dir, f"v{CACHE_VERSION}", self.pdf_hash, settings_key(settings))
+        os.makedirs(self.dir, exist_ok=True)
+        self.hits = 0
+        self.stores = 0
+
+    def _path(self, page_no):
+        return os.path.join(self.dir, f"page_{page_no:04d}.json")
+
+    def contains(self, page_no):
+        return os.path.exists(self._path(page_no))
+
+    def get(self, page_no):
+        path = self._path(page_no)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            # Missing or unreadable entry: treat as a miss, the caller re-extracts and rewrites it
+            return None
+        # Touch the entry so eviction is least-recently-used rather than oldest-written
+        os.utime(path)
+        self.hits += 1
+        return entry['text'], entry['tables']
+
+    def put(self, page_no, text, tables):
+        path = self._path(page_no)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"page": page_no, "text": text, "tables": tables}, f)
+        # Atomic rename: an interrupted run never leaves a truncated entry behind
+        os.replace(tmp_path, path)
+        self.stores += 1
+
+    def invalidate(self):
+        # Drop every cached page for this PDF + settings combination
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def enforce_size_cap(self):
+        # Evict least-recently-used entries (across all PDFs/settings) until under max_bytes
+        entries = []
+        total = 0
+        for root, dirs, files in os.walk(self.cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        removed = 0
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+
+        # Clean up directories emptied by eviction
+        for root, dirs, files in os.walk(self.cache_dir, topdown=False):
+            if root != self.cache_dir and not os.listdir(root):
+                os.rmdir(root)
+        return removed
+
+def clear_cache(cache_dir):
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,400 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from profiling import RunProfiler, enable_profiling, get_profiler, set_profiler, PROFILE_ENV
+
+# Incremental runner for the whole workflow: download -> extract -> map -> figures / stats /
+# clusters / rollups / crosswalk.
+# Every stage is fingerprinted from its input files, its code files and its parameters; a
+# stage whose fingerprint is unchanged and whose outputs are untouched is skipped. Stages
+# whose dependencies are satisfied run concurrently (e.g. both downloads, figures + stats).
+#
+#   python scripts/pipeline.py                  # bring everything up to date
+#   python scripts/pipeline.py figures          # only what `figures` needs
+#   python scripts/pipeline.py --dry-run        # show what would run
+#   python scripts/pipeline.py --force extract  # rerun a stage regardless of fingerprints
+#   python scripts/pipeline.py --profile        # also write data/reports/run_report.json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SCRIPT_DIR)
+
+def _data(*parts):
+    return os.path.join(ROOT, "data", *parts)
+
+# Download URLs, paths and pinned checksums come from the manifest, so the pipeline and
+# `python scripts/download_census.py` fetch (and verify) the same artifacts
+MANIFEST = _data("raw", "manifest.json")
+
+def _manifest_artifact(name):
+    with open(MANIFEST, 'r', encoding='utf-8') as f:
+        for artifact in json.load(f)["artifacts"]:
+            if artifact["name"] == name:
+                return artifact
+    raise KeyError(f"No artifact named {name!r} in {MANIFEST}")
+
+PDF_ARTIFACT = _manifest_artifact("census_vol1a_pdf")
+SHP_ARTIFACT = _manifest_artifact("ward_shapefile")
+
+PDF_PATH = os.path.join(ROOT, PDF_ARTIFACT["path"])
+SHP_DIR = os.path.join(ROOT, SHP_ARTIFACT["unzip_to"])
+CENSUS_CSV = _data("processed", "tza_census_2022_wards_clean.csv")
+SUMMARY_CSV = _data("processed", "tza_census_2022_summary_rows.csv")
+MAPPED_GPKG = _data("processed", "TZA_2022_Census_Final_Mapped.gpkg")
+MAPPED_PARQUET = _data("processed", "TZA_2022_Census_Final_Mapped.parquet")
+OUTPUT_DIR = _data("processed")
+ROLLUP_CSV = _data("processed", "TZA_2022_Census_Final_Mapped_rollups.csv")
+RECONCILIATION_CSV = _data("processed", "tza_reconciliation_report.csv")
+STATE_PATH = _data(".pipeline_state.json")
+RUN_REPORT = _data("reports", "run_report.json")
+CROSSWALK_CONFIG = _data("raw", "crosswalk_targets.json")
+CROSSWALK_DIR = _data("processed", "crosswalks")
+
+def _crosswalk_layers():
+    # Target layers listed in the crosswalk config (part of the stage's inputs)
+    try:
+        with open(CROSSWALK_CONFIG, 'r', encoding='utf-8') as f:
+            targets = json.load(f).get("targets", [])
+    except (OSError, ValueError):
+        return []
+    return [os.path.join(ROOT, t["path"]) for t in targets]
+
+# --- Stage bodies (module level so they can run in worker processes; heavy imports are
+# --- deferred to keep a no-op run fast)
+
+def run_download_pdf(params):
+    from download_census import fetch_artifact
+    fetch_artifact(params["artifact"], ROOT)
+
+def run_download_shapefile(params):
+    from download_census import fetch_artifact
+    fetch_artifact(params["artifact"], ROOT)
+
+def run_extract(params):
+    from extract_census_data import iter_census_pages, write_census_stream, write_summary_rows
+    summaries = []
+    pages = iter_census_pages(PDF_PATH, start_page=params["start_page"], workers=params["workers"],
+                              cache_dir=_data("cache", "pages"), summary_sink=summaries)
+    write_census_stream(pages, CENSUS_CSV)
+    write_summary_rows(summaries, SUMMARY_CSV)
+
+def run_map(params):
+    from finalize_mapping import finalize_mapping
+    finalize_mapping(SHP_DIR, CENSUS_CSV, MAPPED_GPKG, fuzzy_min_score=params["fuzzy_min_score"],
+                     area_cache_dir=_data("cache", "areas"))
+
+def run_figures(params):
+    from analysis import load_mapped_layer, default_figure_specs
+    from figure_pipeline import render_figures
+    gdf = load_mapped_layer(MAPPED_GPKG)
+    specs = [s for s in default_figure_specs(OUTPUT_DIR) if s["func"] != "analysis.write_spatial_stats"]
+    render_figures({"tza": gdf}, specs, params["workers"])
+
+def run_stats(params):
+    from analysis import load_mapped_layer, write_spatial_stats
+    write_spatial_stats(load_mapped_layer(MAPPED_GPKG), os.path.join(OUTPUT_DIR, "tza_spatial_stats.txt"))
+
+def run_clusters(params):
+    from spatial_stats import perform_cluster_analysis
+    perform_cluster_analysis(MAPPED_GPKG, OUTPUT_DIR, params["contiguity"], params["permutations"])
+
+def run_rollups(params):
+    from rollups import build_and_write
+    build_and_write(MAPPED_GPKG, CENSUS_CSV, SUMMARY_CSV, ROLLUP_CSV, RECONCILIATION_CSV)
+
+def run_crosswalk(params):
+    from crosswalk import load_targets, run_crosswalks
+    run_crosswalks(MAPPED_GPKG, load_targets(CROSSWALK_CONFIG, ROOT), CROSSWALK_DIR, params["workers"])
+
+def _cpu_count():
+    return os.cpu_count() or 1
+
+# name -> stage definition. `inputs` / `outputs` are files or directories, `code` lists the
+# scripts whose content is part of the fingerprint, `deps` orders the DAG. A missing input
+# counts as its own state; `optional_outputs` may be missing (e.g. the GeoParquet copy
+# without pyarrow) but a change to them still makes the stage stale. Stages with
+# `adopt_existing` (downloads) accept outputs already on disk the first time they are seen,
+# instead of fetching them again.
+STAGES = {
+    "download_pdf": {
+        "func": run_download_pdf, "deps": [],
+        "inputs": [], "outputs": [PDF_PATH],
+        "code": ["download_census.py"], "params": {"artifact": PDF_ARTIFACT}, "adopt_existing": True,
+    },
+    "download_shapefile": {
+        "func": run_download_shapefile, "deps": [],
+        "inputs": [], "outputs": [SHP_DIR],
+        "code": ["download_census.py"], "params": {"artifact": SHP_ARTIFACT}, "adopt_existing": True,
+    },
+    "extract": {
+        "func": run_extract, "deps": ["download_pdf"],
+        "inputs": [PDF_PATH], "outputs": [CENSUS_CSV, SUMMARY_CSV],
+        "code": ["extract_census_data.py", "page_cache.py", "table_layout.py"],
+        "params": {"start_page": 50, "workers": _cpu_count()},
+    },
+    "map": {
+        "func": run_map, "deps": ["extract", "download_shapefile"],
+        "inputs": [SHP_DIR, CENSUS_CSV], "outputs": [MAPPED_GPKG], "optional_outputs": [MAPPED_PARQUET],
+        "code": ["finalize_mapping.py", "fuzzy_match.py", "area_engine.py", "mapped_store.py"],
+        "params": {"fuzzy_min_score": 0.85},
+    },
+    "figures": {
+        "func": run_figures, "deps": ["map"],
+        "inputs": [MAPPED_GPKG, MAPPED_PARQUET], "outputs": [
+            os.path.join(OUTPUT_DIR, "tza_pop_density_map.png"),
+            os.path.join(OUTPUT_DIR, "zoom_dar_density.png"),
+            os.path.join(OUTPUT_DIR, "zoom_zanzibar_density.png"),
+            os.path.join(OUTPUT_DIR, "tza_ward_size_histogram.png"),
+        ],
+        "code": ["analysis.py", "figure_pipeline.py", "mapped_store.py"],
+        "params": {"workers": _cpu_count()},
+    },
+    "stats": {
+        "func": run_stats, "deps": ["map"],
+        "inputs": [MAPPED_GPKG, MAPPED_PARQUET], "outputs": [os.path.join(OUTPUT_DIR, "tza_spatial_stats.txt")],
+        "code": ["analysis.py", "mapped_store.py"], "params": {},
+    },
+    "clusters": {
+        "func": run_clusters, "deps": ["map"],
+        "inputs": [MAPPED_GPKG, MAPPED_PARQUET], "outputs": [
+            os.path.join(OUTPUT_DIR, "tza_density_clusters.txt"),
+            os.path.join(OUTPUT_DIR, "tza_density_clusters.csv"),
+            os.path.join(OUTPUT_DIR, "tza_density_clusters_map.png"),
+        ],
+        "code": ["spatial_stats.py", "area_engine.py", "mapped_store.py"],
+        "params": {"contiguity": "queen", "permutations": 999},
+    },
+    "rollups": {
+        "func": run_rollups, "deps": ["map", "extract"],
+        "inputs": [MAPPED_GPKG, MAPPED_PARQUET, CENSUS_CSV, SUMMARY_CSV], "outputs": [ROLLUP_CSV, RECONCILIATION_CSV],
+        "code": ["rollups.py", "mapped_store.py"], "params": {},
+    },
+    "crosswalk": {
+        "func": run_crosswalk, "deps": ["map"],
+        "inputs": [MAPPED_GPKG, MAPPED_PARQUET, CROSSWALK_CONFIG] + _crosswalk_layers(), "outputs": [CROSSWALK_DIR],
+        "code": ["crosswalk.py", "area_engine.py", "mapped_store.py"],
+        "params": {"workers": _cpu_count()},
+    },
+}
+
+# Worker counts only change speed, never results
+NON_SEMANTIC_PARAMS = {"workers"}
+
+# --- Fingerprinting
+
+def _expand(path):
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            files.extend(os.path.join(root, n) for n in names)
+        return sorted(files)
+    return [path]
+
+class FileHasher:
+    # Content hashes memoized on (size, mtime_ns): unchanged files are never re-read, which
+    # is what keeps a no-op run well under a second even with a large PDF input.
+
+    def __init__(self, memo):
+        self.memo = memo
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        sig = [st.st_size, st.st_mtime_ns]
+        entry = self.memo.get(path)
+        if entry and entry["sig"] == sig:
+            return entry["sha256"]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        self.memo[path] = {"sig": sig, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+    def tree_hash(self, path):
+        if not os.path.exists(path):
+            return None
+        h = hashlib.sha256()
+        for file in _expand(path):
+            h.update(os.path.relpath(file, ROOT).encode('utf-8'))
+            h.update(self.file_hash(file).encode('ascii'))
+        return h.hexdigest()
+
+def stage_fingerprint(name, stage, hasher):
+    h = hashlib.sha256(name.encode('utf-8'))
+    for code in stage["code"]:
+        h.update(hasher.file_hash(os.path.join(SCRIPT_DIR, code)).encode('ascii'))
+    params = {k: v for k, v in stage["params"].items() if k not in NON_SEMANTIC_PARAMS}
+    h.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    for path in stage["inputs"]:
+        h.update(str(hasher.tree_hash(path)).encode('ascii'))
+    return h.hexdigest()
+
+def outputs_signature(stage, hasher):
+    sigs = [hasher.tree_hash(path) for path in stage["outputs"]]
+    if any(s is None for s in sigs):
+        return None
+    return sigs + [hasher.tree_hash(path) for path in stage.get("optional_outputs", [])]
+
+# --- Scheduling
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"stages": {}, "files": {}}
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+def required_stages(targets):
+    needed = set()
+    todo = list(targets or STAGES)
+    while todo:
+        name = todo.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage: {name}")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(STAGES[name]["deps"])
+    return needed
+
+def split_workers(names, free):
+    # Shares `free` worker processes among stages about to start (`names`, in launch order):
+    # a stage without a "workers" param uses one process, the parallel stages split the rest
+    # evenly (at least one each, at most their own "workers" value). Returns {name: workers};
+    # stages left out wait until a running stage hands its share back.
+    alloc = {}
+    serial = [n for n in names if "workers" not in STAGES[n]["params"]]
+    parallel = [n for n in names if "workers" in STAGES[n]["params"]]
+    for name in serial:
+        if free < 1:
+            break
+        alloc[name] = 1
+        free -= 1
+    for k, name in enumerate(parallel):
+        if free < 1:
+            break
+        alloc[name] = min(max(free // (len(parallel) - k), 1), STAGES[name]["params"]["workers"])
+        free -= alloc[name]
+    return alloc
+
+def _run_stage(name, params, profile=False):
+    # Runs in a worker process. With `profile`, the stage gets its own profiler and its raw
+    # data is sent back for the parent's run report.
+    profiler = None
+    if profile:
+        profiler = RunProfiler()
+        set_profiler(profiler)
+    t0 = time.perf_counter()
+    with get_profiler().stage(name):
+        STAGES[name]["func"](params)
+    return time.perf_counter() - t0, profiler.raw() if profiler else None
+
+def run_pipeline(targets=None, force=(), dry_run=False, jobs=None, profile=None, workers=None):
+    # `profile`: path of a run report to write (wall / CPU / peak RSS per stage and the
+    # instrumentation of each stage's internals, see profiling.py)
+    # `workers`: total worker processes shared by all stages running at once (default: one
+    # per CPU), so concurrent stages never oversubscribe the machine
+    run_profiler = None
+    if profile and not dry_run:
+        run_profiler = get_profiler() if get_profiler().enabled else enable_profiling(profile)
+    state = load_state()
+    hasher = FileHasher(state.setdefault("files", {}))
+    stage_state = state.setdefault("stages", {})
+    needed = required_stages(targets)
+    done = set()
+    running = {}
+    allocated = {}
+    summary = {}
+    budget = max(workers or _cpu_count(), 1)
+    max_jobs = jobs or len(needed)
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_jobs) as pool:
+        while len(done) < len(needed):
+            # Decide every stage whose dependencies are finished: skip it or launch it
+            ready = [n for n in STAGES if n in needed and n not in done and n not in running.values()
+                     and all(d in done for d in STAGES[n]["deps"])]
+            launch = {}
+            for name in ready:
+                stage = STAGES[name]
+                fingerprint = stage_fingerprint(name, stage, hasher)
+                previous = stage_state.get(name, {})
+                if not previous and stage.get("adopt_existing") and name not in force:
+                    outputs = outputs_signature(stage, hasher)
+                    if outputs is not None:
+                        previous = stage_state[name] = {"fingerprint": fingerprint, "outputs": outputs}
+                up_to_date = (name not in force
+                              and previous.get("fingerprint") == fingerprint
+                              and previous.get("outputs") is not None
+                              and previous.get("outputs") == outputs_signature(stage, hasher))
+                # In a dry run nothing is rebuilt, so everything downstream of a stale stage
+                # would run too, whatever its fingerprint says now
+                if dry_run and any(summary.get(d) == "would run" for d in stage["deps"]):
+                    up_to_date = False
+                if up_to_date or dry_run:
+                    summary[name] = "up to date" if up_to_date else "would run"
+                    done.add(name)
+                    continue
+                launch[name] = fingerprint
+
+            # Stages that do not fit in the remaining worker budget are decided again once a
+            # running stage finishes
+            free = budget - sum(allocated.values())
+            for name, n_workers in split_workers(list(launch)[:max_jobs - len(running)], free).items():
+                params = dict(STAGES[name]["params"])
+                if "workers" in params:
+                    params["workers"] = n_workers
+                    print(f"[pipeline] running {name} ({n_workers} workers)...")
+                else:
+                    print(f"[pipeline] running {name}...")
+                running[pool.submit(_run_stage, name, params, run_profiler is not None)] = name
+                allocated[name] = n_workers
+                stage_state.setdefault(name, {})["pending"] = launch[name]
+
+            if not running:
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                allocated.pop(name)
+                seconds, profile_data = future.result()
+                if profile_data is not None:
+                    run_profiler.merge(profile_data, "pipeline")
+                entry = stage_state[name]
+                entry["fingerprint"] = entry.pop("pending")
+                entry["outputs"] = outputs_signature(STAGES[name], hasher)
+                entry["seconds"] = seconds
+                summary[name] = f"ran in {seconds:.1f}s"
+                done.add(name)
+                save_state(state)
+
+    if not dry_run:
+        save_state(state)
+    for name in STAGES:
+        if name in summary:
+            print(f"  {name:<20} {summary[name]}")
+    print(f"Pipeline finished in {time.perf_counter() - t0:.2f}s")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the census pipeline incrementally.")
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", nargs="*", default=[], help="stages to rerun even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--jobs", type=int, default=None, help="max stages running at once")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes shared by the stages running at once (default: CPU count)")
+    parser.add_argument("--profile", nargs="?", const=RUN_REPORT, default=os.environ.get(PROFILE_ENV),
+                        help=f"write a run report with per-stage and per-page timings (default path: {RUN_REPORT})")
+    args = parser.parse_args()
+
+    run_pipeline(args.targets, force=set(args.force), dry_run=args.dry_run, jobs=args.jobs, profile=args.profile,
+                 workers=args.workers)
@@ -0,0 +1,185 @@
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Run instrumentation shared by all scripts. Off by default: the active profiler is then a
+# NullProfiler whose methods do nothing, so instrumented code pays one attribute lookup and
+# an empty context manager per stage (per page code checks `profiler.enabled` first).
+#
+# Turn it on for any script with the environment variable, e.g.
+#   CENSUS_PROFILE=data/reports/extract.json python scripts/extract_census_data.py
+# or for the whole pipeline with `python scripts/pipeline.py --profile`.
+#
+# Report layout (REPORT_VERSION 1):
+#   stages:   [{stage, wall_s, cpu_s, children_cpu_s, peak_rss_mb, children_peak_rss_mb}]
+#             nested stages are "/"-joined; peak RSS is the process high-water mark at the
+#             end of the stage (children: the largest finished worker process)
+#   timings:  {name: seconds} measured elsewhere (e.g. figures rendered in worker processes)
+#   counters: {name: value} (pages, records, join match counts, ...)
+#   pages:    {count, by_schema: {schema: {pages, seconds}}, slowest: [top-N page records]}
+#   page_records: one record per page: page, page_class, schema, table_method, cached,
+#             text_s, tables_s, parse_s, total_s, records (timings are null for cached pages)
+
+PROFILE_ENV = "CENSUS_PROFILE"
+REPORT_VERSION = 1
+TOP_N_PAGES = 20
+
+def _peak_rss_mb(who):
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+def _children_cpu_s():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class NullProfiler:
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def page(self, page_index, **fields):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def timing(self, name, seconds):
+        pass
+
+class RunProfiler:
+    enabled = True
+
+    def __init__(self):
+        self.created = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.stages = []
+        self.timings = {}
+        self.counters = {}
+        self.pages = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        wall0, cpu0, child0 = time.perf_counter(), time.process_time(), _children_cpu_s()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self.stages.append({
+                "stage": path,
+                "wall_s": time.perf_counter() - wall0,
+                "cpu_s": time.process_time() - cpu0,
+                "children_cpu_s": _children_cpu_s() - child0,
+                "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                "children_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            })
+
+    def page(self, page_index, **fields):
+        self.pages.append(dict(page=page_index, **fields))
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    def timing(self, name, seconds):
+        self.timings[name] = seconds
+
+    def merge(self, data, prefix):
+        # Folds the raw data of a profiler that ran in another process (see raw()) in under
+        # `prefix`, e.g. a pipeline stage executed by a worker
+        for entry in data["stages"]:
+            self.stages.append(dict(entry, stage=f"{prefix}/{entry['stage']}"))
+        self.timings.update({f"{prefix}/{k}": v for k, v in data["timings"].items()})
+        self.counters.update({f"{prefix}/{k}": v for k, v in data["counters"].items()})
+        self.pages.extend(data["pages"])
+
+    def raw(self):
+        return {"stages": self.stages, "timings": self.timings, "counters": self.counters, "pages": self.pages}
+
+    def report(self, top_n=TOP_N_PAGES):
+        timed = [p for p in self.pages if p.get("total_s") is not None]
+        by_schema = {}
+        for p in timed:
+            entry = by_schema.setdefault(p.get("schema") or "none", {"pages": 0, "seconds": 0.0})
+            entry["pages"] += 1
+            entry["seconds"] += p["total_s"]
+        return {
+            "report_version": REPORT_VERSION,
+            "created": self.created,
+            "argv": sys.argv,
+            "stages": self.stages,
+            "timings": self.timings,
+            "counters": self.counters,
+            "pages": {
+                "count": len(self.pages),
+                "timed": len(timed),
+                "by_schema": by_schema,
+                "slowest": sorted(timed, key=lambda p: p["total_s"], reverse=True)[:top_n],
+            },
+            "page_records": self.pages,
+        }
+
+    def write(self, path, top_n=TOP_N_PAGES):
+        report = self.report(top_n)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print_run_summary(report)
+        print(f"Run report written to {path}")
+        return report
+
+def print_run_summary(report, top_n=10):
+    print("\nRun profile:")
+    for s in report["stages"]:
+        rss = f"{s['peak_rss_mb']:.0f} MB" if s["peak_rss_mb"] is not None else "n/a"
+        print(f"  {s['stage']:<40} wall {s['wall_s']:8.2f}s  cpu {s['cpu_s']:8.2f}s "
+              f"(+{s['children_cpu_s']:.2f}s workers)  peak RSS {rss}")
+    for name, value in report["counters"].items():
+        print(f"  {name:<40} {value}")
+    slowest = report["pages"]["slowest"][:top_n]
+    if slowest:
+        print("  Slowest pages:")
+        for p in slowest:
+            print(f"    page {p['page']:>5} {p.get('schema') or '-':<14} total {p['total_s']:.3f}s  "
+                  f"(text {p['text_s']:.3f}s, tables {p['tables_s']:.3f}s, parse {p['parse_s']:.3f}s)")
+
+_PROFILER = NullProfiler()
+
+def get_profiler():
+    return _PROFILER
+
+def set_profiler(profiler):
+    global _PROFILER
+    previous = _PROFILER
+    _PROFILER = profiler
+    return previous
+
+def enable_profiling(report_path=None):
+    # Installs a RunProfiler; with `report_path` the report is written when this process
+    # exits (forked worker processes inherit the profiler but never write it)
+    profiler = RunProfiler()
+    set_profiler(profiler)
+    if report_path:
+        pid = os.getpid()
+        atexit.register(lambda: os.getpid() == pid and profiler.write(report_path))
+    return profiler
+
+# Only the main process reports; spawned workers would otherwise each write the same file
+if os.environ.get(PROFILE_ENV) and multiprocessing.parent_process() is None:
+    enable_profiling(os.environ[PROFILE_ENV])
@@ -0,0 +1,157 @@
+import json
+import math
+import os
+import time
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+from pyproj import CRS
+from area_engine import equal_area_crs, lonlat_bounds, project_geometries
+from mapped_store import load_mapped
+
+# Gridded population surface from the mapped ward layer. Each ward's Total_Pop is spread over
+# the grid cells it overlaps in proportion to the overlapping area, computed tile by tile in
+# an equal-area projection and written straight into a memory-mapped float64 array
+# (<output>.f64 + <output>.json sidecar with shape, transform and CRS), so the full grid
+# never has to fit in RAM.
+
+DEFAULT_RESOLUTION = 100.0
+DEFAULT_TILE_SIZE = 512
+
+# Per-worker state, set by _init_worker
+_W = {}
+
+def _init_worker(wkb, populations, ward_areas, grid, raster_path):
+    geoms = shapely.from_wkb(wkb)
+    shapely.prepare(geoms)
+    _W.update({
+        "geoms": geoms,
+        "tree": shapely.STRtree(geoms),
+        "pops": populations,
+        "areas": ward_areas,
+        "grid": grid,
+        "raster": np.memmap(raster_path, dtype=np.float64, mode='r+', shape=(grid["height"], grid["width"])),
+    })
+
+def _rasterize_tile(tile):
+    # Returns (ward indices, population allocated to this tile per ward) for the total check
+    row0, col0, rows, cols = tile
+    g = _W["grid"]
+    res = g["resolution"]
+    x0 = g["minx"] + col0 * res
+    y1 = g["maxy"] - row0 * res
+    tile_box = shapely.box(x0, y1 - rows * res, x0 + cols * res, y1)
+
+    out = np.zeros((rows, cols), dtype=np.float64)
+    ward_ids = _W["tree"].query(tile_box, predicate="intersects")
+    allocated = np.zeros(len(ward_ids))
+    for k, w in enumerate(ward_ids):
+        geom = _W["geoms"][w]
+        # Cell window of this ward inside the tile
+        bminx, bminy, bmaxx, bmaxy = shapely.bounds(geom)
+        c_start = max(int(math.floor((bminx - x0) / res)), 0)
+        c_stop = min(int(math.ceil((bmaxx - x0) / res)), cols)
+        r_start = max(int(math.floor((y1 - bmaxy) / res)), 0)
+        r_stop = min(int(math.ceil((y1 - bminy) / res)), rows)
+        if c_start >= c_stop or r_start >= r_stop:
+            continue
+
+        rr, cc = np.mgrid[r_start:r_stop, c_start:c_stop]
+        rr = rr.ravel()
+        cc = cc.ravel()
+        cx0 = x0 + cc * res
+        cy1 = y1 - rr * res
+        cells = shapely.box(cx0, cy1 - res, cx0 + res, cy1)
+
+        # Interior cells get the full cell area; only boundary cells need an intersection
+        overlap = np.zeros(len(cells))
+        inside = shapely.contains(geom, cells)
+        overlap[inside] = res * res
+        edge = np.flatnonzero(~inside & shapely.intersects(geom, cells))
+        if len(edge):
+            overlap[edge] = shapely.area(shapely.intersection(cells[edge], geom))
+
+        share = _W["pops"][w] * overlap / _W["areas"][w]
+        out[rr, cc] += share
+        allocated[k] = share.sum()
+
+    _W["raster"][row0:row0 + rows, col0:col0 + cols] = out
+    _W["raster"].flush()
+    return ward_ids, allocated
+
+def rasterize_population(layer_path, output_path, resolution=DEFAULT_RESOLUTION, tile_size=DEFAULT_TILE_SIZE,
+                         workers=None, pop_column="Total_Pop"):
+    t0 = time.perf_counter()
+    gdf = load_mapped(layer_path, columns=[pop_column, "geometry"])
+    gdf = gdf[gdf[pop_column].notnull() & gdf.geometry.notnull() & ~gdf.geometry.is_empty]
+    crs = CRS.from_user_input(gdf.crs) if gdf.crs is not None else CRS.from_epsg(4326)
+
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    target_crs = equal_area_crs(lonlat_bounds(geoms, crs))
+    # Valid geometries keep cell intersections summing to the ward area
+    projected = shapely.make_valid(project_geometries(geoms, crs, target_crs))
+    populations = gdf[pop_column].to_numpy(dtype=float)
+    ward_areas = shapely.area(projected)
+
+    # Grid snapped to the resolution, row 0 at the top
+    minx, miny, maxx, maxy = shapely.total_bounds(projected)
+    minx = math.floor(minx / resolution) * resolution
+    maxy = math.ceil(maxy / resolution) * resolution
+    width = int(math.ceil((maxx - minx) / resolution))
+    height = int(math.ceil((maxy - miny) / resolution))
+    grid = {"minx": minx, "maxy": maxy, "resolution": resolution, "width": width, "height": height}
+
+    raster_path = os.path.splitext(output_path)[0] + ".f64"
+    os.makedirs(os.path.dirname(os.path.abspath(raster_path)), exist_ok=True)
+    raster = np.memmap(raster_path, dtype=np.float64, mode='w+', shape=(height, width))
+    del raster  # zero-filled file of the right size; workers map it themselves
+
+    tiles = [(r, c, min(tile_size, height - r), min(tile_size, width - c))
+             for r in range(0, height, tile_size) for c in range(0, width, tile_size)]
+    print(f"Rasterizing {len(gdf)} wards onto a {width} x {height} grid at {resolution:g} m "
+          f"({len(tiles)} tiles, {width * height * 8 / 1024**3:.2f} GiB on disk)...")
+
+    init_args = (shapely.to_wkb(projected), populations, ward_areas, grid, raster_path)
+    allocated = np.zeros(len(gdf))
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                             initializer=_init_worker, initargs=init_args) as pool:
+        for ward_ids, amounts in pool.map(_rasterize_tile, tiles, chunksize=4):
+            np.add.at(allocated, ward_ids, amounts)
+
+    # Every ward's population must be fully accounted for across tiles
+    ward_error = np.abs(allocated - populations)
+    metadata = {
+        "shape": [height, width],
+        "dtype": "float64",
+        "resolution": resolution,
+        # GDAL-style geotransform: (origin x, pixel width, 0, origin y, 0, -pixel height)
+        "transform": [minx, resolution, 0.0, maxy, 0.0, -resolution],
+        "crs_wkt": target_crs.to_wkt(),
+        "source": os.path.abspath(layer_path),
+        "population_column": pop_column,
+        "ward_population_total": float(populations.sum()),
+        "raster_population_total": float(allocated.sum()),
+        "max_ward_abs_error": float(ward_error.max()) if len(ward_error) else 0.0,
+    }
+    with open(os.path.splitext(output_path)[0] + ".json", 'w') as f:
+        json.dump(metadata, f, indent=1)
+
+    print(f"Population: wards {metadata['ward_population_total']:,.0f}, raster {metadata['raster_population_total']:,.3f} "
+          f"(max per-ward error {metadata['max_ward_abs_error']:.2e})")
+    print(f"Saved raster to {raster_path} in {time.perf_counter() - t0:.1f}s")
+    return raster_path, metadata
+
+def open_population_raster(output_path):
+    # Read-only memory map of a raster written by rasterize_population, plus its metadata
+    with open(os.path.splitext(output_path)[0] + ".json") as f:
+        metadata = json.load(f)
+    raster = np.memmap(os.path.splitext(output_path)[0] + ".f64", dtype=np.float64, mode='r',
+                       shape=tuple(metadata["shape"]))
+    return raster, metadata
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    LAYER = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+    OUTPUT = os.path.join(ROOT, "data", "processed", "tza_population_100m")
+
+    rasterize_population(LAYER, OUTPUT)
@@ -0,0 +1,249 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from mapped_store import load_mapped, mapped_source_path
+from profiling import get_profiler
+
+# Precomputed ward -> council -> region -> national aggregates of the mapped layer, plus a
+# reconciliation of the extracted ward rows against the council / region total rows of the
+# report (which the extraction keeps out of the ward table to avoid double counting).
+#
+# The rollup table is small (one row per ward, council and region, plus one national row),
+# so it is stored as a plain CSV and loaded into a dict: hierarchical queries are then key
+# lookups instead of a groupby over the ward frame.
+
+LEVELS = ["ward", "council", "region", "national"]
+POPULATION_COLUMNS = ["Total_Pop", "Male_Pop", "Female_Pop"]
+ROLLUP_COLUMNS = ["level", "reg_name", "dist_name", "ward_name"] + POPULATION_COLUMNS + \
+                 ["area_sqkm", "matched_area_sqkm", "density", "sex_ratio", "n_wards", "n_matched"]
+
+# Key columns per level; deeper levels leave the remaining name columns empty
+LEVEL_KEYS = {
+    "ward": ["reg_name", "dist_name", "ward_name"],
+    "council": ["reg_name", "dist_name"],
+    "region": ["reg_name"],
+    "national": [],
+}
+
+# Ward sums within this fraction of the official total count as reconciled
+RECONCILE_TOLERANCE = 0.005
+
+def _aggregate(wards, keys):
+    if keys:
+        grouped = wards.groupby(keys, sort=True, observed=True, dropna=False)
+        out = grouped.agg(
+            Total_Pop=("Total_Pop", "sum"), Male_Pop=("Male_Pop", "sum"), Female_Pop=("Female_Pop", "sum"),
+            area_sqkm=("area_sqkm", "sum"), matched_area_sqkm=("matched_area_sqkm", "sum"),
+            n_wards=("n_wards", "sum"), n_matched=("n_matched", "sum"),
+        ).reset_index()
+    else:
+        out = wards[POPULATION_COLUMNS + ["area_sqkm", "matched_area_sqkm", "n_wards", "n_matched"]].sum().to_frame().T
+    return out
+
+def build_rollups(wards):
+    # `wards` is the mapped layer (or any frame with reg_name, dist_name, ward_name, the
+    # population columns and area_sqkm). Density and sex ratio of an aggregate are derived
+    # from its sums, never averaged from ward values; density uses only the area of wards
+    # that have a population, so unmatched wards do not dilute it.
+    frame = pd.DataFrame({
+        "reg_name": wards["reg_name"].astype(str).values,
+        "dist_name": wards["dist_name"].astype(str).values,
+        "ward_name": wards["ward_name"].astype(str).values,
+    })
+    matched = wards["Total_Pop"].notnull().values
+    for col in POPULATION_COLUMNS:
+        frame[col] = pd.to_numeric(wards[col], errors="coerce").fillna(0).values
+    frame["area_sqkm"] = wards["area_sqkm"].astype(float).values
+    frame["matched_area_sqkm"] = np.where(matched, frame["area_sqkm"], 0.0)
+    frame["n_wards"] = 1
+    frame["n_matched"] = matched.astype(int)
+
+    levels = []
+    for level in LEVELS:
+        agg = _aggregate(frame, LEVEL_KEYS[level])
+        agg.insert(0, "level", level)
+        levels.append(agg)
+    rollups = pd.concat(levels, ignore_index=True)
+    for col in ["reg_name", "dist_name", "ward_name"]:
+        rollups[col] = rollups[col].fillna("")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rollups["density"] = np.where(rollups["matched_area_sqkm"] > 0,
+                                      rollups["Total_Pop"] / rollups["matched_area_sqkm"], np.nan)
+        rollups["sex_ratio"] = np.where(rollups["Female_Pop"] > 0,
+                                        rollups["Male_Pop"] / rollups["Female_Pop"] * 100, np.nan)
+    int_cols = POPULATION_COLUMNS + ["n_wards", "n_matched"]
+    rollups[int_cols] = rollups[int_cols].astype("int64")
+    return rollups[ROLLUP_COLUMNS]
+
+def write_rollups(rollups, output_path):
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    rollups.to_csv(output_path, index=False, float_format="%.4f")
+    return output_path
+
+def rollup_path_for(gpkg_path):
+    return os.path.splitext(gpkg_path)[0] + "_rollups.csv"
+
+def _key(*names):
+    return tuple(" ".join(str(n).split()).casefold() for n in names)
+
+class RollupStore:
+    # Dict-backed view of the rollup table. Names are matched case- and
+    # whitespace-insensitively.
+
+    def __init__(self, rollups):
+        self.rollups = rollups.reset_index(drop=True)
+        records = self.rollups.to_dict("records")
+        self._rows = {}
+        self._children = {}
+        for row in records:
+            level = row["level"]
+            names = [row[c] for c in LEVEL_KEYS[level]]
+            self._rows[(level,) + _key(*names)] = row
+            if level != "national":
+                parent = LEVELS[LEVELS.index(level) + 1]
+                self._children.setdefault((parent,) + _key(*names[:-1]), []).append(row)
+
+    @classmethod
+    def load(cls, path):
+        rollups = pd.read_csv(path, keep_default_na=False, na_values={"density": [""], "sex_ratio": [""]})
+        return cls(rollups)
+
+    def get(self, region=None, council=None, ward=None):
+        # get() -> national, get(region) -> region, get(region, council) -> council,
+        # get(region, council, ward) -> ward; None if the unit does not exist
+        names = [n for n in (region, council, ward) if n is not None]
+        level = LEVELS[len(LEVELS) - 1 - len(names)]
+        return self._rows.get((level,) + _key(*names))
+
+    def children(self, region=None, council=None):
+        # Rows one level below the given unit: regions of the country, councils of a
+        # region, wards of a council
+        names = [n for n in (region, council) if n is not None]
+        level = LEVELS[len(LEVELS) - 1 - len(names)]
+        return list(self._children.get((level,) + _key(*names), []))
+
+# --- Reconciliation of extracted ward rows against the official totals
+
+def _official_totals(summary, level, keys):
+    # A unit's total can appear several times in the report (e.g. on the page that opens
+    # its table and again as a sub-table total); the largest one is the unit total, the
+    # others are partial sums.
+    rows = summary[summary["Level"] == level]
+    if rows.empty:
+        return pd.DataFrame({c: pd.Series(dtype=object if c in keys else float) for c in keys + POPULATION_COLUMNS})
+    idx = rows.groupby(keys, sort=False)["Total_Pop"].idxmax()
+    return rows.loc[idx, keys + POPULATION_COLUMNS]
+
+def _compare(ward_sums, official, keys, tolerance):
+    report = ward_sums.merge(official, on=keys, how="outer", suffixes=("_wards", "_official"))
+    report["gap"] = report["Total_Pop_wards"] - report["Total_Pop_official"]
+    report["gap_pct"] = report["gap"] / report["Total_Pop_official"] * 100
+    status = np.where(report["gap"].abs() <= report["Total_Pop_official"] * tolerance, "ok", "mismatch")
+    status = np.where(report["Total_Pop_official"].isnull(), "no_summary", status)
+    report["status"] = np.where(report["Total_Pop_wards"].isnull(), "no_wards", status)
+    return report
+
+def reconcile(census_csv_path, summary_csv_path, tolerance=RECONCILE_TOLERANCE):
+    # Compares the ward sums of the extracted census CSV with the council and region total
+    # rows captured during extraction. Both come from the same report, so names are only
+    # compared after upper-casing and collapsing whitespace (the fuzzy normalization used
+    # for the shapefile join would merge e.g. a Town Council with its District Council).
+    census = pd.read_csv(census_csv_path)
+    summary = pd.read_csv(summary_csv_path)
+    for df in (census, summary):
+        for col in ["Region", "Council"]:
+            # Blank names (region and national rows have no council) are read as NaN
+            df[col] = df[col].fillna("").astype(str).map(lambda s: " ".join(s.split()).upper())
+
+    council_sums = census.groupby(["Region", "Council"], sort=True)[POPULATION_COLUMNS].sum().reset_index()
+    council_report = _compare(council_sums, _official_totals(summary, "council", ["Region", "Council"]),
+                              ["Region", "Council"], tolerance)
+    council_report.insert(0, "level", "council")
+
+    region_sums = census.groupby("Region", sort=True)[POPULATION_COLUMNS].sum().reset_index()
+    region_official = _official_totals(summary, "region", ["Region"])
+    region_report = _compare(region_sums, region_official, ["Region"], tolerance)
+    region_report.insert(0, "level", "region")
+    region_report.insert(2, "Council", "")
+
+    # National check: all ward rows against the national total of the report, or the sum of
+    # the official region totals when the report's national table was not captured
+    national_sums = census[POPULATION_COLUMNS].sum().to_frame().T.assign(Region="")
+    national_rows = summary[summary["Level"] == "national"]
+    if not national_rows.empty:
+        national_official = national_rows.loc[[national_rows["Total_Pop"].idxmax()], POPULATION_COLUMNS].assign(Region="")
+    else:
+        national_official = region_official[POPULATION_COLUMNS].sum().to_frame().T.assign(Region="")
+        if region_official.empty:
+            national_official = national_official.iloc[:0]
+    national_report = _compare(national_sums, national_official, ["Region"], tolerance)
+    national_report.insert(0, "level", "national")
+    national_report.insert(2, "Council", "")
+
+    report = pd.concat([council_report, region_report, national_report], ignore_index=True)
+    columns = ["level", "Region", "Council", "Total_Pop_wards", "Total_Pop_official", "gap", "gap_pct", "status",
+               "Male_Pop_wards", "Male_Pop_official", "Female_Pop_wards", "Female_Pop_official"]
+    return report.reindex(columns=columns)
+
+def print_reconciliation_summary(report, top_n=10):
+    print("\nReconciliation of ward sums against official totals:")
+    for level in ["council", "region", "national"]:
+        rows = report[report["level"] == level]
+        if rows.empty:
+            continue
+        counts = rows["status"].value_counts()
+        parts = ", ".join(f"{counts.get(s, 0)} {s}" for s in ["ok", "mismatch", "no_summary", "no_wards"])
+        print(f"  {level:<9} {len(rows):>4} units: {parts}")
+
+    mismatches = report[report["status"] == "mismatch"]
+    if not mismatches.empty:
+        worst = mismatches.reindex(mismatches["gap"].abs().sort_values(ascending=False).index).head(top_n)
+        print("  Largest gaps:")
+        for _, row in worst.iterrows():
+            name = " / ".join(n for n in [row["Region"], row["Council"]] if n) or "NATIONAL"
+            print(f"    {row['level']:<8} {name:<50} wards {row['Total_Pop_wards']:>10,.0f}  "
+                  f"official {row['Total_Pop_official']:>10,.0f}  gap {row['gap']:>+9,.0f} ({row['gap_pct']:+.2f}%)")
+
+def build_and_write(gpkg_path, census_csv_path=None, summary_csv_path=None, output_path=None,
+                    report_path=None):
+    path = mapped_source_path(gpkg_path)
+    profiler = get_profiler()
+    wards = load_mapped(path, columns=["reg_name", "dist_name", "ward_name"] + POPULATION_COLUMNS + ["area_sqkm"])
+    with profiler.stage("build_rollups"):
+        rollups = build_rollups(wards)
+    output_path = output_path or rollup_path_for(gpkg_path)
+    write_rollups(rollups, output_path)
+    print(f"Wrote {len(rollups)} rollup rows to {output_path}")
+
+    if census_csv_path and summary_csv_path and os.path.exists(summary_csv_path):
+        with profiler.stage("reconcile"):
+            report = reconcile(census_csv_path, summary_csv_path)
+        for status, n in report["status"].value_counts().items():
+            profiler.count(f"reconcile.{status}", int(n))
+        report_path = report_path or os.path.join(os.path.dirname(output_path), "tza_reconciliation_report.csv")
+        report.to_csv(report_path, index=False, float_format="%.2f")
+        print_reconciliation_summary(report)
+        print(f"Saved reconciliation report to {report_path}")
+    return output_path
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processed = os.path.join(ROOT, "data", "processed")
+
+    parser = argparse.ArgumentParser(description="Build ward/council/region/national rollups and reconcile them.")
+    parser.add_argument("--gpkg", default=os.path.join(processed, "TZA_2022_Census_Final_Mapped.gpkg"))
+    parser.add_argument("--census-csv", default=os.path.join(processed, "tza_census_2022_wards_clean.csv"))
+    parser.add_argument("--summary-csv", default=os.path.join(processed, "tza_census_2022_summary_rows.csv"))
+    parser.add_argument("--query", nargs="*", metavar="NAME",
+                        help="Print the rollup of REGION [COUNCIL [WARD]] (no names: national)")
+    args = parser.parse_args()
+
+    rollup_csv = rollup_path_for(args.gpkg)
+    if args.query is not None and os.path.exists(rollup_csv):
+        store = RollupStore.load(rollup_csv)
+        row = store.get(*args.query)
+        print(row if row is not None else f"No unit named {' / '.join(args.query)}")
+    else:
+        build_and_write(args.gpkg, args.census_csv, args.summary_csv)
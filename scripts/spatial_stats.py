@@ -0,0 +1,291 @@
+import argparse
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+from shapely import STRtree
+from pyproj import CRS
+from area_engine import geometry_hash
+from mapped_store import load_mapped_layer, mapped_source_path
+from profiling import get_profiler
+
+# Ward contiguity graphs and spatial autocorrelation of population density.
+# - Neighbour pairs come from one bulk STRtree query (bounding boxes, then an exact
+#   intersects test) instead of n² `touches` calls. Queen neighbours share at least a
+#   point; rook neighbours share a boundary segment of non-zero length.
+# - The graph is a symmetric binary scipy CSR matrix, cached next to the GeoPackage in a
+#   file named after a hash of the geometries and their order (so the GPKG and the
+#   row-sorted GeoParquet each get theirs).
+# - Spatial lag, global Moran's I and local Moran's I (LISA) are sparse mat-vec products on
+#   the row-standardized matrix; permutation inference runs a whole batch of permutations
+#   per sparse-dense product.
+
+CONTIGUITY_KINDS = ["queen", "rook"]
+
+# Bump when the adjacency construction changes (part of the cache key)
+CONTIGUITY_VERSION = 1
+
+PERMUTATIONS = 999
+PERMUTATION_BATCH = 100
+SIGNIFICANCE = 0.05
+
+# LISA quadrants (same codes as PySAL's esda)
+CLUSTER_LABELS = {0: "Not significant", 1: "High-High", 2: "Low-High", 3: "Low-Low", 4: "High-Low"}
+CLUSTER_COLORS = {0: "#eeeeee", 1: "#d7191c", 2: "#abd9e9", 3: "#2c7bb6", 4: "#fdae61"}
+
+# Pairs per vectorized boundary-intersection batch, and elements per (wards, permutations,
+# degree) block in the local permutation test (both bound memory on large layers)
+PAIR_BATCH = 200_000
+MAX_BLOCK = 5_000_000
+
+# --- Contiguity
+
+def candidate_pairs(geoms):
+    # Index pairs (i < j) of geometries that intersect, from one bulk STRtree query
+    tree = STRtree(geoms)
+    left, right = tree.query(geoms, predicate="intersects")
+    keep = left < right
+    return left[keep], right[keep]
+
+def rook_filter(geoms, left, right):
+    # Keeps the pairs whose boundaries overlap along a segment (not just at a corner)
+    boundaries = shapely.boundary(geoms)
+    keep = np.zeros(len(left), dtype=bool)
+    for s in range(0, len(left), PAIR_BATCH):
+        shared = shapely.intersection(boundaries[left[s:s + PAIR_BATCH]], boundaries[right[s:s + PAIR_BATCH]])
+        keep[s:s + PAIR_BATCH] = shapely.length(shared) > 0
+    return left[keep], right[keep]
+
+def contiguity_matrix(geoms, kind="queen"):
+    if kind not in CONTIGUITY_KINDS:
+        raise ValueError(f"Unknown contiguity: {kind}")
+    geoms = np.asarray(geoms, dtype=object)
+    shapely.prepare(geoms)
+    left, right = candidate_pairs(geoms)
+    if kind == "rook":
+        left, right = rook_filter(geoms, left, right)
+    n = len(geoms)
+    rows = np.concatenate([left, right])
+    cols = np.concatenate([right, left])
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(n, n))
+
+def contiguity_cache_path(source_path, kind):
+    # One file per source file and contiguity kind: the GeoPackage and the row-sorted
+    # GeoParquet copy of the same layer need different matrices, and a rebuilt layer
+    # overwrites its own file
+    stem, ext = os.path.splitext(source_path)
+    return f"{stem}_{ext.lstrip('.')}_{kind}_contiguity.npz"
+
+def load_or_build_contiguity(gdf, source_path, kind="queen"):
+    # Cached next to `source_path` (the file gdf was read from) as the CSR arrays plus the
+    # geometry hash they were built from; a layer whose geometries or row order changed is
+    # rebuilt and replaces the file
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    crs = CRS.from_user_input(gdf.crs) if gdf.crs is not None else CRS.from_epsg(4326)
+    key = geometry_hash(geoms, crs, f"{kind}-contiguity-v{CONTIGUITY_VERSION}")
+    path = contiguity_cache_path(source_path, kind)
+
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                if str(data["key"]) == key:
+                    n = int(data["n"])
+                    return sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=(n, n))
+        except (OSError, ValueError, KeyError):
+            pass
+
+    print(f"Building {kind} contiguity for {len(geoms)} polygons...")
+    w = contiguity_matrix(geoms, kind)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, data=w.data, indices=w.indices, indptr=w.indptr, n=w.shape[0], key=key)
+    os.replace(tmp, path)
+    return w
+
+def row_standardize(w):
+    # Each row sums to 1; rows of islands (no neighbours) stay all-zero
+    degree = np.asarray(w.sum(axis=1)).ravel()
+    inv = np.divide(1.0, degree, out=np.zeros_like(degree), where=degree > 0)
+    return sparse.diags(inv) @ w
+
+def subgraph(w, mask):
+    # Restricts the graph to the rows with a value (unmatched wards drop out entirely)
+    idx = np.flatnonzero(mask)
+    return w[idx][:, idx]
+
+# --- Statistics
+
+def spatial_lag(w, values):
+    return w @ values
+
+def global_moran(w, values, permutations=PERMUTATIONS, batch=PERMUTATION_BATCH, seed=0):
+    # Moran's I on a row-standardized graph, with the normality z-score and a permutation
+    # pseudo p-value (permutations evaluated `batch` at a time as one sparse-dense product)
+    wr = row_standardize(w)
+    n = len(values)
+    z = values - values.mean()
+    zz = z @ z
+    s0 = wr.sum()
+    moran_i = n / s0 * (z @ (wr @ z)) / zz
+
+    # Moments under normality
+    expected = -1.0 / (n - 1)
+    sym = wr + wr.T
+    s1 = 0.5 * sym.multiply(sym).sum()
+    s2 = np.sum((np.asarray(wr.sum(axis=1)).ravel() + np.asarray(wr.sum(axis=0)).ravel()) ** 2)
+    variance = (n * n * s1 - n * s2 + 3 * s0 * s0) / ((n * n - 1) * s0 * s0) - expected ** 2
+    z_score = (moran_i - expected) / np.sqrt(variance)
+
+    rng = np.random.default_rng(seed)
+    simulated = []
+    for s in range(0, permutations, batch):
+        k = min(batch, permutations - s)
+        zp = rng.permuted(np.tile(z, (k, 1)), axis=1).T
+        simulated.append(n / s0 * np.einsum("ij,ij->j", zp, wr @ zp) / zz)
+    simulated = np.concatenate(simulated) if simulated else np.array([])
+    larger = int(np.sum(simulated >= moran_i))
+    larger = min(larger, permutations - larger)
+    return {
+        "I": float(moran_i), "expected_I": expected, "z_norm": float(z_score),
+        "p_sim": float((larger + 1) / (permutations + 1)) if permutations else None,
+        "n": n, "s0": float(s0), "permutations": permutations,
+    }
+
+def local_moran(w, values, permutations=PERMUTATIONS, batch=PERMUTATION_BATCH, seed=0):
+    # LISA with conditional permutation inference: observation i keeps its value and draws
+    # its k_i neighbour values from the other n - 1 observations. As in esda, one set of
+    # random draws per permutation is shared by all observations; observations are then
+    # processed per degree, so each batch is a single fancy-indexing + mean over a
+    # (wards, permutations, degree) block.
+    wr = row_standardize(w)
+    n = len(values)
+    z = values - values.mean()
+    m2 = (z @ z) / n
+    lag = wr @ z
+    local_i = z * lag / m2
+
+    degree = np.diff(w.indptr)
+    max_degree = int(degree.max()) if n else 0
+    rng = np.random.default_rng(seed)
+    larger = np.zeros(n, dtype=np.int64)
+    for s in range(0, permutations, batch):
+        k = min(batch, permutations - s)
+        # (k, max_degree) distinct draws from range(n - 1), one row per permutation
+        draws = np.stack([rng.choice(n - 1, max_degree, replace=False) for _ in range(k)])
+        for d in np.unique(degree[degree > 0]):
+            same_degree = np.flatnonzero(degree == d)
+            step = max(1, MAX_BLOCK // (k * d))
+            for c in range(0, len(same_degree), step):
+                rows = same_degree[c:c + step]
+                idx = draws[None, :, :d]
+                # Skip the observation itself: draws >= i shift up by one
+                idx = idx + (idx >= rows[:, None, None])
+                lag_sim = z[idx].mean(axis=2)
+                i_sim = z[rows, None] * lag_sim / m2
+                larger[rows] += np.sum(i_sim >= local_i[rows, None], axis=1)
+
+    # Folded pseudo p-value, as in esda
+    larger = np.where(permutations - larger < larger, permutations - larger, larger)
+    p_sim = (larger + 1) / (permutations + 1)
+    p_sim[degree == 0] = np.nan
+    local_i[degree == 0] = np.nan
+
+    quadrant = np.select([(z > 0) & (lag > 0), (z <= 0) & (lag > 0), (z <= 0) & (lag <= 0)], [1, 2, 3], 4)
+    cluster = np.where((p_sim <= SIGNIFICANCE) & (degree > 0), quadrant, 0)
+    return {"I": local_i, "lag": lag, "p_sim": p_sim, "quadrant": quadrant, "cluster": cluster}
+
+# --- Outputs
+
+def density_clusters(gdf, source_path, kind="queen", column="density", log=True, permutations=PERMUTATIONS, seed=0):
+    # Global and local Moran's I of (log) density over the wards that have a value.
+    # Returns (per-ward DataFrame aligned with gdf, global result dict).
+    profiler = get_profiler()
+    with profiler.stage(f"contiguity_{kind}"):
+        w = load_or_build_contiguity(gdf, source_path, kind)
+    values = gdf[column].to_numpy(dtype=float)
+    mask = np.isfinite(values) & (values > 0 if log else True)
+    x = np.log(values[mask]) if log else values[mask]
+    w_sub = subgraph(w, mask)
+
+    with profiler.stage("global_moran"):
+        glob = global_moran(w_sub, x, permutations, seed=seed)
+    with profiler.stage("local_moran"):
+        local = local_moran(w_sub, x, permutations, seed=seed)
+    glob.update({"variable": f"log({column})" if log else column, "contiguity": kind,
+                 "islands": int(np.sum(np.diff(w_sub.indptr) == 0)),
+                 "mean_neighbours": float(np.diff(w.indptr).mean()) if w.shape[0] else 0.0})
+
+    out = pd.DataFrame(index=gdf.index)
+    out["n_neighbours"] = np.diff(w.indptr)
+    out["value"] = np.nan
+    out["lag"] = np.nan
+    out["local_I"] = np.nan
+    out["p_sim"] = np.nan
+    out["cluster"] = 0
+    out.loc[mask, "value"] = x
+    # Lag of the (log) value itself; undefined for wards without valued neighbours
+    out.loc[mask, "lag"] = np.where(np.diff(w_sub.indptr) > 0, local["lag"] + x.mean(), np.nan)
+    out.loc[mask, "local_I"] = local["I"]
+    out.loc[mask, "p_sim"] = local["p_sim"]
+    out.loc[mask, "cluster"] = local["cluster"]
+    out["cluster_label"] = out["cluster"].map(CLUSTER_LABELS)
+    return out, glob
+
+def render_cluster_map(gdf, clusters, output_path, title=None):
+    print("Generating LISA cluster map...")
+    fig, ax = plt.subplots(1, 1, figsize=(15, 12))
+    ax.set_facecolor('#ffffff')
+    colors = clusters["cluster"].map(CLUSTER_COLORS).fillna(CLUSTER_COLORS[0])
+    gdf.plot(ax=ax, color=colors.values, edgecolor='black', linewidth=0.04)
+    handles = [plt.Rectangle((0, 0), 1, 1, color=CLUSTER_COLORS[c]) for c in CLUSTER_LABELS]
+    ax.legend(handles, list(CLUSTER_LABELS.values()), title=f"Local Moran (p ≤ {SIGNIFICANCE})", loc='lower left')
+    ax.set_title(title or "Population Density Clusters by Ward (Local Moran's I)", fontsize=18, fontweight='bold', pad=20)
+    ax.axis('off')
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    plt.close()
+    return output_path
+
+def write_cluster_report(gdf, clusters, glob, output_path):
+    id_cols = [c for c in ["reg_name", "dist_name", "ward_name"] if c in gdf.columns]
+    table = pd.concat([gdf[id_cols], clusters], axis=1)
+    table.to_csv(os.path.splitext(output_path)[0] + ".csv", index=False, float_format="%.6g")
+
+    counts = clusters["cluster_label"].value_counts()
+    with open(output_path, "w") as f:
+        f.write("Tanzania 2022 Ward Density Clustering\n")
+        f.write("=====================================\n\n")
+        f.write(f"Variable: {glob['variable']} ({glob['n']} wards with a value)\n")
+        f.write(f"Contiguity: {glob['contiguity']} (mean {glob['mean_neighbours']:.2f} neighbours, "
+                f"{glob['islands']} islands)\n\n")
+        f.write(f"Global Moran's I: {glob['I']:.4f} (E[I] = {glob['expected_I']:.5f})\n")
+        f.write(f"z (normality): {glob['z_norm']:.2f}\n")
+        if glob["p_sim"] is not None:
+            f.write(f"Pseudo p-value ({glob['permutations']} permutations): {glob['p_sim']:.4f}\n")
+        f.write("\nLocal clusters:\n")
+        for label in CLUSTER_LABELS.values():
+            f.write(f"  {label:<16} {counts.get(label, 0)}\n")
+    print(f"Saved clustering report to {output_path}")
+    return output_path
+
+def perform_cluster_analysis(gpkg_path, output_dir, kind="queen", permutations=PERMUTATIONS, seed=0):
+    # The contiguity cache follows the file actually read (GeoParquet copy or GeoPackage)
+    source_path = mapped_source_path(gpkg_path)
+    gdf = load_mapped_layer(gpkg_path, source_path)
+    clusters, glob = density_clusters(gdf, source_path, kind, permutations=permutations, seed=seed)
+    report_path = write_cluster_report(gdf, clusters, glob, os.path.join(output_dir, "tza_density_clusters.txt"))
+    map_path = render_cluster_map(gdf, clusters, os.path.join(output_dir, "tza_density_clusters_map.png"))
+    return report_path, map_path
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Contiguity graph and Moran's I of ward population density.")
+    parser.add_argument("--gpkg", default=os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg"))
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "data", "processed"))
+    parser.add_argument("--contiguity", choices=CONTIGUITY_KINDS, default="queen")
+    parser.add_argument("--permutations", type=int, default=PERMUTATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    perform_cluster_analysis(args.gpkg, args.output_dir, args.contiguity, args.permutations, args.seed)
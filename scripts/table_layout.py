@@ -0,0 +1,183 @@
+import re
+from bisect import bisect_right
+
+# Bump when the layout learning or slicing changes (part of the page cache key)
+LAYOUT_VERSION = 3
+
+# Same defaults pdfplumber uses when assembling text from characters
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+NUMBER_RE = re.compile(r"^\d[\d,]*$")
+
+# Learned layouts keyed by unit label ("Ward" / "Shehia"). The extractor resets them at the
+# start of every task (a fixed block of pages), never per process: which pages take the
+# generic path then depends only on the task split, which is the same for any worker count.
+_LAYOUTS = {}
+
+def reset_layouts():
+    _LAYOUTS.clear()
+
+def unit_label(text):
+    return "Shehia" if "Shehia" in text else "Ward"
+
+def _is_number(cell):
+    return bool(cell) and bool(NUMBER_RE.match(cell.replace(' ', '')))
+
+def _column_roles(header_cells, label):
+    # Map the columns we need to their index from the concatenated header text per column
+    roles = {}
+    for j, h in enumerate(header_cells):
+        h_low = h.lower()
+        if "name" not in roles and label.lower() in h_low:
+            roles["name"] = j
+        elif "total" not in roles and "total" in h_low:
+            roles["total"] = j
+        elif "female" not in roles and "female" in h_low:
+            roles["female"] = j
+        elif "male" not in roles and "male" in h_low:
+            roles["male"] = j
+    if len(roles) != 4 or not roles["name"] < roles["total"]:
+        return None
+    return roles
+
+def learn_layout(table, rows, label):
+    # Infer column x-boundaries and column roles from one table found by pdfplumber.
+    # pdfplumber builds its columns from the distinct x0 of the cells, so the same edges
+    # reproduce its column split exactly.
+    if not rows or not table.cells:
+        return None
+    edges = sorted(set(round(c[0], 1) for c in table.cells))
+    edges.append(round(max(c[2] for c in table.cells), 1))
+    if len(edges) - 1 != len(rows[0]):
+        return None
+
+    header_cells = [""] * len(rows[0])
+    for row in rows:
+        if sum(_is_number(str(c).replace('\n', ' ').strip()) for c in row if c) >= 3:
+            break
+        for j, c in enumerate(row):
+            if c:
+                header_cells[j] += " " + str(c).replace('\n', ' ')
+
+    roles = _column_roles(header_cells, label)
+    if roles is None:
+        return None
+    return {"label": label, "edges": edges, "roles": roles}
+
+def _assemble(chars):
+    # Characters of one cell -> text, lines separated by newlines like pdfplumber cells
+    chars = sorted(chars, key=lambda c: (c["top"], c["x0"]))
+    lines = []
+    for c in chars:
+        if lines and abs(c["top"] - lines[-1][-1]["top"]) <= Y_TOLERANCE:
+            lines[-1].append(c)
+        else:
+            lines.append([c])
+    out = []
+    for line in lines:
+        line.sort(key=lambda c: c["x0"])
+        parts = []
+        prev = None
+        for c in line:
+            if prev is not None and c["x0"] - prev["x1"] > X_TOLERANCE:
+                parts.append(" ")
+            parts.append(c["text"])
+            prev = c
+        out.append("".join(parts).strip())
+    return "\n".join(out)
+
+def slice_page(page, layout):
+    # Cut the page into cells using the learned column edges and the horizontal ruling lines
+    # crossing the Total column (no intersection finding, no cell graph). Returns table rows
+    # in a canonical [name, total, male, female] form, or None if the page does not match
+    # the layout.
+    edges = layout["edges"]
+    roles = layout["roles"]
+    t = roles["total"]
+    cx = (edges[t] + edges[t + 1]) / 2
+
+    # Only stroked rules: unstroked rect edges (e.g. a page background at top=0) would pull
+    # the title text into the first row
+    ys = sorted(set(round(e["top"], 1) for e in page.edges
+                    if e["orientation"] == "h" and e.get("stroke") and e["x0"] <= cx <= e["x1"]))
+    bands = []
+    for y in ys:
+        if not bands or y - bands[-1] > 1:
+            bands.append(y)
+    if len(bands) < 3:
+        return None
+
+    n_cols = len(edges) - 1
+    grid = [[[] for _ in range(n_cols)] for _ in range(len(bands) - 1)]
+    for c in page.chars:
+        x = (c["x0"] + c["x1"]) / 2
+        y = (c["top"] + c["bottom"]) / 2
+        col = bisect_right(edges, x) - 1
+        row = bisect_right(bands, y) - 1
+        if 0 <= col < n_cols and 0 <= row < len(grid):
+            grid[row][col].append(c)
+    cells = [[_assemble(cell) for cell in row] for row in grid]
+
+    # Validate against the header: the Total/Male/Female labels must sit in their learned
+    # columns, otherwise this page uses another layout. Header bands (there may be several
+    # when a new council table starts mid-page) are dropped from the output.
+    label = layout["label"]
+    is_header = [("total" in row[t].lower() or "female" in row[roles["female"]].lower()) for row in cells]
+    if not any(is_header):
+        return None
+    head = [" ".join(row[j] for row, h in zip(cells, is_header) if h).lower() for j in range(n_cols)]
+    if ("male" not in head[roles["male"]] or "female" not in head[roles["female"]]
+            or label.lower() not in " ".join(head[:t])):
+        return None
+
+    table = [[label, "Total", "Male", "Female"]]
+    for row, h in zip(cells, is_header):
+        if h:
+            continue
+        # Name = all text left of the Total column (covers an index column and cells merged
+        # across it); a purely numeric index cell is dropped, so no index heuristic is needed
+        name_parts = [row[j].replace('\n', ' ') for j in range(t) if row[j] and not _is_number(row[j])]
+        table.append([" ".join(name_parts), row[t], row[roles["male"]], row[roles["female"]]])
+    return table
+
+def _clean(cell):
+    return str(cell).replace('\n', ' ').strip() if cell else ''
+
+def canonical_rows(rows, layout):
+    # Generic pdfplumber rows projected onto the [name, total, male, female] form that
+    # slice_page returns, without header and empty rows
+    roles = layout["roles"]
+    t = roles["total"]
+    out = []
+    for row in rows:
+        row = [_clean(c) for c in row]
+        if "total" in row[t].lower() or "female" in row[roles["female"]].lower():
+            continue
+        name = " ".join(row[j] for j in range(t) if row[j] and not _is_number(row[j]))
+        out.append([name, row[t], row[roles["male"]], row[roles["female"]]])
+    return [r for r in out if any(r)]
+
+def extract_ward_tables(page, text, table_settings=None):
+    # Fixed-column path for ward pages: try every layout learned for this unit label, and
+    # only fall back to pdfplumber's generic table finder (learning a new layout from its
+    # result) when none of them matches. A layout is only kept if slicing the page it was
+    # learned from reproduces the generic rows exactly; otherwise the label stays on the
+    # generic path. Returns (tables, method).
+    label = unit_label(text)
+    for layout in _LAYOUTS.get(label, []):
+        table = slice_page(page, layout)
+        if table is not None:
+            return [table], "fixed"
+
+    found = page.find_tables(table_settings or {})
+    tables = [t.extract() for t in found]
+    for t, rows in zip(found, tables):
+        layout = learn_layout(t, rows, label)
+        if layout is None:
+            continue
+        sliced = slice_page(page, layout)
+        if sliced is not None and [[_clean(c) for c in r] for r in sliced[1:] if any(r)] == canonical_rows(rows, layout):
+            _LAYOUTS.setdefault(label, []).append(layout)
+        break
+    return tables, "generic"
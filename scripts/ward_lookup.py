@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from mapped_store import load_mapped
+from page_cache import file_sha256
+
+# Attributes attached to every looked-up point
+LOOKUP_COLUMNS = ["ward_name", "dist_name", "reg_name", "Total_Pop"]
+
+# Points outside every polygon (coastline, islands) snap to the nearest ward within this
+# distance, in degrees (~5.5 km at the equator)
+MAX_OFFSHORE_DEG = 0.05
+
+# Points per batch: bounds the candidate-pair arrays for very large inputs
+BATCH_SIZE = 1_000_000
+
+MATCH_NONE = 0
+MATCH_INSIDE = 1
+MATCH_NEAREST = 2
+MATCH_LABELS = np.array(["none", "inside", "nearest"])
+
+INDEX_VERSION = 2
+
+class WardLookup:
+    # Point -> ward lookup over the mapped ward layer. Ward polygons are prepared once and
+    # held in an STRtree; batches of coordinates are answered with one bulk bbox query plus
+    # a vectorized prepared point-in-polygon test, then a nearest-ward pass for misses.
+
+    def __init__(self, geoms, attrs):
+        self.geoms = geoms
+        self.attrs = attrs
+        shapely.prepare(self.geoms)
+        self.tree = STRtree(self.geoms)
+
+    @classmethod
+    def from_layer(cls, layer_path):
+        gdf = load_mapped(layer_path, columns=LOOKUP_COLUMNS + ["geometry"])
+        if gdf.crs is not None and not gdf.crs.is_geographic:
+            gdf = gdf.to_crs(epsg=4326)
+        attrs = {}
+        for col in LOOKUP_COLUMNS:
+            if pd.api.types.is_numeric_dtype(gdf[col]):
+                attrs[col] = gdf[col].to_numpy(dtype=float, na_value=np.nan)
+            else:
+                attrs[col] = gdf[col].astype(object).to_numpy()
+        return cls(np.asarray(gdf.geometry.values, dtype=object), attrs)
+
+    @classmethod
+    def load_or_build(cls, layer_path, index_path):
+        # The persisted index stores ward geometries as WKB plus attribute arrays, tagged
+        # with the SHA-256 of the source layer (a rewritten or copied layer with the same
+        # size/mtime is still caught). The STRtree itself is rebuilt on load, which takes
+        # milliseconds for a few thousand wards (shapely pickles trees that way too).
+        source = [INDEX_VERSION, file_sha256(layer_path), LOOKUP_COLUMNS]
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'rb') as f:
+                    saved = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                # Unreadable index: rebuild it
+                saved = {}
+            if saved.get("source") == source:
+                return cls(shapely.from_wkb(saved["wkb"]), saved["attrs"])
+
+        lookup = cls.from_layer(layer_path)
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        with open(index_path, 'wb') as f:
+            pickle.dump({"source": source, "wkb": shapely.to_wkb(lookup.geoms), "attrs": lookup.attrs}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        return lookup
+
+    def _query_batch(self, x, y, max_offshore_deg):
+        n = len(x)
+        ward = np.full(n, -1, dtype=np.int64)
+        match = np.full(n, MATCH_NONE, dtype=np.int8)
+        distance = np.full(n, np.nan)
+
+        # NaN / infinite / out-of-range coordinates are explicit non-matches and never reach
+        # the tree (NaN points would otherwise be empty geometries with undefined distances)
+        valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y) & (np.abs(x) <= 180) & (np.abs(y) <= 90))
+        points = shapely.points(x[valid], y[valid])
+        pt_idx, ward_idx = self.tree.query(points)
+        if len(pt_idx):
+            pt_idx = valid[pt_idx]
+            inside = shapely.contains_xy(self.geoms[ward_idx], x[pt_idx], y[pt_idx])
+            pt_idx, ward_idx = pt_idx[inside], ward_idx[inside]
+            # A point on a shared boundary can fall in two wards: keep the first
+            first = np.unique(pt_idx, return_index=True)[1]
+            ward[pt_idx[first]] = ward_idx[first]
+            match[pt_idx[first]] = MATCH_INSIDE
+            distance[pt_idx[first]] = 0.0
+
+        missing = valid[ward[valid] < 0]
+        if len(missing) and max_offshore_deg:
+            (near_pt, near_ward), dist = self.tree.query_nearest(
+                shapely.points(x[missing], y[missing]), max_distance=max_offshore_deg, return_distance=True,
+                all_matches=False)
+            ward[missing[near_pt]] = near_ward
+            match[missing[near_pt]] = MATCH_NEAREST
+            distance[missing[near_pt]] = dist
+        return ward, match, distance
+
+    def lookup(self, lon, lat, max_offshore_deg=MAX_OFFSHORE_DEG, batch_size=BATCH_SIZE):
+        # lon / lat: array-likes of WGS84 coordinates. Returns a dict of arrays aligned with
+        # the input: ward_index (-1 if none), match ("inside" / "nearest" / "none"),
+        # distance_deg and every column in LOOKUP_COLUMNS.
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        parts = [self._query_batch(lon[s:s + batch_size], lat[s:s + batch_size], max_offshore_deg)
+                 for s in range(0, len(lon), batch_size)]
+        if parts:
+            ward, match, distance = (np.concatenate(p) for p in zip(*parts))
+        else:
+            ward, match, distance = np.empty(0, np.int64), np.empty(0, np.int8), np.empty(0)
+
+        found = ward >= 0
+        result = {"ward_index": ward, "match": MATCH_LABELS[match], "distance_deg": distance}
+        for col, values in self.attrs.items():
+            out = np.full(len(ward), np.nan if values.dtype.kind == 'f' else None, dtype=values.dtype)
+            out[found] = values[ward[found]]
+            result[col] = out
+        return result
+
+def benchmark_lookup(lookup, n_points=1_000_000, seed=0):
+    # Uniform random points over the layer's bounding box (includes sea and neighbours, so
+    # the nearest-ward fallback is exercised too)
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = shapely.total_bounds(lookup.geoms)
+    lon = rng.uniform(minx, maxx, n_points)
+    lat = rng.uniform(miny, maxy, n_points)
+    t0 = time.perf_counter()
+    result = lookup.lookup(lon, lat)
+    seconds = time.perf_counter() - t0
+    counts = {label: int((result["match"] == label).sum()) for label in MATCH_LABELS}
+    print(f"Looked up {n_points:,} points in {seconds:.2f}s ({n_points / seconds:,.0f} points/s) {counts}")
+    return {"points": n_points, "seconds": seconds, "points_per_second": n_points / seconds, **counts}
+
+def lookup_csv(lookup, input_csv, output_csv, lon_col="lon", lat_col="lat"):
+    df = pd.read_csv(input_csv)
+    result = lookup.lookup(df[lon_col].to_numpy(), df[lat_col].to_numpy())
+    for col, values in result.items():
+        df[col] = values
+    df.to_csv(output_csv, index=False)
+    print(f"Wrote {len(df)} looked-up points to {output_csv}")
+
+def serve(lookup, host="127.0.0.1", port=8765):
+    # Minimal local JSON front end:
+    #   GET  /lookup?lon=39.28&lat=-6.82
+    #   POST /lookup  {"lon": [...], "lat": [...]}
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, lon, lat):
+            result = lookup.lookup(lon, lat)
+            body = json.dumps({k: [None if isinstance(v, float) and np.isnan(v) else v for v in arr.tolist()]
+                               for k, arr in result.items()}).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/lookup":
+                return self.send_error(404)
+            q = parse_qs(url.query)
+            try:
+                self._reply([float(v) for v in q["lon"]], [float(v) for v in q["lat"]])
+            except (KeyError, ValueError):
+                self.send_error(400, "expected numeric lon and lat query parameters")
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/lookup":
+                return self.send_error(404)
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self._reply(payload["lon"], payload["lat"])
+            except (KeyError, ValueError, TypeError):
+                self.send_error(400, "expected JSON body {\"lon\": [...], \"lat\": [...]}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving ward lookups on http://{host}:{port}/lookup (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    LAYER = os.path.join(ROOT, "data", "processed", "TZA_2022_Census_Final_Mapped.gpkg")
+    INDEX = os.path.join(ROOT, "data", "cache", "ward_lookup_index.pkl")
+
+    parser = argparse.ArgumentParser(description="Attach ward, council, region and 2022 population to points.")
+    parser.add_argument("input_csv", nargs="?", help="CSV with lon/lat columns")
+    parser.add_argument("output_csv", nargs="?", help="where to write the enriched CSV")
+    parser.add_argument("--lon-col", default="lon")
+    parser.add_argument("--lat-col", default="lat")
+    parser.add_argument("--layer", default=LAYER, help="mapped ward layer (.gpkg or .parquet)")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="time N random lookups")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="run a local HTTP lookup service")
+    args = parser.parse_args()
+
+    lookup = WardLookup.load_or_build(args.layer, INDEX)
+    if args.benchmark:
+        benchmark_lookup(lookup, args.benchmark)
+    if args.input_csv and args.output_csv:
+        lookup_csv(lookup, args.input_csv, args.output_csv, args.lon_col, args.lat_col)
+    if args.serve:
+        serve(lookup, port=args.serve)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top-level modules (they are run as `python scripts/x.py`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+@pytest.fixture(scope="session")
+def synthetic_census(tmp_path_factory):
+    # Small NBS-style ward-table PDF (about 50 pages) and the hierarchy it was drawn from
+    pytest.importorskip("pdfplumber")
+    pytest.importorskip("matplotlib")
+    from benchmark_suite import synthetic_hierarchy, write_census_pdf
+    hierarchy = synthetic_hierarchy(1200, seed=0)
+    pdf_path = str(tmp_path_factory.mktemp("census") / "census.pdf")
+    write_census_pdf(hierarchy, pdf_path)
+    return hierarchy, pdf_path
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+from shapely.geometry import box
+from area_engine import geometry_areas_sqkm
+
+def _wards():
+    # 0.2 deg squares from the far west (Kigoma, outside UTM zone 37) to the coast
+    return gpd.GeoSeries([box(x, -5.0, x + 0.2, -4.8) for x in (29.8, 33.0, 36.0, 39.2)], crs="EPSG:4326")
+
+def test_equal_area_matches_geodesic_reference():
+    wards = _wards()
+    laea = geometry_areas_sqkm(wards)
+    geodesic = geometry_areas_sqkm(wards, method="geodesic")
+    np.testing.assert_allclose(laea, geodesic, rtol=1e-4)
+    # A single UTM zone is visibly off for the western ward
+    utm = wards.to_crs(epsg=32737).area.to_numpy() / 10**6
+    assert abs(utm[0] / geodesic[0] - 1) > 1e-3
+
+def test_cache_hit_and_miss_on_source_file(tmp_path):
+    wards = _wards()
+    source = tmp_path / "wards.shp"
+    source.write_bytes(b"layer")
+    cache_dir = str(tmp_path / "cache")
+    areas = geometry_areas_sqkm(wards, cache_dir=cache_dir, source_path=str(source))
+    assert len(os.listdir(cache_dir)) == 1
+
+    # Hit: same file, so the cached array is returned even for other geometries
+    cached = geometry_areas_sqkm(wards.scale(2, 2), cache_dir=cache_dir, source_path=str(source))
+    np.testing.assert_array_equal(cached, areas)
+
+    # Miss: the source file changed
+    source.write_bytes(b"layer, rewritten")
+    rescaled = geometry_areas_sqkm(wards.scale(2, 2), cache_dir=cache_dir, source_path=str(source))
+    np.testing.assert_allclose(rescaled, 4 * areas, rtol=1e-3)
+    assert len(os.listdir(cache_dir)) == 2
+
+    # No source file: nothing is cached
+    geometry_areas_sqkm(wards, cache_dir=str(tmp_path / "other"))
+    assert not os.path.exists(tmp_path / "other")
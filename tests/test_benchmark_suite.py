@@ -0,0 +1,33 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+from benchmark_suite import print_report, synthetic_hierarchy
+
+def test_synthetic_hierarchy_is_reproducible_and_consistent():
+    df = synthetic_hierarchy(500, seed=3)
+    pd.testing.assert_frame_equal(df, synthetic_hierarchy(500, seed=3))
+    assert len(df) == 500
+    assert (df["Male_Pop"] + df["Female_Pop"] == df["Total_Pop"]).all()
+    assert not df.duplicated(["Region", "Council", "Ward"]).any()
+    # Ward names collide across councils, as in the real report
+    assert df["Ward"].duplicated().any()
+
+def test_synthetic_census_pdf_round_trips(synthetic_census):
+    pytest.importorskip("pdfplumber")
+    from extract_census_data import extract_census
+    hierarchy, pdf_path = synthetic_census
+    extracted = extract_census(pdf_path, start_page=0)
+    key = ["Region", "Ward", "Total_Pop", "Male_Pop", "Female_Pop"]
+    assert len(extracted) == len(hierarchy)
+    pd.testing.assert_frame_equal(extracted[key].reset_index(drop=True), hierarchy[key].reset_index(drop=True),
+                                  check_dtype=False)
+
+def test_report_compares_against_baseline(capsys):
+    report = {"runs": [{"scale": 1, "extract": {"seconds": {"total": 3.0}}, "map": {"seconds": {"join": 1.0}}}]}
+    baseline = {"runs": [{"scale": 1, "extract": {"seconds": {"total": 6.0}}}]}
+    print_report(report, baseline)
+    lines = capsys.readouterr().out.splitlines()
+    extract = next(line for line in lines if "extract.total" in line)
+    assert extract.split()[-1] == "0.50x"
+    join = next(line for line in lines if "map.join" in line)
+    assert not join.endswith("x")
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("pyogrio")
+import matplotlib
+matplotlib.use("Agg")
+from country_compare import SKETCH_ACCURACY, AreaSummary, QuantileSketch, render_size_histograms
+
+def _areas(seed, n):
+    # Log-normal unit areas spanning several decades, like real admin layers
+    return np.random.default_rng(seed).lognormal(mean=3, sigma=2, size=n)
+
+def test_merged_sketch_equals_sketch_of_union():
+    a, b = _areas(0, 5000), _areas(1, 3000)
+    merged = QuantileSketch()
+    merged.add(a)
+    other = QuantileSketch()
+    other.add(b)
+    merged.merge(other)
+    combined = QuantileSketch()
+    combined.add(np.concatenate([a, b]))
+    assert merged.counts == combined.counts
+    assert QuantileSketch.from_dict(merged.to_dict()).counts == combined.counts
+
+def test_quantiles_within_relative_accuracy():
+    values = np.concatenate([_areas(2, 20000), [1e-3, 5e5]])
+    sketch = QuantileSketch()
+    sketch.add(values)
+    q = np.linspace(0, 1, 101)
+    exact = np.quantile(values, q, method="lower")
+    assert np.all(np.abs(sketch.quantile(q) - exact) <= SKETCH_ACCURACY * exact * (1 + 1e-9))
+
+def test_area_summaries_merge_like_one_pass():
+    a, b = _areas(3, 1000), np.append(_areas(4, 500), [np.nan, -1.0])
+    merged = AreaSummary("A").add(a).merge(AreaSummary("B").add(b))
+    single = AreaSummary("A").add(np.concatenate([a, b]))
+    assert merged.counts.tolist() == single.counts.tolist()
+    assert (merged.n, merged.n_invalid) == (single.n, single.n_invalid) == (1500, 2)
+    assert merged.total_sqkm == pytest.approx(single.total_sqkm)
+    assert merged.median == single.median
+
+@pytest.mark.parametrize("scale", ["share", "count"])
+def test_histogram_scales(tmp_path, scale):
+    summaries = [AreaSummary("A").add(_areas(5, 1000)), AreaSummary("B").add(_areas(6, 50))]
+    assert render_size_histograms(summaries, str(tmp_path / "h.png"), scale=scale) == str(tmp_path / "h.png")
+    with pytest.raises(ValueError):
+        render_size_histograms(summaries, str(tmp_path / "h.png"), scale="percent")
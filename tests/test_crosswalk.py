@@ -0,0 +1,53 @@
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("scipy")
+import pandas as pd
+from shapely.geometry import Polygon, box
+from crosswalk import Crosswalk, build_crosswalk, interpolate_layer
+
+def _source():
+    # 2x2 block of wards plus one ward far from the target layer; ward 2 is unmatched
+    # (nullable Int32 <NA>, as in the GeoParquet copy)
+    geoms = [box(0, 0, 1, 1), box(1, 0, 2, 1), box(0, 1, 1, 2), box(1, 1, 2, 2), box(5, 0, 6, 1)]
+    return gpd.GeoDataFrame({
+        "ward_name": ["A", "B", "C", "D", "E"],
+        "Total_Pop": pd.array([100, 200, pd.NA, 400, 50], dtype="Int32"),
+    }, geometry=geoms, crs="EPSG:4326")
+
+def _target():
+    # T0 covers wards A and C exactly, T1 the left half of B and D (vertices on the shared
+    # ward corners, so edges coincide after projection)
+    return gpd.GeoDataFrame({"name": ["T0", "T1"]}, geometry=[
+        Polygon([(0, 0), (1, 0), (1, 1), (1, 2), (0, 2)]),
+        Polygon([(1, 0), (1.5, 0), (1.5, 1), (1.5, 2), (1, 2), (1, 1)]),
+    ], crs="EPSG:4326")
+
+def test_preserves_totals_and_reports_outside_population():
+    out, report = interpolate_layer(_source(), _target(), ["Total_Pop"])
+    assert out["Total_Pop"].tolist() == pytest.approx([100, 600], rel=1e-6)
+    col = report["columns"]["Total_Pop"]
+    assert col["source_total"] == 750
+    assert col["assigned_total"] == pytest.approx(700, rel=1e-6)
+    assert col["outside_total"] == pytest.approx(50, rel=1e-6)
+    assert col["missing_source_values"] == 1
+    assert report["fully_outside"] == 1
+
+def test_area_shares_drop_the_uncovered_part():
+    out, report = interpolate_layer(_source(), _target(), ["Total_Pop"], preserve_totals=False)
+    assert out["Total_Pop"].tolist() == pytest.approx([100, 300], rel=1e-3)
+    assert report["columns"]["Total_Pop"]["outside_total"] == pytest.approx(350, rel=1e-3)
+
+def test_intensive_interpolation_skips_missing_values():
+    cw = build_crosswalk(_source(), _target())
+    density = [1.0, 2.0, float("nan"), 4.0, 8.0]
+    assert cw.interpolate(density, "intensive").tolist() == pytest.approx([1.0, 3.0], rel=1e-3)
+
+def test_saved_crosswalk_round_trips(tmp_path):
+    cw = build_crosswalk(_source(), _target())
+    path = str(tmp_path / "cw.npz")
+    cw.save(path, key="k")
+    assert Crosswalk.load(path, key="other") is None
+    loaded = Crosswalk.load(path, key="k")
+    assert (loaded.areas != cw.areas).nnz == 0
+    assert loaded.coverage.tolist() == pytest.approx(cw.coverage.tolist())
@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+import download_census
+from download_census import ChecksumError, StreamingUnzipper, download_and_unzip, download_file
+
+BODY = bytes(range(256)) * 4096  # 1 MiB
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        rng = self.headers.get("Range")
+        server.ranges.append(rng)
+        body = server.body
+        start = 0
+        if rng and server.honour_range:
+            start = int(rng.split("=")[1].rstrip("-"))
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        data = body[start:]
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if server.truncate_next:
+            # Advertise the full length, send half, drop the connection
+            server.truncate_next = False
+            self.wfile.write(data[:len(data) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(download_census, "BACKOFF_SECONDS", 0)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.body = BODY
+    httpd.honour_range = True
+    httpd.truncate_next = False
+    httpd.ranges = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/file"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_resumes_part_file_with_range(server, tmp_path):
+    target = tmp_path / "file.bin"
+    with open(str(target) + ".part", "wb") as f:
+        f.write(BODY[:1000])
+    download_file(server.url, str(target), sha256=hashlib.sha256(BODY).hexdigest())
+    assert _read(target) == BODY
+    assert server.ranges == ["bytes=1000-"]
+    assert not os.path.exists(str(target) + ".part")
+
+def test_retries_and_resumes_after_dropped_connection(server, tmp_path):
+    server.truncate_next = True
+    target = tmp_path / "file.bin"
+    download_file(server.url, str(target), sha256=hashlib.sha256(BODY).hexdigest())
+    assert _read(target) == BODY
+    assert server.ranges[0] is None
+    assert server.ranges[1] is not None and server.ranges[1].startswith("bytes=")
+
+def test_restarts_when_server_ignores_range(server, tmp_path):
+    server.honour_range = False
+    target = tmp_path / "file.bin"
+    with open(str(target) + ".part", "wb") as f:
+        f.write(BODY[:1000])
+    download_file(server.url, str(target), sha256=hashlib.sha256(BODY).hexdigest())
+    assert _read(target) == BODY
+
+def test_checksum_mismatch_removes_download(server, tmp_path):
+    target = tmp_path / "file.bin"
+    with pytest.raises(ChecksumError):
+        download_file(server.url, str(target), sha256="0" * 64)
+    assert not target.exists()
+    assert not os.path.exists(str(target) + ".part")
+
+def _zip_bytes(files, **kwargs):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", **kwargs) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+FILES = {"wards/wards.shp": BODY[:5000], "wards/wards.dbf": b"attributes" * 300, "README.txt": b"hello"}
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_streaming_unzipper_extracts_in_small_chunks(tmp_path, compression):
+    data = _zip_bytes(FILES, compression=compression)
+    unzipper = StreamingUnzipper(str(tmp_path))
+    for i in range(0, len(data), 777):
+        unzipper.feed(data[i:i + 777])
+    assert unzipper.close()
+    for name, content in FILES.items():
+        assert _read(tmp_path / name) == content
+
+def test_streaming_unzipper_rejects_path_traversal(tmp_path):
+    unzipper = StreamingUnzipper(str(tmp_path))
+    with pytest.raises(ValueError):
+        unzipper.feed(_zip_bytes({"../evil.txt": b"x"}))
+
+def test_download_and_unzip_over_http(server, tmp_path):
+    server.body = _zip_bytes(FILES, compression=zipfile.ZIP_DEFLATED)
+    out = tmp_path / "out"
+    download_and_unzip(server.url, str(tmp_path / "files.zip"), str(out))
+    for name, content in FILES.items():
+        assert _read(out / name) == content
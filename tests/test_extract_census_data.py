@@ -0,0 +1,130 @@
+import pytest
+
+pytest.importorskip("pdfplumber")
+pd = pytest.importorskip("pandas")
+from extract_census_data import extract_census
+
+def test_parallel_extraction_matches_serial(synthetic_census):
+    _, pdf_path = synthetic_census
+    serial = extract_census(pdf_path, start_page=0, workers=1)
+    parallel = extract_census(pdf_path, start_page=0, workers=2)
+    assert len(serial) > 0
+    pd.testing.assert_frame_equal(serial, parallel)
+
+def test_cached_replay_matches_fresh_extraction(synthetic_census, tmp_path):
+    _, pdf_path = synthetic_census
+    fresh = extract_census(pdf_path, start_page=0, workers=2, cache_dir=str(tmp_path))
+    replayed = extract_census(pdf_path, start_page=0, workers=1, cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(fresh, replayed)
+
+def test_summary_page_totals_are_captured():
+    from extract_census_data import parse_page
+    state = {"region": "Unknown", "council": "Unknown"}
+    text = "Table 3.0: Population Distribution by Council Dodoma Region, 2022\n..."
+    table = [["Council", "Total", "Male", "Female"],
+             ["Kondoa District Council", "300", "140", "160"],
+             ["Dodoma City Council", "1,000", "480", "520"],
+             ["Total", "1,300", "620", "680"]]
+    summaries = []
+    assert parse_page(text, [table], state, summaries) == []
+    assert [(s["Level"], s["Region"], s["Council"], s["Total_Pop"]) for s in summaries] == [
+        ("council", "DODOMA", "Kondoa District Council", 300),
+        ("council", "DODOMA", "Dodoma City Council", 1000),
+        ("region", "DODOMA", "", 1300),
+    ]
+
+def test_national_summary_table_is_captured():
+    from extract_census_data import parse_page
+    state = {"region": "Unknown", "council": "Unknown"}
+    text = "Table 1.0: Population Distribution by Region, Tanzania 2022"
+    table = [["Region", "Total", "Male", "Female"],
+             ["Dodoma", "400", "190", "210"],
+             ["Arusha", "1,000", "490", "510"],
+             ["Dar es Salaam", "2,000", "970", "1,030"],
+             ["Total", "3,400", "1,650", "1,750"]]
+    summaries = []
+    parse_page(text, [table], state, summaries)
+    assert [(s["Level"], s["Region"], s["Total_Pop"]) for s in summaries] == [
+        ("region", "DODOMA", 400), ("region", "ARUSHA", 1000), ("region", "DAR ES SALAAM", 2000),
+        ("national", "", 3400),
+    ]
+
+def test_pages_do_not_depend_on_start_page_or_cache_state(synthetic_census, tmp_path):
+    import os
+    import pdfplumber
+    from extract_census_data import PAGES_PER_TASK, iter_raw_pages
+    from page_cache import PageCache
+    _, pdf_path = synthetic_census
+    with pdfplumber.open(pdf_path) as pdf:
+        total = len(pdf.pages)
+
+    def raw(start, workers, cache=None):
+        return [(i, text, tables) for i, text, tables, _ in iter_raw_pages(pdf_path, start, total, workers, cache=cache)]
+
+    cache = PageCache(str(tmp_path), pdf_path)
+    full = raw(0, 1, cache)
+    # A start page inside a block still reads that block from its first page
+    start = PAGES_PER_TASK + 5
+    assert raw(start, 2) == full[start:]
+
+    # Drop a few cached pages in the middle of blocks: their blocks are re-extracted whole
+    for i in range(3, total, PAGES_PER_TASK):
+        os.remove(cache._path(i))
+    assert raw(0, 2, cache) == full
+
+def _interrupt_after(pages, n):
+    for k, page in enumerate(pages):
+        if k == n:
+            raise KeyboardInterrupt
+        yield page
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_interrupted_stream_leaves_partial_file_and_resumes(synthetic_census, tmp_path, fmt):
+    import os
+    from extract_census_data import iter_census_pages, write_census_stream
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    read = pd.read_csv if fmt == "csv" else pd.read_parquet
+    _, pdf_path = synthetic_census
+    output = str(tmp_path / f"census.{fmt}")
+    cache_dir = str(tmp_path / "cache")
+    full = extract_census(pdf_path, start_page=0)
+
+    with pytest.raises(KeyboardInterrupt):
+        pages = iter_census_pages(pdf_path, start_page=0, cache_dir=cache_dir)
+        write_census_stream(_interrupt_after(pages, 20), output, row_group_size=50)
+    # The partial file is readable and holds exactly the rows of the pages parsed so far
+    partial = read(output, keep_default_na=False) if fmt == "csv" else read(output)
+    assert 0 < len(partial) < len(full)
+    pd.testing.assert_frame_equal(partial, full.iloc[:len(partial)], check_dtype=False)
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) >= 20
+
+    # Re-running replays the cached pages and rewrites the complete file
+    pages = iter_census_pages(pdf_path, start_page=0, cache_dir=cache_dir)
+    assert write_census_stream(pages, output, row_group_size=50) == len(full)
+    resumed = read(output, keep_default_na=False) if fmt == "csv" else read(output)
+    pd.testing.assert_frame_equal(resumed, full, check_dtype=False)
+
+WARD_ROWS = "1 Kikuyu 12,345 6,000 6,345\n2 Mnadani 8,100 4,050 4,050 100.0\n3 Matale A 950 470 480\n"
+
+@pytest.mark.parametrize("text, expected", [
+    # Ward table with its header, Mainland and Zanzibar
+    ("2.1 KONDOA DISTRICT COUNCIL\nNo Ward Total Male Female\n" + WARD_ROWS, "ward_table"),
+    ("Shehia Total Male Female\n" + WARD_ROWS, "ward_table"),
+    # Continuation page: no header, but rows shaped like ward rows with Total = Male + Female
+    (WARD_ROWS, "ward_table"),
+    # Council summary page
+    ("Table 3.0: Population Distribution by Council Dodoma Region, 2022\n"
+     "Kondoa District Council 300 140 160\nTotal 1,300 620 680", "council_summary"),
+    # Numbers without header whose columns are not Total / Male / Female (e.g. age groups)
+    ("Age 0-4 5-9 10-14\nKondoa 1,200 1,100 900\nChemba 800 700 650\nBahi 500 400 300", "irrelevant"),
+    # Too few ward-shaped rows to count as a table
+    ("Tanzania recorded 61,741,120 30,053,130 31,687,990 persons", "irrelevant"),
+    # Narrative and empty pages
+    ("The 2022 census was carried out in August.", "irrelevant"),
+    ("", "irrelevant"),
+    (None, "irrelevant"),
+])
+def test_classify_page(text, expected):
+    from extract_census_data import classify_page
+    assert classify_page(text) == expected
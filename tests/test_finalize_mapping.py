@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("geopandas")
+from finalize_mapping import clear_normalization_memo, normalize_series, normalize_text
+
+NAMES = ["Kondoa District Council", "kondoa  district council", "Nghaheleze", "USA RIVER",
+         "12. Mji Mkuu", "Halmashauri ya Wilaya ya Kondoa", "Oloirien / Magaiduru", "", "Kondoa District Council"]
+
+@pytest.mark.parametrize("dtype", [object, str, "string"])
+def test_normalize_series_matches_normalize_text(dtype):
+    missing = [None, np.nan] if dtype is object else [None]
+    values = pd.Series(NAMES + missing, index=range(10, 10 + len(NAMES) + len(missing))).astype(dtype)
+    if dtype is object:
+        values = pd.concat([values, pd.Series([pd.NA], index=[99], dtype=object)])
+    clear_normalization_memo()
+    # Values and index must match; the result dtype (object or str) depends on the pandas version
+    pd.testing.assert_series_equal(normalize_series(values), values.apply(normalize_text), check_dtype=False)
+
+def test_normalize_text_rules():
+    assert normalize_text("Nghaheleze") == "NGAHELEZE"
+    assert normalize_text("Kondoa Town Council") == "KONDOA"
+    assert normalize_text("3 Mji Mkuu") == "MJI MKUU"
+    for missing in [None, np.nan, pd.NA]:
+        assert normalize_text(missing) == ""
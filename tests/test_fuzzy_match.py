@@ -0,0 +1,61 @@
+import pytest
+
+from fuzzy_match import build_block_index, edit_similarity, fuzzy_match
+
+def _blocks(entries):
+    # entries: (region, district, ward name, census id)
+    return build_block_index([(r, d) for r, d, _, _ in entries], [w for _, _, w, _ in entries],
+                             [i for _, _, _, i in entries])
+
+def test_threshold_and_margin_decide_acceptance():
+    blocks = _blocks([("R", "D", "NGAHELEZE", 1), ("R", "D", "NYAMAGANA KATI", 2),
+                      ("R", "D", "NYAMAGANA KATA", 3)])
+    queries = [("R", "D", "NGAHELEZA", "q1"),      # one letter off: 1 - 1/9 > 0.85
+               ("R", "D", "NGAHE", "q2"),          # 5/9 of the name: below the threshold
+               ("R", "D", "NYAMAGANA KAT", "q3")]  # close to both KATI and KATA: no clear winner
+    _, accepted = fuzzy_match([(r, d) for r, d, _, _ in queries], [w for _, _, w, _ in queries],
+                              [q for _, _, _, q in queries], blocks)
+    assert edit_similarity("NGAHELEZA", "NGAHELEZE") == pytest.approx(8 / 9)
+    assert accepted == {"q1": 1}
+    _, lenient = fuzzy_match([("R", "D")], ["NGAHE"], ["q2"], blocks, min_score=0.5)
+    assert lenient == {"q2": 1}
+
+def test_candidates_come_from_the_query_block_only():
+    blocks = _blocks([("R", "D1", "MBEZI", 1), ("R", "D2", "MBEZE", 2)])
+    candidates, accepted = fuzzy_match([("R", "D2"), ("R", "D3")], ["MBEZI", "MBEZI"], ["q1", "q2"], blocks,
+                                       min_score=0.75)
+    assert {c["candidate_id"] for c in candidates} == {2}
+    assert accepted == {"q1": 2}
+
+def test_each_census_ward_is_claimed_once_best_score_first():
+    blocks = _blocks([("R", "D", "KIBAHA MJINI", 7)])
+    # Both queries propose ward 7; the better score claims it whatever the query order
+    for names, ids in [(["KIBAHA MJIMI", "KIBAHA MJINI"], ["q1", "q2"]),
+                       (["KIBAHA MJINI", "KIBAHA MJIMI"], ["q2", "q1"])]:
+        candidates, accepted = fuzzy_match([("R", "D")] * 2, names, ids, blocks)
+        assert accepted == {"q2": 7}
+        assert {c["query_id"]: c["accepted"] for c in candidates} == {"q1": False, "q2": True}
+
+def test_review_file_columns(tmp_path):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("geopandas")
+    from finalize_mapping import fuzzy_join
+    merged = pd.DataFrame({
+        "reg_name": ["Dodoma", "Dodoma"], "dist_name": ["Kondoa", "Kondoa"], "ward_name": ["Nghahelez", "Kolo"],
+        "reg_norm": ["DODOMA", "DODOMA"], "dist_norm": ["KONDOA", "KONDOA"], "ward_norm": ["NGAHELEZ", "KOLO"],
+        "Total_Pop": [None, 500.0], "Male_Pop": [None, 250.0], "Female_Pop": [None, 250.0],
+    })
+    census = pd.DataFrame({
+        "Region": ["DODOMA", "DODOMA"], "Council": ["Kondoa District Council"] * 2, "Ward": ["Ngaheleze", "Kolo"],
+        "reg_norm": ["DODOMA", "DODOMA"], "dist_norm": ["KONDOA", "KONDOA"], "ward_norm": ["NGAHELEZE", "KOLO"],
+        "Total_Pop": [300, 500], "Male_Pop": [140, 250], "Female_Pop": [160, 250],
+    }, index=[10, 11])
+    review_path = str(tmp_path / "review.csv")
+    out = fuzzy_join(merged, census, review_path)
+    assert out.loc[0, "Total_Pop"] == 300
+    review = pd.read_csv(review_path)
+    assert review.columns.tolist() == [
+        "query_id", "query_name", "candidate_name", "candidate_id", "rank", "score", "trigram_jaccard", "accepted",
+        "reg_name", "dist_name", "ward_name", "Region", "Council", "Ward"]
+    # KOLO is already matched exactly, so it is neither queried nor offered as a candidate
+    assert review[["query_id", "candidate_id", "accepted"]].values.tolist() == [[0, 10, True]]
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+pytest.importorskip("geopandas")
+from mapped_store import mapped_source_path
+
+def _touch(path, mtime):
+    path.write_bytes(b"")
+    os.utime(path, (mtime, mtime))
+
+def test_fresh_parquet_is_preferred(tmp_path):
+    _touch(tmp_path / "layer.gpkg", 1_000)
+    _touch(tmp_path / "layer.parquet", 2_000)
+    assert mapped_source_path(str(tmp_path / "layer.gpkg")) == str(tmp_path / "layer.parquet")
+
+def test_stale_parquet_is_ignored(tmp_path):
+    _touch(tmp_path / "layer.parquet", 1_000)
+    _touch(tmp_path / "layer.gpkg", 2_000)
+    assert mapped_source_path(str(tmp_path / "layer.gpkg")) == str(tmp_path / "layer.gpkg")
+
+def test_missing_parquet_falls_back_to_gpkg(tmp_path):
+    _touch(tmp_path / "layer.gpkg", 1_000)
+    assert mapped_source_path(str(tmp_path / "layer.gpkg")) == str(tmp_path / "layer.gpkg")
@@ -0,0 +1,60 @@
+import os
+
+from page_cache import PageCache
+
+def _pdf(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def test_hit_after_rerun(tmp_path):
+    pdf = _pdf(tmp_path, "a.pdf", b"%PDF a")
+    cache_dir = str(tmp_path / "cache")
+    PageCache(cache_dir, pdf, {"v": 1}).put(3, "text", [[["Ward", "Total"]]])
+
+    cache = PageCache(cache_dir, pdf, {"v": 1})
+    assert cache.contains(3)
+    assert cache.get(3) == ("text", [[["Ward", "Total"]]])
+    assert cache.hits == 1
+    assert cache.get(4) is None
+
+def test_miss_after_pdf_or_settings_change(tmp_path):
+    pdf = _pdf(tmp_path, "a.pdf", b"%PDF a")
+    cache_dir = str(tmp_path / "cache")
+    PageCache(cache_dir, pdf, {"v": 1}).put(0, "text", None)
+
+    assert not PageCache(cache_dir, pdf, {"v": 2}).contains(0)
+    # Same path, new content: keyed by the file hash, not its name
+    _pdf(tmp_path, "a.pdf", b"%PDF b")
+    assert not PageCache(cache_dir, pdf, {"v": 1}).contains(0)
+    # None and {} both mean default settings
+    other = _pdf(tmp_path, "b.pdf", b"%PDF c")
+    PageCache(cache_dir, other, None).put(0, "text", None)
+    assert PageCache(cache_dir, other, {}).contains(0)
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    pdf = _pdf(tmp_path, "a.pdf", b"%PDF a")
+    cache = PageCache(str(tmp_path / "cache"), pdf)
+    for i in range(4):
+        cache.put(i, "x" * 1000, None)
+        os.utime(cache._path(i), (i, i))
+    # Page 0 was written first but read last, so page 1 is the oldest entry now
+    assert cache.get(0) is not None
+    cache.max_bytes = 3 * os.path.getsize(cache._path(0))
+
+    assert cache.enforce_size_cap() == 1
+    assert [cache.contains(i) for i in range(4)] == [True, False, True, True]
+
+def test_invalidate_only_drops_this_pdf_and_settings(tmp_path):
+    pdf = _pdf(tmp_path, "a.pdf", b"%PDF a")
+    cache_dir = str(tmp_path / "cache")
+    cache = PageCache(cache_dir, pdf, {"v": 1})
+    other = PageCache(cache_dir, pdf, {"v": 2})
+    cache.put(0, "text", None)
+    other.put(0, "text", None)
+
+    cache.invalidate()
+    assert not cache.contains(0)
+    assert other.contains(0)
+    cache.put(1, "text", None)
+    assert cache.get(1) == ("text", None)
@@ -0,0 +1,85 @@
+import pipeline
+from pipeline import FileHasher, outputs_signature, run_pipeline, stage_fingerprint
+
+def _noop(params):
+    pass
+
+def _stages(tmp_path):
+    files = {name: tmp_path / name for name in ["in.txt", "a.txt", "b.txt", "a.parquet"]}
+    for name in ["in.txt", "a.txt", "b.txt"]:
+        files[name].write_text(name)
+    stages = {
+        "a": {"func": _noop, "deps": [], "inputs": [str(files["in.txt"])], "outputs": [str(files["a.txt"])],
+              "optional_outputs": [str(files["a.parquet"])], "code": ["pipeline.py"], "params": {}},
+        "b": {"func": _noop, "deps": ["a"], "inputs": [str(files["a.txt"]), str(files["a.parquet"])],
+              "outputs": [str(files["b.txt"])], "code": ["pipeline.py"], "params": {}},
+    }
+    return stages, files
+
+def _up_to_date_state(stages):
+    state = {"stages": {}, "files": {}}
+    hasher = FileHasher(state["files"])
+    for name, stage in stages.items():
+        state["stages"][name] = {"fingerprint": stage_fingerprint(name, stage, hasher),
+                                 "outputs": outputs_signature(stage, hasher)}
+    return state
+
+def _dry_run(monkeypatch, stages, state):
+    monkeypatch.setattr(pipeline, "STAGES", stages)
+    monkeypatch.setattr(pipeline, "load_state", lambda: state)
+    monkeypatch.setattr(pipeline, "save_state", lambda state: None)
+    return run_pipeline(dry_run=True, jobs=1)
+
+def test_missing_optional_output_keeps_signature(tmp_path):
+    stages, _ = _stages(tmp_path)
+    assert outputs_signature(stages["a"], FileHasher({})) is not None
+
+def test_dry_run_up_to_date(tmp_path, monkeypatch):
+    stages, _ = _stages(tmp_path)
+    summary = _dry_run(monkeypatch, stages, _up_to_date_state(stages))
+    assert summary == {"a": "up to date", "b": "up to date"}
+
+def test_dry_run_marks_dependents_of_stale_stages(tmp_path, monkeypatch):
+    stages, files = _stages(tmp_path)
+    state = _up_to_date_state(stages)
+    files["in.txt"].write_text("changed")
+    summary = _dry_run(monkeypatch, stages, state)
+    assert summary == {"a": "would run", "b": "would run"}
+
+def test_optional_output_change_makes_dependents_stale(tmp_path, monkeypatch):
+    stages, files = _stages(tmp_path)
+    state = _up_to_date_state(stages)
+    files["a.parquet"].write_text("stale copy")
+    summary = _dry_run(monkeypatch, stages, state)
+    assert summary == {"a": "would run", "b": "would run"}
+
+def _record_workers(params):
+    with open(params["log"], "a") as f:
+        f.write(f"{params['name']} {params.get('workers', 1)}\n")
+
+def test_split_workers_shares_the_budget(monkeypatch):
+    stages = {
+        "serial": {"params": {}},
+        "wide": {"params": {"workers": 64}},
+        "narrow": {"params": {"workers": 2}},
+    }
+    monkeypatch.setattr(pipeline, "STAGES", stages)
+    assert pipeline.split_workers(["wide", "serial", "narrow"], 8) == {"serial": 1, "wide": 3, "narrow": 2}
+    assert pipeline.split_workers(["wide"], 8) == {"wide": 8}
+    # No budget left: nothing starts; a tight budget starts what fits, the rest waits
+    assert pipeline.split_workers(["wide", "serial"], 0) == {}
+    assert pipeline.split_workers(["serial", "wide", "narrow"], 2) == {"serial": 1, "wide": 1}
+
+def test_concurrent_stages_never_exceed_the_worker_budget(tmp_path, monkeypatch):
+    log = str(tmp_path / "workers.log")
+    stages = {name: {"func": _record_workers, "deps": [], "inputs": [], "outputs": [str(tmp_path / name)],
+                     "code": ["pipeline.py"], "params": {"name": name, "log": log, "workers": 16}}
+              for name in ["a", "b", "c"]}
+    monkeypatch.setattr(pipeline, "STAGES", stages)
+    monkeypatch.setattr(pipeline, "load_state", lambda: {})
+    monkeypatch.setattr(pipeline, "save_state", lambda state: None)
+    run_pipeline(workers=6)
+    with open(log) as f:
+        used = dict(line.split() for line in f)
+    assert sorted(used) == ["a", "b", "c"]
+    assert sum(int(n) for n in used.values()) == 6
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from profiling import NullProfiler, RunProfiler, get_profiler, set_profiler
+
+def test_null_profiler_is_a_no_op():
+    profiler = NullProfiler()
+    assert not profiler.enabled
+    with profiler.stage("anything"):
+        profiler.count("n", 1)
+        profiler.timing("t", 1.0)
+        profiler.page(0, total_s=1.0)
+    assert not hasattr(profiler, "stages")
+
+def test_nested_stages_counters_and_merge():
+    profiler = RunProfiler()
+    with profiler.stage("map"):
+        with profiler.stage("join"):
+            profiler.count("matched", 10)
+        profiler.timing("render", 0.5)
+    # Inner stages finish first; names are "/"-joined
+    assert [s["stage"] for s in profiler.stages] == ["map/join", "map"]
+    assert all(s["wall_s"] >= 0 and s["cpu_s"] >= 0 for s in profiler.stages)
+
+    worker = RunProfiler()
+    with worker.stage("extract"):
+        worker.count("pages", 3)
+    worker.page(7, total_s=0.1)
+    profiler.merge(worker.raw(), "extract_stage")
+    assert profiler.stages[-1]["stage"] == "extract_stage/extract"
+    assert profiler.counters == {"matched": 10, "extract_stage/pages": 3}
+    assert profiler.timings == {"render": 0.5}
+    assert profiler.pages == [{"page": 7, "total_s": 0.1}]
+
+def test_report_groups_timed_pages_by_schema(tmp_path):
+    def timed(total_s):
+        return {"text_s": total_s / 2, "tables_s": total_s / 4, "parse_s": total_s / 4, "total_s": total_s}
+
+    profiler = RunProfiler()
+    profiler.page(1, schema="ward_5col", **timed(0.2))
+    profiler.page(2, schema="ward_5col", **timed(0.5))
+    profiler.page(3, schema=None, **timed(0.1))
+    # Cached pages have no timings and are left out of the aggregates
+    profiler.page(4, schema="ward_5col", cached=True, text_s=None, tables_s=None, parse_s=0.01, total_s=None)
+
+    report = profiler.write(str(tmp_path / "reports" / "run.json"), top_n=2)
+    with open(tmp_path / "reports" / "run.json") as f:
+        assert json.load(f) == json.loads(json.dumps(report))
+    assert report["pages"]["count"] == 4
+    assert report["pages"]["timed"] == 3
+    assert report["pages"]["by_schema"] == {"ward_5col": {"pages": 2, "seconds": pytest.approx(0.7)},
+                                            "none": {"pages": 1, "seconds": pytest.approx(0.1)}}
+    assert [p["page"] for p in report["pages"]["slowest"]] == [2, 1]
+    assert len(report["page_records"]) == 4
+
+def test_extraction_records_every_page(synthetic_census):
+    pytest.importorskip("pdfplumber")
+    from extract_census_data import extract_census
+    _, pdf_path = synthetic_census
+    profiler = RunProfiler()
+    previous = set_profiler(profiler)
+    try:
+        assert get_profiler() is profiler
+        df = extract_census(pdf_path, start_page=0)
+    finally:
+        set_profiler(previous)
+    report = profiler.report()
+    assert report["counters"]["extract.records"] == len(df)
+    assert report["pages"]["count"] == report["counters"]["extract.pages"] > 0
+    assert [s["stage"] for s in report["stages"]] == ["extract_census"]
+    assert all(p["total_s"] >= p["text_s"] for p in report["page_records"])
@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+from pyproj import CRS
+from shapely.geometry import Polygon, box
+from area_engine import project_geometries
+from rasterize_population import open_population_raster, rasterize_population
+
+def _wards():
+    # 3x3 wards of ~1.1 km near Dodoma, 0.005 deg apart so no raster cell is shared by two
+    # wards, plus a triangle; all much larger than the 4-cell tiles used below
+    geoms, pops = [], []
+    for i in range(3):
+        for j in range(3):
+            x, y = 35.7 + i * 0.015, -6.2 + j * 0.015
+            geoms.append(box(x, y, x + 0.01, y + 0.01))
+            pops.append(1000.0 * (i * 3 + j + 1))
+    geoms.append(Polygon([(35.75, -6.2), (35.77, -6.2), (35.75, -6.18)]))
+    pops.append(12345.0)
+    return gpd.GeoDataFrame({"Total_Pop": pops}, geometry=geoms, crs="EPSG:4326")
+
+def test_ward_totals_survive_tiling(tmp_path):
+    wards = _wards()
+    layer = str(tmp_path / "wards.gpkg")
+    wards.to_file(layer, driver="GPKG")
+    output = str(tmp_path / "pop")
+    rasterize_population(layer, output, resolution=100.0, tile_size=4, workers=2)
+
+    raster, metadata = open_population_raster(output)
+    assert metadata["max_ward_abs_error"] < 1e-6
+    assert raster.sum() == pytest.approx(wards["Total_Pop"].sum(), rel=1e-9)
+
+    # Sum the cells in each ward's own window (windows do not overlap) and compare with its
+    # population
+    minx, res, _, maxy, _, _ = metadata["transform"]
+    projected = project_geometries(np.asarray(wards.geometry.values, dtype=object),
+                                   CRS.from_epsg(4326), CRS.from_wkt(metadata["crs_wkt"]))
+    for geom, pop in zip(projected, wards["Total_Pop"]):
+        bminx, bminy, bmaxx, bmaxy = geom.bounds
+        window = raster[math.floor((maxy - bmaxy) / res):math.ceil((maxy - bminy) / res),
+                        math.floor((bminx - minx) / res):math.ceil((bmaxx - minx) / res)]
+        assert window.sum() == pytest.approx(pop, rel=1e-9)
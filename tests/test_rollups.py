@@ -0,0 +1,55 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+from rollups import reconcile
+
+def _write(path, rows, columns):
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False)
+    return str(path)
+
+CENSUS_COLUMNS = ["Region", "Council", "Ward", "Total_Pop", "Male_Pop", "Female_Pop"]
+SUMMARY_COLUMNS = ["Level", "Region", "Council", "Name", "Total_Pop", "Male_Pop", "Female_Pop"]
+
+@pytest.fixture
+def report(tmp_path):
+    census = _write(tmp_path / "census.csv", [
+        ["DODOMA", "Kondoa District Council", "A", 100, 50, 50],
+        ["DODOMA", "Kondoa District Council", "B", 200, 90, 110],
+        ["DODOMA", "Chamwino  District Council", "C", 50, 25, 25],
+        ["DODOMA", "Chamwino District Council", "D", 50, 25, 25],
+        ["ARUSHA", "Arusha City Council", "E", 1000, 490, 510],
+        # Ward whose council was not captured
+        ["ARUSHA", None, "F", 10, 5, 5],
+    ], CENSUS_COLUMNS)
+    summary = _write(tmp_path / "summary.csv", [
+        ["council", "DODOMA", "KONDOA DISTRICT COUNCIL", "Kondoa District Council", 300, 140, 160],
+        # Partial (sub-table) total of the same council: the largest row is the unit total
+        ["council", "DODOMA", "KONDOA DISTRICT COUNCIL", "Total", 100, 50, 50],
+        ["council", "DODOMA", "Chamwino District Council", "Chamwino District Council", 120, 60, 60],
+        ["council", "DODOMA", "Mpwapwa District Council", "Mpwapwa District Council", 500, 250, 250],
+        ["region", "DODOMA", "", "Total", 400, 190, 210],
+        ["national", "", "", "Tanzania", 1410, 685, 725],
+    ], SUMMARY_COLUMNS)
+    return reconcile(census, summary).set_index(["level", "Region", "Council"])
+
+def test_council_statuses(report):
+    assert report.loc[("council", "DODOMA", "KONDOA DISTRICT COUNCIL"), "status"] == "ok"
+    row = report.loc[("council", "DODOMA", "CHAMWINO DISTRICT COUNCIL")]
+    assert row["status"] == "mismatch"
+    assert row["gap"] == -20
+    assert report.loc[("council", "ARUSHA", "ARUSHA CITY COUNCIL"), "status"] == "no_summary"
+    assert report.loc[("council", "DODOMA", "MPWAPWA DISTRICT COUNCIL"), "status"] == "no_wards"
+
+def test_region_and_national_totals(report):
+    assert report.loc[("region", "DODOMA", ""), "status"] == "ok"
+    assert report.loc[("region", "ARUSHA", ""), "status"] == "no_summary"
+    national = report.loc[("national", "", "")]
+    assert national["Total_Pop_official"] == 1410
+    assert national["Total_Pop_wards"] == 1410
+    assert national["status"] == "ok"
+
+def test_blank_council_stays_blank(report):
+    row = report.loc[("council", "ARUSHA", "")]
+    assert row["Total_Pop_wards"] == 10
+    assert row["status"] == "no_summary"
+    assert not any("NAN" in c for c in report.index.get_level_values("Council"))
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("matplotlib")
+gpd = pytest.importorskip("geopandas")
+from scipy import sparse
+from shapely.geometry import box
+from spatial_stats import contiguity_matrix, global_moran, load_or_build_contiguity
+
+def _lattice(n=3):
+    return np.array([box(c, r, c + 1, r + 1) for r in range(n) for c in range(n)], dtype=object)
+
+def test_rook_lattice_neighbours():
+    w = contiguity_matrix(_lattice(), "rook").toarray()
+    assert w.sum(axis=1).tolist() == [2, 3, 2, 3, 4, 3, 2, 3, 2]
+    assert contiguity_matrix(_lattice(), "queen")[4].sum() == 8
+
+def test_checkerboard_is_perfectly_negative():
+    # Every rook neighbour of a 1 is a 0 and vice versa: I = -1
+    w = contiguity_matrix(_lattice(), "rook")
+    values = np.array([1, 0, 1, 0, 1, 0, 1, 0, 1], dtype=float)
+    result = global_moran(w, values, permutations=99)
+    assert result["I"] == pytest.approx(-1.0)
+    assert result["expected_I"] == pytest.approx(-1 / 8)
+
+def test_path_graph_gradient():
+    # 1-2-3-4 on a path: z = (-1.5, -0.5, 0.5, 1.5), spatial lag of z = (-0.5, -0.5, 0.5, 0.5),
+    # I = sum(z * lag) / sum(z^2) = 2 / 5
+    w = sparse.csr_matrix(np.array([[0, 1, 0, 0], [1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0]], dtype=float))
+    result = global_moran(w, np.array([1.0, 2.0, 3.0, 4.0]), permutations=0)
+    assert result["I"] == pytest.approx(0.4)
+    assert result["p_sim"] is None
+
+def test_one_cache_file_per_source_and_kind(tmp_path):
+    gpkg = str(tmp_path / "layer.gpkg")
+    parquet = str(tmp_path / "layer.parquet")
+    geoms = _lattice()
+    forward = gpd.GeoDataFrame(geometry=list(geoms), crs="EPSG:4326")
+    backward = gpd.GeoDataFrame(geometry=list(geoms[::-1]), crs="EPSG:4326")
+
+    # The GeoPackage and its row-sorted GeoParquet copy keep separate files
+    w_forward = load_or_build_contiguity(forward, gpkg, "rook")
+    w_backward = load_or_build_contiguity(backward, parquet, "rook")
+    assert sorted(f for f in os.listdir(tmp_path) if f.endswith("_contiguity.npz")) == [
+        "layer_gpkg_rook_contiguity.npz", "layer_parquet_rook_contiguity.npz"]
+    assert (load_or_build_contiguity(forward, gpkg, "rook") != w_forward).nnz == 0
+    assert (load_or_build_contiguity(backward, parquet, "rook") != w_backward).nnz == 0
+
+    # A changed layer is rebuilt in place rather than adding a file
+    shifted = gpd.GeoDataFrame(geometry=list(geoms[1:]), crs="EPSG:4326")
+    assert load_or_build_contiguity(shifted, gpkg, "rook").shape == (8, 8)
+    assert len([f for f in os.listdir(tmp_path) if f.endswith("_contiguity.npz")]) == 2
+    assert (load_or_build_contiguity(forward, gpkg, "rook") != w_forward).nnz == 0
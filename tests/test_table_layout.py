@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("pdfplumber")
+from benchmark_extraction import benchmark_table_paths
+from extract_census_data import PAGE_WARD_TABLE, RECORD_COLUMNS, extract_census, iter_census_pages
+
+def test_fixed_columns_match_generic_tables(synthetic_census):
+    _, pdf_path = synthetic_census
+    result = benchmark_table_paths(pdf_path, start_page=0)
+    assert result["fixed_pages"] > 0
+    assert result["mismatched_pages"] == []
+
+def test_fixed_column_extraction_matches_generic_extraction(synthetic_census):
+    pd = pytest.importorskip("pandas")
+    _, pdf_path = synthetic_census
+    page_stats = {}
+    records = [r for _, page in iter_census_pages(pdf_path, start_page=0, page_stats=page_stats) for r in page]
+    fixed = pd.DataFrame(records, columns=RECORD_COLUMNS)
+    # Most pages must actually have been sliced, otherwise this compares generic with generic
+    assert page_stats[PAGE_WARD_TABLE]["fixed"] > page_stats[PAGE_WARD_TABLE]["pages"] // 2
+    generic = extract_census(pdf_path, start_page=0, fixed_columns=False)
+    pd.testing.assert_frame_equal(fixed, generic)
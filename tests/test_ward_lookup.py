@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+from shapely.geometry import box
+from ward_lookup import WardLookup
+
+def _layer(pops=(100, 200)):
+    return gpd.GeoDataFrame({
+        "ward_name": ["A", "B"], "dist_name": ["D", "D"], "reg_name": ["R", "R"], "Total_Pop": list(pops),
+    }, geometry=[box(39.0, -7.0, 39.1, -6.9), box(39.1, -7.0, 39.2, -6.9)], crs="EPSG:4326")
+
+@pytest.fixture
+def lookup():
+    layer = _layer()
+    attrs = {c: layer[c].to_numpy() for c in ["ward_name", "dist_name", "reg_name"]}
+    attrs["Total_Pop"] = layer["Total_Pop"].to_numpy(dtype=float)
+    return WardLookup(np.asarray(layer.geometry.values, dtype=object), attrs)
+
+def test_points_inside_wards(lookup):
+    result = lookup.lookup([39.05, 39.15], [-6.95, -6.95])
+    assert result["ward_name"].tolist() == ["A", "B"]
+    assert result["match"].tolist() == ["inside", "inside"]
+    assert result["Total_Pop"].tolist() == [100.0, 200.0]
+    assert result["distance_deg"].tolist() == [0.0, 0.0]
+
+def test_offshore_points_snap_to_nearest_ward_within_limit(lookup):
+    # 0.01 deg east of ward B, and 1 deg away (beyond MAX_OFFSHORE_DEG)
+    result = lookup.lookup([39.21, 40.2], [-6.95, -6.95])
+    assert result["match"].tolist() == ["nearest", "none"]
+    assert result["ward_name"].tolist() == ["B", None]
+    assert result["distance_deg"][0] == pytest.approx(0.01)
+    assert np.isnan(result["Total_Pop"][1])
+    assert lookup.lookup([39.21], [-6.95], max_offshore_deg=0)["match"].tolist() == ["none"]
+
+def test_non_finite_and_out_of_range_coordinates_do_not_match(lookup):
+    lon = [np.nan, 39.05, np.inf, 399.05, 39.05]
+    lat = [-6.95, np.nan, -6.95, -6.95, -96.95]
+    result = lookup.lookup(lon + [39.05], lat + [-6.95])
+    assert result["match"].tolist() == ["none"] * 5 + ["inside"]
+    assert result["ward_index"].tolist() == [-1] * 5 + [0]
+    assert np.isnan(result["distance_deg"][:5]).all()
+
+def test_index_is_rebuilt_when_the_layer_content_changes(tmp_path):
+    layer_path = str(tmp_path / "wards.gpkg")
+    index_path = str(tmp_path / "index.pkl")
+    _layer().to_file(layer_path, driver="GPKG")
+    st = os.stat(layer_path)
+    assert WardLookup.load_or_build(layer_path, index_path).lookup([39.05], [-6.95])["Total_Pop"][0] == 100
+
+    # Same size and mtime, different populations: only the content hash can tell
+    _layer(pops=(300, 400)).to_file(layer_path, driver="GPKG")
+    assert os.path.getsize(layer_path) == st.st_size
+    os.utime(layer_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert WardLookup.load_or_build(layer_path, index_path).lookup([39.05], [-6.95])["Total_Pop"][0] == 300
+
+    # A truncated index is rebuilt rather than raising
+    with open(index_path, 'wb') as f:
+        f.write(b"\x80")
+    assert WardLookup.load_or_build(layer_path, index_path).lookup([39.15], [-6.95])["Total_Pop"][0] == 400